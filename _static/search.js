@@ -0,0 +1,90 @@
+// Searches the whole catalog in the browser with the search index written
+// by site_builder.build_site, so no page has to list every movie.
+(function () {
+  var MAX_RESULTS = 100;
+  var index = null;
+  var loading = null;
+
+  // The same normalization as site_builder.title_tokens
+  function tokens(text) {
+    return text.normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase()
+      .match(/[\p{L}\p{N}]+/gu) || [];
+  }
+
+  function loadIndex() {
+    if (loading === null) {
+      loading = fetch('search_index.json')
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          var fields = {};
+          data.fields.forEach(function (name, position) { fields[name] = position; });
+          index = data.movies.map(function (entry) {
+            return {
+              title: entry[fields.title],
+              tokens: entry[fields.tokens].split(' '),
+              year: entry[fields.year],
+              rating: entry[fields.rating],
+              url: entry[fields.url]
+            };
+          });
+        });
+    }
+    return loading;
+  }
+
+  // Every query word has to start a word of the title
+  function matches(movie, words, minYear, minRating) {
+    if (minYear !== null && (movie.year === null || movie.year < minYear)) return false;
+    if (minRating !== null && (movie.rating === null || movie.rating < minRating)) return false;
+    return words.every(function (word) {
+      return movie.tokens.some(function (token) { return token.indexOf(word) === 0; });
+    });
+  }
+
+  function numberOrNull(input) {
+    var value = parseFloat(input.value);
+    return isNaN(value) ? null : value;
+  }
+
+  function render() {
+    var words = tokens(document.getElementById('search-query').value);
+    var minYear = numberOrNull(document.getElementById('search-year'));
+    var minRating = numberOrNull(document.getElementById('search-rating'));
+    var results = document.getElementById('search-results');
+    var catalog = document.getElementById('catalog');
+    if (!words.length && minYear === null && minRating === null) {
+      results.hidden = true;
+      catalog.hidden = false;
+      return;
+    }
+    var found = index.filter(function (movie) { return matches(movie, words, minYear, minRating); });
+    var list = document.getElementById('search-list');
+    list.textContent = '';
+    found.slice(0, MAX_RESULTS).forEach(function (movie) {
+      var item = document.createElement('li');
+      var link = document.createElement('a');
+      link.href = movie.url;
+      link.textContent = movie.title;
+      item.appendChild(link);
+      item.appendChild(document.createTextNode(
+        ' (' + (movie.year === null ? '?' : movie.year) + ') ' + (movie.rating === null ? '' : movie.rating)));
+      list.appendChild(item);
+    });
+    document.getElementById('search-summary').textContent = found.length > MAX_RESULTS
+      ? found.length + ' movies found, showing the first ' + MAX_RESULTS
+      : found.length + ' movies found';
+    results.hidden = false;
+    catalog.hidden = true;
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    var form = document.getElementById('movie-search');
+    form.addEventListener('submit', function (event) { event.preventDefault(); });
+    form.addEventListener('input', function () {
+      loadIndex().then(render).catch(function () {
+        document.getElementById('search-summary').textContent = 'The search index could not be loaded';
+        document.getElementById('search-results').hidden = false;
+      });
+    });
+  });
+})();
@@ -0,0 +1,128 @@
+import argparse
+import random
+from convert import write_movies
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+DEFAULT_SEED = 1234
+
+ADJECTIVES = (
+    'Silent', 'Broken', 'Golden', 'Last', 'Hidden', 'Eternal', 'Crimson', 'Lost', 'Wild', 'Frozen',
+    'Burning', 'Quiet', 'Dark', 'Bright', 'Forgotten', 'Secret', 'Distant', 'Electric', 'Hollow', 'Iron',
+    'Midnight', 'Paper', 'Savage', 'Scarlet', 'Shattered', 'Sleeping', 'Velvet', 'Wandering', 'Winter', 'Young',
+)
+NOUNS = (
+    'Empire', 'River', 'Garden', 'Kingdom', 'Promise', 'Horizon', 'Shadow', 'Station', 'Letter', 'Island',
+    'Mirror', 'Harbor', 'Frontier', 'Orchard', 'Circus', 'Machine', 'Voyage', 'Covenant', 'Lighthouse', 'Dynasty',
+    'Summer', 'Storm', 'Witness', 'Stranger', 'Symphony', 'Labyrinth', 'Carnival', 'Requiem', 'Citadel', 'Memory',
+)
+PLACES = (
+    'Paris', 'Tokyo', 'the North', 'the Valley', 'Berlin', 'the Sea', 'Seoul', 'the Moon', 'Havana', 'Cairo',
+    'the Desert', 'Vienna', 'the City', 'Lagos', 'the Mountains', 'Lisbon', 'Mumbai', 'the Border', 'Oslo', 'Rome',
+)
+GENRES = (
+    'Drama', 'Comedy', 'Action', 'Thriller', 'Romance', 'Adventure', 'Animation', 'Crime', 'Horror', 'Sci-Fi',
+    'Fantasy', 'Mystery', 'Family', 'Documentary', 'War', 'Biography', 'Music', 'History', 'Western', 'Sport',
+)
+FIRST_NAMES = (
+    'Akira', 'Agnes', 'Bong', 'Chloe', 'David', 'Elena', 'Federico', 'Greta', 'Hayao', 'Ingmar',
+    'Jane', 'Kar-Wai', 'Lucrecia', 'Martin', 'Nadine', 'Orson', 'Pedro', 'Quentin', 'Ruben', 'Sofia',
+    'Takeshi', 'Ulrike', 'Victor', 'Wes', 'Xavier', 'Yasujiro', 'Zhang', 'Alfonso', 'Kathryn', 'Satyajit',
+)
+LAST_NAMES = (
+    'Kurosawa', 'Varda', 'Joon-ho', 'Zhao', 'Lynch', 'Ferrante', 'Fellini', 'Gerwig', 'Miyazaki', 'Bergman',
+    'Campion', 'Wong', 'Martel', 'Scorsese', 'Labaki', 'Welles', 'Almodovar', 'Tarantino', 'Ostlund', 'Coppola',
+    'Kitano', 'Ottinger', 'Sjostrom', 'Anderson', 'Dolan', 'Ozu', 'Yimou', 'Cuaron', 'Bigelow', 'Ray',
+)
+PLOT_OPENINGS = (
+    'A retired detective', 'Two estranged sisters', 'A young pilot', 'An ambitious chef', 'A lonely robot',
+    'A small-town teacher', 'An exiled prince', 'A group of friends', 'A struggling musician', 'A war photographer',
+)
+PLOT_ACTIONS = (
+    'returns home to uncover', 'must team up to stop', 'sets out to find', 'is forced to confront',
+    'accidentally discovers', 'tries to hide', 'fights to protect', 'falls in love while chasing',
+)
+PLOT_OBJECTS = (
+    'a family secret that could tear the village apart.', 'a conspiracy reaching the highest offices.',
+    'the last letter of a missing father.', 'a rival who knows every move in advance.',
+    'a cursed painting that changes every night.', 'the truth about a decades-old disappearance.',
+    'an invasion nobody else believes in.', 'a fortune buried somewhere beneath the old harbor.',
+)
+
+
+def generate_movies(count, seed=DEFAULT_SEED):
+    """
+    Yields a reproducible synthetic catalog with realistic titles, genres,
+    directors, plots and ratings.
+
+    Titles combine words and places and get a sequel number once the
+    combinations are used up, so they stay unique at any size. Ratings
+    follow a normal distribution around 6.8 like real catalogs, popular
+    genres and directors repeat like they do in real data.
+
+    Args:
+    count (int): The number of movies.
+    seed (int): The seed of the random generator, the same seed gives the same catalog.
+
+    Returns:
+    generator: (title, movie details) tuples in the format of the JSON storage.
+    """
+    rng = random.Random(seed)
+    patterns = (
+        lambda: f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+        lambda: f"{rng.choice(NOUNS)} of {rng.choice(PLACES)}",
+        lambda: f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} in {rng.choice(PLACES)}",
+        lambda: f"A {rng.choice(NOUNS)} for {rng.choice(FIRST_NAMES)}",
+    )
+    seen = {}
+    for number in range(count):
+        title = rng.choice(patterns)()
+        sequel = seen.get(title, 0)
+        seen[title] = sequel + 1
+        if sequel:
+            title = f"{title} {sequel + 1}"
+        rating = min(10.0, max(1.0, round(rng.gauss(6.8, 1.2), 1)))
+        genres = rng.sample(GENRES[:8] if rng.random() < 0.7 else GENRES, rng.randint(1, 3))
+        director = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        plot = f"{rng.choice(PLOT_OPENINGS)} {rng.choice(PLOT_ACTIONS)} {rng.choice(PLOT_OBJECTS)}"
+        yield title, {
+            'year_of_release': rng.randint(1920, 2024),
+            'rating': rating,
+            'poster': f"https://posters.example.com/{number:07d}.jpg",
+            'plot': plot,
+            'genre': ', '.join(genres),
+            'director': director,
+        }
+
+
+def write_catalog(file_path, count, seed=DEFAULT_SEED):
+    """
+    Writes a synthetic catalog in the format of the storage matching the
+    extension, streaming the movies so even 1M movies fit in memory.
+
+    Args:
+    file_path (str): The .json, .csv, .db, .sqlite or .mbin file to create.
+    count (int): The number of movies.
+    seed (int): The seed of the random generator.
+
+    Returns:
+    None
+    """
+    write_movies(file_path, generate_movies(count, seed))
+
+
+def main():
+    """
+    Writes a synthetic catalog file, e.g. python -m benchmarks.catalog movies.json --size 100k
+    """
+    parser = argparse.ArgumentParser(description="Generate a synthetic movie catalog")
+    parser.add_argument('file', help="catalog file to create: .json, .csv, .db, .sqlite or .mbin")
+    parser.add_argument('--size', default='1k', help=f"{', '.join(SIZES)} or a number of movies")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="seed of the random generator")
+    args = parser.parse_args()
+    count = SIZES.get(args.size.lower()) or int(args.size)
+    write_catalog(args.file, count, args.seed)
+    print(f"Wrote {count} movies to {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from analytics import MovieAnalytics
+from benchmarks.catalog import DEFAULT_SEED, SIZES, write_catalog
+from main import get_storage
+from movie_app import MovieApp, PAGE_SIZE
+
+BACKENDS = {'json': '.json', 'csv': '.csv', 'sqlite': '.db', 'binary': '.mbin'}
+OPERATIONS = ('load', 'save', 'add', 'delete', 'update', 'search', 'stats', 'sorted', 'list', 'website',
+              'analytics', 'aggregates')
+DEFAULT_SIZES = ('1k', '100k')
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+SEARCH_QUERIES = ('empire', 'the lost', 'paris 3', 'zz')
+TEMPLATE_FILES = ('index_template.html', 'movie_template.html', 'style.css', 'movie_style.css')
+
+
+def _timed(function, repeat):
+    """
+    Runs a function several times with its output silenced and returns the durations.
+
+    Args:
+    function (callable): The operation, called with the number of the run.
+    repeat (int): The number of runs.
+
+    Returns:
+    list: The duration of every run in seconds.
+    """
+    durations = []
+    for run in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function(run)
+            durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _static_dir(work_dir):
+    """
+    Copies the website templates into a fresh directory, so the benchmark
+    builds the site from scratch without touching the repository.
+
+    Args:
+    work_dir (str): The directory of the benchmark run.
+
+    Returns:
+    str: The static directory.
+    """
+    static_dir = os.path.join(work_dir, '_static')
+    os.makedirs(static_dir, exist_ok=True)
+    source_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_static')
+    for name in TEMPLATE_FILES:
+        shutil.copy(os.path.join(source_dir, name), static_dir)
+    return static_dir
+
+
+def benchmark_backend(backend, count, operations, repeat, work_dir, seed=DEFAULT_SEED):
+    """
+    Times the operations of one backend on a synthetic catalog.
+
+    Every mutation is measured on the storage as the app uses it, i.e.
+    including the save it triggers. A fresh storage is opened for load,
+    the other operations share one loaded storage like a running app.
+    analytics loads the catalog into MovieAnalytics and computes every
+    aggregate, aggregates only computes them on arrays loaded beforehand.
+
+    Args:
+    backend (str): A key of BACKENDS.
+    count (int): The number of movies in the catalog.
+    operations (iterable): The names of the operations to time, see OPERATIONS.
+    repeat (int): The number of runs per operation.
+    work_dir (str): The directory for the catalog and the website.
+    seed (int): The seed of the catalog generator.
+
+    Returns:
+    dict: The durations in seconds of every run, keyed by operation.
+    """
+    file_path = os.path.join(work_dir, f"catalog_{count}{BACKENDS[backend]}")
+    write_catalog(file_path, count, seed)
+    storage = get_storage(file_path)
+    titles = [title for title, _ in storage.iter_movies(fields=())][:repeat * 2]
+    timings = {}
+
+    def load(run):
+        fresh = get_storage(file_path)
+        fresh.rating_stats()
+        fresh.close()
+
+    def add(run):
+        storage.add_movie(f"Benchmark Movie {run}", 2024, 7.5, '', 'A benchmark plot.', 'Drama', 'Nobody')
+
+    def save(run):
+        with storage.batch():
+            storage.update_movie(titles[0], 5.0 + run / 10)
+
+    def aggregate(movie_analytics):
+        movie_analytics.summary()
+        movie_analytics.histogram()
+        movie_analytics.by_genre()
+        movie_analytics.by_director()
+        movie_analytics.by_decade()
+        movie_analytics.trend_by_year()
+
+    def analytics(run):
+        aggregate(MovieAnalytics.from_storage(storage))
+
+    app = MovieApp(storage)
+    static_dir = _static_dir(work_dir) if 'website' in operations else None
+    runners = {
+        'load': load,
+        'save': save,
+        'add': add,
+        'delete': lambda run: storage.delete_movie(titles[run]),
+        'update': lambda run: storage.update_movie(titles[-1 - run], 9.1),
+        'search': lambda run: [storage.search_movies(query) for query in SEARCH_QUERIES],
+        'stats': lambda run: storage.rating_stats(),
+        'sorted': lambda run: storage.movies_by_rating(PAGE_SIZE),
+        'list': lambda run: app._command_list_movies(),
+        'website': lambda run: _build_site(storage, static_dir),
+        'analytics': analytics,
+        'aggregates': lambda run: aggregate(loaded_analytics),
+    }
+    if 'load' in operations:
+        timings['load'] = _timed(load, repeat)
+    # Loads the storage once, so the other operations run on a warm app
+    storage.rating_stats()
+    # Loaded outside the timing, so 'aggregates' only measures the array operations
+    loaded_analytics = None
+    if 'aggregates' in operations:
+        loaded_analytics = MovieAnalytics.from_storage(storage)
+    for operation in OPERATIONS:
+        if operation != 'load' and operation in operations:
+            timings[operation] = _timed(runners[operation], repeat)
+    storage.close()
+    return timings
+
+
+def _build_site(storage, static_dir):
+    """
+    Builds the website from scratch, removing the pages of the previous run.
+
+    Args:
+    storage (IStorage): The storage to render.
+    static_dir (str): The static directory with the templates.
+
+    Returns:
+    None
+    """
+    import site_builder
+    for name in os.listdir(static_dir):
+        if name not in TEMPLATE_FILES:
+            os.remove(os.path.join(static_dir, name))
+    site_builder.build_site(storage.iter_movies, static_dir=static_dir)
+
+
+def run_benchmarks(backends, sizes, operations, repeat, seed=DEFAULT_SEED):
+    """
+    Times the operations for every backend and catalog size.
+
+    Args:
+    backends (iterable): Keys of BACKENDS.
+    sizes (iterable): Keys of SIZES or numbers of movies.
+    operations (iterable): The names of the operations to time.
+    repeat (int): The number of runs per operation.
+    seed (int): The seed of the catalog generator.
+
+    Returns:
+    dict: The machine-readable results with the environment under 'meta'
+        and one entry per backend, size and operation under 'results'.
+    """
+    results = []
+    for size in sizes:
+        count = SIZES.get(str(size).lower()) or int(size)
+        for backend in backends:
+            with tempfile.TemporaryDirectory(prefix='movie-bench-') as work_dir:
+                timings = benchmark_backend(backend, count, operations, repeat, work_dir, seed)
+            for operation, durations in timings.items():
+                results.append({
+                    'backend': backend,
+                    'size': count,
+                    'operation': operation,
+                    'runs': len(durations),
+                    'median_s': statistics.median(durations),
+                    'min_s': min(durations),
+                    'max_s': max(durations),
+                })
+            print(f"{backend} {count}: done", file=sys.stderr)
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares two result sets by their median durations.
+
+    Args:
+    baseline (dict): The results of an earlier run.
+    current (dict): The results of this run.
+    threshold (float): The relative slowdown which counts as a regression, e.g. 0.25 for 25%.
+
+    Returns:
+    list: One dict per measurement present in both runs with backend, size,
+        operation, both medians, the ratio and whether it regressed.
+    """
+    def key(result):
+        return result['backend'], result['size'], result['operation']
+
+    previous = {key(result): result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        ratio = result['median_s'] / old['median_s'] if old['median_s'] else float('inf')
+        rows.append({
+            'backend': result['backend'],
+            'size': result['size'],
+            'operation': result['operation'],
+            'baseline_s': old['median_s'],
+            'current_s': result['median_s'],
+            'ratio': round(ratio, 3),
+            'regression': ratio > 1 + threshold,
+        })
+    return rows
+
+
+def print_table(results):
+    """
+    Prints the median duration of every measurement as a table.
+
+    Args:
+    results (dict): The results of run_benchmarks.
+
+    Returns:
+    None
+    """
+    print(f"{'backend':8} {'size':>8} {'operation':10} {'median ms':>12} {'min ms':>12}")
+    for result in results['results']:
+        print(f"{result['backend']:8} {result['size']:>8} {result['operation']:10} "
+              f"{result['median_s'] * 1000:>12.3f} {result['min_s'] * 1000:>12.3f}")
+
+
+def main():
+    """
+    Runs the benchmarks, writes the results as JSON and optionally compares
+    them with a baseline, failing if an operation got slower than the threshold.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the movie storages and commands")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES),
+                        help=f"catalog sizes: {', '.join(SIZES)} or numbers of movies")
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="runs per operation")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="seed of the catalog generator")
+    parser.add_argument('--output', help="file to write the JSON results to")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown which counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.backends, args.sizes, args.operations, args.repeat, args.seed)
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        rows = compare(baseline, results, args.threshold)
+        regressions = [row for row in rows if row['regression']]
+        for row in rows:
+            marker = '  REGRESSION' if row['regression'] else ''
+            print(f"{row['backend']:8} {row['size']:>8} {row['operation']:10} x{row['ratio']:.2f}{marker}")
+        if regressions:
+            print(f"{len(regressions)} operations regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REPEAT = 5
+DEFAULT_BUDGET_MS = 200
+HEAVY_MODULES = ('matplotlib', 'numpy', 'requests', 'dotenv', 'site_builder', 'analytics', 'charts')
+
+# Runs in a fresh interpreter, so every measurement pays the full import cost
+CHILD_SCRIPT = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+import main
+from movie_app import MovieApp
+imported = time.perf_counter()
+app = MovieApp(main.get_storage(sys.argv[1]))
+with contextlib.redirect_stdout(io.StringIO()):
+    app._command_list_movies()
+listed = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_command_ms': (listed - imported) * 1000,
+    'heavy_modules': [name for name in json.loads(sys.argv[2]) if name in sys.modules],
+}))
+"""
+
+
+def measure_once(storage_path):
+    """
+    Measures the startup of the app in a fresh Python interpreter.
+
+    Args:
+    storage_path (str): The movie storage file the app is started with.
+
+    Returns:
+    dict: import_ms, first_command_ms and the heavy modules which were imported.
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, os.path.abspath(storage_path), json.dumps(HEAVY_MODULES)],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(storage_path, repeat=DEFAULT_REPEAT):
+    """
+    Measures the startup several times and returns the medians.
+
+    Args:
+    storage_path (str): The movie storage file the app is started with.
+    repeat (int): The number of fresh interpreters to start.
+
+    Returns:
+    dict: The median import_ms, first_command_ms and total_ms, and the heavy
+        modules which were imported by any run.
+    """
+    runs = [measure_once(storage_path) for _ in range(repeat)]
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    first_command_ms = statistics.median(run['first_command_ms'] for run in runs)
+    return {
+        'storage': storage_path,
+        'repeat': repeat,
+        'import_ms': round(import_ms, 2),
+        'first_command_ms': round(first_command_ms, 2),
+        'total_ms': round(import_ms + first_command_ms, 2),
+        'heavy_modules': sorted({name for run in runs for name in run['heavy_modules']}),
+    }
+
+
+def main():
+    """
+    Prints the startup measurement as JSON and fails if it exceeds the budget
+    or if a heavy dependency is imported before it is needed.
+    """
+    parser = argparse.ArgumentParser(description="Measure the startup time of the movie app")
+    parser.add_argument('storage', nargs='?', default=os.path.join(REPO_DIR, 'data.json'),
+                        help="movie storage file to start the app with")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="number of fresh interpreters to measure")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="maximum median time of import plus first command")
+    args = parser.parse_args()
+
+    result = measure(args.storage, args.repeat)
+    result['budget_ms'] = args.budget_ms
+    print(json.dumps(result, indent=2))
+    if result['heavy_modules']:
+        print(f"Heavy modules imported at startup: {', '.join(result['heavy_modules'])}", file=sys.stderr)
+        sys.exit(1)
+    if result['total_ms'] > args.budget_ms:
+        print(f"Startup took {result['total_ms']} ms, budget is {args.budget_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import csv
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import omdb_client
+from title_resolver import TitleResolver
+
+DEFAULT_WORKERS = 8
+DEFAULT_REPORT_PATH = 'import_failures.csv'
+
+
+def read_titles(file_path):
+    """
+    Reads the movie titles to import from a text or CSV file.
+
+    A text file holds one title per line. A CSV file uses its 'title'
+    column, or the first column if there is no header called 'title'.
+    Empty lines and duplicate titles are skipped.
+
+    Args:
+    file_path (str): The path of the .txt or .csv file.
+
+    Returns:
+    list: The titles in the order of the file.
+    """
+    with open(file_path, 'r', newline='', encoding='utf-8') as file:
+        if file_path.lower().endswith('.csv'):
+            rows = list(csv.reader(file))
+            column = 0
+            if rows and 'title' in [cell.strip().lower() for cell in rows[0]]:
+                column = [cell.strip().lower() for cell in rows[0]].index('title')
+                rows = rows[1:]
+            titles = [row[column] for row in rows if len(row) > column]
+        else:
+            titles = file.read().splitlines()
+    return list(dict.fromkeys(title.strip() for title in titles if title.strip()))
+
+
+def fetch_movies(titles, workers=DEFAULT_WORKERS, api_url=omdb_client.OMDB_API_URL, cache=None):
+    """
+    Fetches the OMDB details of many titles concurrently.
+
+    Cached titles are answered from the cache, the others are requested on
+    a bounded thread pool where each worker thread keeps its own
+    requests.Session so connections are reused.
+
+    Args:
+    titles (list): The titles to fetch.
+    workers (int): The maximum number of concurrent requests.
+    api_url (str): The URL of the OMDB API, e.g. a local stub server in tests.
+    cache (OmdbCache): Optional cache which is asked before the API.
+
+    Returns:
+    list: (title, parsed response) tuples in the order of the titles,
+        the parsed response is a dict or an error message.
+    """
+    local = threading.local()
+
+    def fetch(title):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        try:
+            return title, omdb_client.fetch_movie(title, session=local.session, api_url=api_url)
+        except requests.RequestException as error:
+            return title, f"Error: {error}"
+
+    results = {}
+    if cache is not None:
+        for title in titles:
+            cached_resp = cache.get(title)
+            if cached_resp is not None:
+                results[title] = cached_resp
+    missing = [title for title in titles if title not in results]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for title, parsed_resp in executor.map(fetch, missing):
+            results[title] = parsed_resp
+            if cache is not None:
+                cache.put(title, parsed_resp, save=False)
+    if cache is not None and missing:
+        cache.save()
+    return [(title, results[title]) for title in titles]
+
+
+def write_report(failures, report_path):
+    """
+    Writes the titles which could not be imported to a CSV report. Without
+    failures the report of an earlier import is removed, so it does not
+    list titles which were not part of this one.
+
+    Args:
+    failures (list): (title, reason) tuples.
+    report_path (str): The path of the report file.
+
+    Returns:
+    None
+    """
+    if not failures:
+        if os.path.exists(report_path):
+            os.remove(report_path)
+        return
+    with open(report_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['title', 'error'])
+        writer.writerows(failures)
+
+
+def import_titles(storage, titles, workers=DEFAULT_WORKERS, report_path=DEFAULT_REPORT_PATH,
+                  api_url=omdb_client.OMDB_API_URL, cache=None, resolver=None):
+    """
+    Fetches the given titles from OMDB and adds all found movies to the
+    storage with a single save. Titles which already exist in the storage,
+    ignoring case, accents and punctuation, are skipped, failed titles are
+    written to the report file, which is removed if none failed.
+
+    Args:
+    storage (IStorage): The storage to add the movies to.
+    titles (list): The titles to import.
+    workers (int): The maximum number of concurrent requests.
+    report_path (str): The path of the failure report.
+    api_url (str): The URL of the OMDB API, e.g. a local stub server in tests.
+    cache (OmdbCache): Optional cache which is asked before the API.
+    resolver (TitleResolver): The stored titles, built from the storage if
+        not given. The added titles are added to it.
+
+    Returns:
+    tuple: The number of added movies and the list of (title, reason) failures.
+    """
+    if resolver is None:
+        resolver = TitleResolver(title for title, _ in storage.iter_movies(fields=()))
+    titles = [title for title in titles if resolver.resolve(title) is None]
+    new_movies = {}
+    failures = []
+    for title, parsed_resp in fetch_movies(titles, workers, api_url, cache):
+        if isinstance(parsed_resp, str):
+            failures.append((title, parsed_resp))
+            continue
+        try:
+            movie = omdb_client.movie_from_response(parsed_resp)
+        except (KeyError, IndexError, ValueError):
+            failures.append((title, "Error: Incomplete movie details"))
+            continue
+        if resolver.resolve(movie['title']) is None:
+            new_movies[movie['title']] = movie
+    storage.add_movies(list(new_movies.values()))
+    for title in new_movies:
+        resolver.add(title)
+    write_report(failures, report_path)
+    return len(new_movies), failures
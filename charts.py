@@ -0,0 +1,228 @@
+import argparse
+import os
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from analytics import MovieAnalytics
+
+CHART_FIELDS = ('rating', 'year_of_release', 'genre')
+CHART_NAMES = ('rating_histogram', 'ratings_by_year', 'top_genres')
+HISTOGRAM_BINS = 10
+TOP_GENRES = 10
+DEFAULT_FORMAT = 'png'
+FIGURE_SIZE = (8, 5)
+DPI = 100
+
+
+class ChartData:
+    """
+    The aggregates all charts are drawn from, computed once per catalog,
+    so exporting several charts bins the ratings a single time.
+
+    Args:
+    counts (list): The number of movies per rating bin.
+    edges (list): The rating bin edges, one more than counts.
+    years (list): The years with rated movies, ascending.
+    year_means (list): The mean rating of every year.
+    slope (float): The rating change per year, None with fewer than two years.
+    genres (list): (genre, movie count, mean rating) of the top genres.
+
+    Methods:
+    - from_movies: Loads the aggregates from (title, movie) pairs in one pass.
+    - fingerprint: Returns the data a chart is drawn from.
+    """
+
+    def __init__(self, counts, edges, years, year_means, slope, genres):
+        """
+        Initializes a new instance of the class.
+
+        Returns:
+        None
+        """
+        self.counts = counts
+        self.edges = edges
+        self.years = years
+        self.year_means = year_means
+        self.slope = slope
+        self.genres = genres
+
+
+    @classmethod
+    def from_movies(cls, movies, bins=HISTOGRAM_BINS, top_genres=TOP_GENRES):
+        """
+        Loads the aggregates of all charts from the movies.
+
+        Args:
+        movies (iterable): (title, movie details) tuples, e.g. from
+            IStorage.iter_movies(fields=CHART_FIELDS).
+        bins (int): The number of rating histogram bins.
+        top_genres (int): The number of genres with the most movies to chart.
+
+        Returns:
+        ChartData: The aggregates.
+        """
+        analytics = MovieAnalytics.from_movies(movies)
+        counts, edges = analytics.histogram(bins)
+        by_year, slope = analytics.trend_by_year()
+        genres = [(name, group['count'], group['mean'])
+                  for name, group in list(analytics.by_genre().items())[:top_genres]]
+        return cls(counts.tolist(), edges.tolist(), list(by_year), list(by_year.values()), slope, genres)
+
+
+    def fingerprint(self, name):
+        """
+        Returns the data a chart is drawn from, e.g. to tell whether it has
+        to be drawn again.
+
+        Args:
+        name (str): One of CHART_NAMES.
+
+        Returns:
+        list: JSON serializable values.
+        """
+        if name == 'rating_histogram':
+            return [self.counts, self.edges]
+        if name == 'ratings_by_year':
+            return [self.years, self.year_means, self.slope]
+        return self.genres
+
+
+def draw_rating_histogram(axes, data):
+    """
+    Draws the number of movies per rating bin.
+
+    Args:
+    axes (matplotlib.axes.Axes): The axes to draw on.
+    data (ChartData): The aggregates.
+
+    Returns:
+    None
+    """
+    axes.stairs(data.counts, data.edges, fill=True)
+    axes.set_xlabel("Movie Rating")
+    axes.set_ylabel("Number of Movies")
+    axes.set_title("Distribution of Movie Ratings")
+    axes.grid(True)
+
+
+def draw_ratings_by_year(axes, data):
+    """
+    Draws the mean rating of the movies of every year of release.
+
+    Args:
+    axes (matplotlib.axes.Axes): The axes to draw on.
+    data (ChartData): The aggregates.
+
+    Returns:
+    None
+    """
+    axes.plot(data.years, data.year_means, marker='.')
+    axes.set_xlabel("Year of Release")
+    axes.set_ylabel("Mean Rating")
+    title = "Mean Rating by Year"
+    if data.slope is not None:
+        title += f" (trend {data.slope:+.3f} per year)"
+    axes.set_title(title)
+    axes.grid(True)
+
+
+def draw_top_genres(axes, data):
+    """
+    Draws the number of movies of the genres with the most movies, labelled
+    with their mean rating.
+
+    Args:
+    axes (matplotlib.axes.Axes): The axes to draw on.
+    data (ChartData): The aggregates.
+
+    Returns:
+    None
+    """
+    # Reversed, so the genre with the most movies is at the top
+    genres = data.genres[::-1]
+    bars = axes.barh([name for name, _, _ in genres], [count for _, count, _ in genres])
+    axes.bar_label(bars, labels=['n/a' if mean is None else f"{mean:.1f}" for _, _, mean in genres],
+                   padding=3)
+    axes.set_xlabel("Number of Movies (labelled with the mean rating)")
+    axes.set_title("Top Genres")
+
+
+CHARTS = {
+    'rating_histogram': draw_rating_histogram,
+    'ratings_by_year': draw_ratings_by_year,
+    'top_genres': draw_top_genres,
+}
+
+
+def render_chart(data, name, file_path):
+    """
+    Draws a chart on its own figure and saves it.
+
+    The figure is not registered with pyplot, so no global state is
+    touched, and it is cleared after saving, so nothing of it outlives
+    the call.
+
+    Args:
+    data (ChartData): The aggregates.
+    name (str): One of CHART_NAMES.
+    file_path (str): The image file, its extension selects the format.
+
+    Returns:
+    None
+    """
+    figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+    FigureCanvasAgg(figure)
+    try:
+        CHARTS[name](figure.add_subplot(), data)
+        figure.tight_layout()
+        figure.savefig(file_path)
+    finally:
+        figure.clear()
+
+
+def export_charts(data, output_dir, names=CHART_NAMES, image_format=DEFAULT_FORMAT):
+    """
+    Saves several charts of the same aggregates into a directory.
+
+    Args:
+    data (ChartData): The aggregates.
+    output_dir (str): The directory to save the charts in, created if needed.
+    names (iterable): The charts to save, see CHART_NAMES.
+    image_format (str): The image format, e.g. 'png' or 'svg'.
+
+    Returns:
+    dict: The path of every saved chart keyed by name.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for name in names:
+        paths[name] = os.path.join(output_dir, f"{name}.{image_format}")
+        render_chart(data, name, paths[name])
+    return paths
+
+
+def main():
+    """
+    Saves all charts of a storage, e.g. python charts.py data.json charts/
+    """
+    from main import get_storage
+    parser = argparse.ArgumentParser(description="Save charts of the movie ratings")
+    parser.add_argument('storage', help="movie storage file: .json, .csv, .db, .sqlite or .mbin")
+    parser.add_argument('output_dir', help="directory to save the charts in")
+    parser.add_argument('--format', default=DEFAULT_FORMAT, help="image format, e.g. png or svg")
+    parser.add_argument('--chart', action='append', choices=CHART_NAMES,
+                        help="chart to save, may be repeated, all charts by default")
+    args = parser.parse_args()
+    try:
+        storage = get_storage(args.storage)
+    except ValueError as error:
+        parser.error(str(error))
+    try:
+        data = ChartData.from_movies(storage.iter_movies(fields=CHART_FIELDS))
+    finally:
+        storage.close()
+    for name, path in export_charts(data, args.output_dir, args.chart or CHART_NAMES, args.format).items():
+        print(f"{name} saved as {path}")
+
+
+if __name__ == "__main__":
+    main()
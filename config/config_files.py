@@ -1,10 +1,24 @@
 import os
 from dataclasses import dataclass
-from dotenv import load_dotenv, find_dotenv
+from functools import lru_cache
 
 
-load_dotenv(find_dotenv())
 @dataclass(frozen=True)
 class APIkeys:
-    APIkey: str = os.getenv('apiKey')
-    
\ No newline at end of file
+    APIkey: str = None
+
+
+@lru_cache(maxsize=None)
+def get_api_keys():
+    """
+    Loads the .env file on first use and returns the API keys.
+
+    Searching for the .env file walks up the directory tree, so it is not
+    done at import time but only when a command talks to the OMDB API.
+
+    Returns:
+    APIkeys: The API keys read from the environment.
+    """
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv())
+    return APIkeys(APIkey=os.getenv('apiKey'))
@@ -0,0 +1,258 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from main import get_storage
+from movie_record import COERCIONS
+from rating_index import to_rating
+from storage_binary import StorageBinary
+from storage_sqlite import SCHEMA
+from write_behind import atomic_open
+
+CSV_FIELDS = ['title', 'year_of_release', 'rating', 'poster', 'plot', 'genre', 'director']
+TEXT_FIELDS = ('poster', 'plot', 'genre', 'director')
+REPORT_INTERVAL = 1.0
+
+
+def normalize_movie(movie):
+    """
+    Converts the movie details of any storage to the common schema.
+
+    Ratings become floats, e.g. the strings of a CSV file, or None if they
+    are not numbers. Years become ints where they are numbers, empty values
+    become None and 'notes' is only kept if it is set.
+
+    Args:
+    movie (dict): The movie details as yielded by IStorage.iter_movies.
+
+    Returns:
+    dict: The movie details in the format of the JSON storage.
+    """
+    movie = dict(movie.items())
+    year = movie.get('year_of_release')
+    normalized = {
+        'year_of_release': None if year in (None, '') else COERCIONS['year_of_release'](year),
+        'rating': to_rating(movie.get('rating')),
+    }
+    for field in TEXT_FIELDS:
+        normalized[field] = movie.get(field)
+    if movie.get('notes'):
+        normalized['notes'] = movie['notes']
+    return normalized
+
+
+def _with_progress(movies, report, interval=REPORT_INTERVAL):
+    """
+    Passes the movies through and reports the progress about once per interval.
+
+    Args:
+    movies (iterable): (title, movie details) tuples.
+    report (callable): Called with the number of movies so far and the elapsed seconds.
+    interval (float): Seconds between two reports.
+
+    Returns:
+    generator: The same tuples.
+    """
+    start = time.perf_counter()
+    next_report = start + interval
+    count = 0
+    for item in movies:
+        yield item
+        count += 1
+        if count % 1000 == 0 and time.perf_counter() >= next_report:
+            report(count, time.perf_counter() - start)
+            next_report = time.perf_counter() + interval
+
+
+def write_movies(file_path, movies):
+    """
+    Writes movies in the format of the storage matching the extension,
+    one at a time, so memory stays flat for catalogs of any size.
+
+    The movies are written to a temporary file which replaces the target
+    once all of them are written, so a failed conversion leaves no partial
+    catalog behind. CSV files have no 'notes' column, like StorageCsv.
+
+    Args:
+    file_path (str): The .json, .csv, .db, .sqlite or .mbin file to write.
+    movies (iterable): (title, movie details) tuples in the format of the JSON storage.
+
+    Returns:
+    None
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.json':
+        with atomic_open(file_path) as file:
+            file.write('{')
+            for number, (title, movie) in enumerate(movies):
+                file.write(',\n' if number else '\n')
+                file.write(f"    {json.dumps(title)}: {json.dumps(movie)}")
+            file.write('\n}')
+    elif extension == '.csv':
+        with atomic_open(file_path, newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            for title, movie in movies:
+                writer.writerow({'title': title, **movie})
+    elif extension in ('.db', '.sqlite'):
+        _write_replacing(file_path, (), lambda temp_path: _write_sqlite(temp_path, movies))
+    elif extension == '.mbin':
+        _write_replacing(file_path, ('.idx',), lambda temp_path: _write_binary(temp_path, movies))
+    else:
+        raise ValueError(f"Unsupported storage file '{file_path}'")
+
+
+def _write_replacing(file_path, suffixes, write):
+    """
+    Lets a writer create a storage under a temporary name and moves it,
+    with its sidecar files, to the target once it is complete.
+
+    Args:
+    file_path (str): The target file.
+    suffixes (tuple): Suffixes of the sidecar files, e.g. '.idx'.
+    write (callable): Called with the temporary path.
+
+    Returns:
+    None
+    """
+    temp_path = f"{file_path}.tmp"
+    paths = [''] + list(suffixes)
+    try:
+        write(temp_path)
+        for suffix in paths:
+            os.replace(temp_path + suffix, file_path + suffix)
+    finally:
+        for suffix in paths + ['.lock']:
+            if os.path.exists(temp_path + suffix):
+                os.remove(temp_path + suffix)
+
+
+def _write_sqlite(file_path, movies):
+    """
+    Writes movies into a new SQLite database in a single transaction.
+
+    Args:
+    file_path (str): The database file to create.
+    movies (iterable): (title, movie details) tuples.
+
+    Returns:
+    None
+    """
+    connection = sqlite3.connect(file_path)
+    try:
+        # The file only replaces the target once it is complete, so it needs no journal
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO movies "
+                "(title, year_of_release, rating, poster, plot, genre, director, notes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((title, movie.get('year_of_release'), movie.get('rating'), movie.get('poster'),
+                  movie.get('plot'), movie.get('genre'), movie.get('director'), movie.get('notes'))
+                 for title, movie in movies)
+            )
+    finally:
+        connection.close()
+
+
+def _write_binary(file_path, movies):
+    """
+    Appends movies to a new binary storage under a single lock.
+
+    Args:
+    file_path (str): The binary file to create.
+    movies (iterable): (title, movie details) tuples.
+
+    Returns:
+    None
+    """
+    storage = StorageBinary(file_path)
+    try:
+        storage.append_movies(movies)
+    finally:
+        storage.close()
+
+
+def convert(source_path, target_path, report=None):
+    """
+    Streams all movies of one storage into a new storage of any format,
+    normalizing the schema on the way.
+
+    Args:
+    source_path (str): The storage to read, any format of main.STORAGE_TYPES.
+    target_path (str): The storage to create, it must not exist yet.
+    report (callable): Optional progress callback, called with the number
+        of movies converted so far and the elapsed seconds.
+
+    Returns:
+    dict: The number of movies, the seconds taken and the movies per second.
+    """
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Source storage '{source_path}' does not exist")
+    if os.path.exists(target_path):
+        raise FileExistsError(f"Target storage '{target_path}' already exists")
+    source = get_storage(source_path)
+    count = 0
+
+    def normalized():
+        nonlocal count
+        for title, movie in source.iter_movies():
+            count += 1
+            yield title, normalize_movie(movie)
+
+    movies = normalized()
+    if report is not None:
+        movies = _with_progress(movies, report)
+    start = time.perf_counter()
+    try:
+        write_movies(target_path, movies)
+    finally:
+        source.close()
+    seconds = time.perf_counter() - start
+    return {
+        'movies': count,
+        'seconds': seconds,
+        'movies_per_second': count / seconds if seconds else 0.0,
+    }
+
+
+def print_progress(count, seconds):
+    """
+    Prints the progress of a conversion on one updating line of stderr.
+
+    Args:
+    count (int): The number of movies converted so far.
+    seconds (float): The elapsed seconds.
+
+    Returns:
+    None
+    """
+    print(f"\r{count:,} movies, {count / seconds:,.0f} movies/s", end='', file=sys.stderr, flush=True)
+
+
+def main():
+    """
+    Converts a storage into another format, e.g. python convert.py data.json movies.mbin
+    """
+    parser = argparse.ArgumentParser(description="Convert a movie storage into another format")
+    parser.add_argument('source', help="storage to read: .json, .csv, .db, .sqlite or .mbin")
+    parser.add_argument('target', help="storage to create: .json, .csv, .db, .sqlite or .mbin")
+    parser.add_argument('--quiet', action='store_true', help="do not report the progress")
+    args = parser.parse_args()
+    try:
+        result = convert(args.source, args.target, None if args.quiet else print_progress)
+    except (ValueError, OSError) as error:
+        parser.error(str(error))
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Converted {result['movies']} movies to {args.target} in {result['seconds']:.2f} s "
+          f"({result['movies_per_second']:,.0f} movies/s)")
+
+
+if __name__ == "__main__":
+    main()
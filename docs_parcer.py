@@ -1,3 +1,6 @@
+import re
+
+
 def read_html(file_path):
     """Load HTML file
 
@@ -19,4 +22,34 @@ def write_new_html(data, html_name):
         html_name (string): name of the file
     """
     with open(html_name, 'w') as file:
-        file.write(data)
\ No newline at end of file
+        file.write(data)
+
+
+def compile_template(html, placeholders):
+    """Split an html template once into literal parts and placeholder slots
+
+    Args:
+        html (string): html template
+        placeholders (list): placeholder names, e.g. '__MOVIE_NAME__'
+
+    Returns:
+        list: literal strings at even and placeholder names at odd positions
+    """
+    pattern = '(' + '|'.join(re.escape(placeholder) for placeholder in placeholders) + ')'
+    return re.split(pattern, html)
+
+
+def fill_template(compiled_template, values):
+    """Fill the placeholder slots of a compiled template with a single join
+
+    Args:
+        compiled_template (list): template returned by compile_template
+        values (dict): text for every placeholder name
+
+    Returns:
+        string: html with the placeholders replaced
+    """
+    parts = compiled_template[:]
+    for index in range(1, len(parts), 2):
+        parts[index] = values[parts[index]]
+    return ''.join(parts)
@@ -0,0 +1,192 @@
+import functools
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where msvcrt only offers exclusive locks
+    fcntl = None
+    import msvcrt
+
+GENERATION_WIDTH = 20
+
+
+def _lock(file, shared):
+    """
+    Blocks until the process holds the OS lock on an open file.
+
+    Args:
+    file: The open lock file.
+    shared (bool): Take a shared (read) lock instead of an exclusive one.
+
+    Returns:
+    None
+    """
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+    else:
+        # The byte after the generation, so the generation stays readable
+        file.seek(GENERATION_WIDTH)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock(file):
+    """
+    Releases the OS lock on an open file.
+
+    Args:
+    file: The open lock file.
+
+    Returns:
+    None
+    """
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(GENERATION_WIDTH)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def file_signature(file_path):
+    """
+    Returns what changes whenever a file is rewritten, replaced or appended to.
+
+    Args:
+    file_path (str): The file to look at.
+
+    Returns:
+    tuple or None: The modification time, size and inode, None if the file does not exist.
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def locked_write(method):
+    """
+    Runs a storage mutation under the exclusive file lock, on the movies as
+    they are on disk, so a concurrent writer can never be overwritten.
+
+    The storage provides _file_lock (a FileLock) and _refresh, which reloads
+    the movies if another process changed the file.
+
+    Args:
+    method (callable): The mutating storage method.
+
+    Returns:
+    callable: The locked method.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._file_lock.locked():
+            self._refresh()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class FileLock:
+    """
+    A lock shared by all processes using the same storage file, kept in a
+    sidecar '<file>.lock' file, which also holds the generation counter of
+    the storage.
+
+    The lock is reentrant within a thread and other threads of the same
+    process wait for it like other processes do. Writers bump the
+    generation under the exclusive lock, so readers can tell that the
+    storage changed even if the modification time did not.
+
+    Args:
+    file_path (str): The storage file to protect.
+
+    Methods:
+    - locked: Holds the shared or exclusive lock for a with block.
+    - read_generation: Returns the generation counter.
+    - bump_generation: Increments the generation counter.
+    """
+
+    def __init__(self, file_path):
+        """
+        Initializes a new instance of the class.
+
+        Args:
+        file_path (str): The storage file to protect.
+
+        Returns:
+        None
+        """
+        self.path = f"{file_path}.lock"
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._shared = False
+        self._file = None
+
+
+    @contextmanager
+    def locked(self, shared=False):
+        """
+        Holds the lock for a with block. Nested blocks of the same thread
+        reuse the lock, a nested exclusive block upgrades a shared one.
+
+        Args:
+        shared (bool): Several readers may hold a shared lock at once.
+
+        Returns:
+        contextmanager: The held lock.
+        """
+        with self._thread_lock:
+            if self._depth == 0:
+                self._file = open(self.path, 'a+b')
+                try:
+                    _lock(self._file, shared)
+                except BaseException:
+                    self._file.close()
+                    self._file = None
+                    raise
+                self._shared = shared
+            elif self._shared and not shared:
+                _lock(self._file, False)
+                self._shared = False
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    _unlock(self._file)
+                    self._file.close()
+                    self._file = None
+
+
+    def read_generation(self):
+        """
+        Returns the generation counter, which every writer increments.
+
+        Returns:
+        int: The generation, 0 if no process wrote yet.
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                return int(file.read(GENERATION_WIDTH) or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+
+    def bump_generation(self):
+        """
+        Increments the generation counter, the caller holds the exclusive lock.
+
+        Returns:
+        int: The new generation.
+        """
+        generation = self.read_generation() + 1
+        descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT)
+        try:
+            # A single fixed-width write, so readers never see a partial number
+            os.write(descriptor, f"{generation:0{GENERATION_WIDTH}d}".encode('ascii'))
+        finally:
+            os.close(descriptor)
+        return generation
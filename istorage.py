@@ -1,4 +1,44 @@
+import heapq
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from movie_record import MOVIE_FIELDS, to_year
+from rating_index import RatingIndex, to_rating
+
+# Converts the values of the numeric columns, anything which is not a number becomes NaN
+NUMERIC_FIELDS = {'rating': to_rating, 'year_of_release': to_year}
+
+def project_fields(movie, fields):
+    """Return the movie details limited to the given fields.
+
+    Args:
+    movie (dict): The movie details.
+    fields (iterable): The wanted fields, None for all fields.
+
+    Returns:
+    dict: The selected movie details, fields the movie does not have are left out.
+    """
+    if fields is None:
+        return movie
+    return {field: movie[field] for field in fields if field in movie}
+
+
+def to_column(field, values):
+    """Return the values of a field of all movies as a column.
+
+    Args:
+    field (str): The movie field.
+    values (list): The stored values of the field.
+
+    Returns:
+    np.ndarray or list: A float array with NaN where a value is missing or
+        not a number for the NUMERIC_FIELDS, otherwise the values.
+    """
+    convert = NUMERIC_FIELDS.get(field)
+    if convert is None:
+        return values
+    import numpy as np
+    return np.fromiter((convert(value) for value in values), dtype=np.float64, count=len(values))
+
 
 class IStorage(ABC):
     """An abstract base class representing a storage interface for movies."""
@@ -62,5 +102,200 @@ class IStorage(ABC):
 
         Returns:
         None
+
+        Raises:
+        ValueError: If the rating is not a number, nothing is changed then.
+        """
+        pass
+
+
+    def add_movies(self, movies):
+        """Add several movies to the storage at once.
+
+        Storages override this to persist all movies with a single write.
+
+        Args:
+        movies (list): Dictionaries with the keyword arguments of add_movie.
+
+        Returns:
+        None
+        """
+        for movie in movies:
+            self.add_movie(**movie)
+
+
+    def close(self):
+        """Write pending changes and release the resources of the storage.
+
+        Storages which write in the background or hold a connection override
+        this, the default has nothing to release.
+
+        Returns:
+        None
+        """
+        pass
+
+
+    def generation(self):
+        """Return a value which changes whenever the movies change.
+
+        Caches of data derived from the movies, e.g. rendered pages, compare
+        it to tell whether they are still valid. Storages override this, the
+        default cannot tell and returns None.
+
+        Returns:
+        hashable or None: The current generation, None if it is unknown.
+        """
+        return None
+
+
+    def get_movie(self, title):
+        """Return the details of the movie with exactly the given title.
+
+        Storages override this to look the title up instead of scanning.
+
+        Args:
+        title (str): The title of the movie.
+
+        Returns:
+        dict or None: The movie details, None if there is no such movie.
+        """
+        for stored_title, movie in self.iter_movies():
+            if stored_title == title:
+                return movie
+        return None
+
+
+    @contextmanager
+    def batch(self):
+        """Group several mutations into one write.
+
+        Storages override this to apply the mutations in memory or in one
+        transaction, write them once when the with block exits and roll them
+        back if an exception leaves it. The default writes every mutation
+        as it happens.
+
+        Returns:
+        contextmanager: The batch, e.g. with storage.batch(): ...
+        """
+        yield self
+
+
+    def search_movies(self, query):
+        """Return the movies whose title contains the query, ignoring the case.
+
+        Storages override this to answer the query from an index.
+
+        Args:
+        query (str): The part of the movie title to search for.
+
+        Returns:
+        dict: The matching movies keyed by title.
+        """
+        query = query.lower()
+        return {title: movie for title, movie in self.list_movies().items()
+                if query in title.lower()}
+
+
+    def rating_stats(self):
+        """Return statistics about the ratings of all movies.
+
+        Storages override this to answer from running aggregates.
+
+        Returns:
+        dict or None: count, average, median, best and worst, where best and
+            worst are (title, rating) tuples, or None if there are no ratings.
+        """
+        ratings = ((title, movie['rating']) for title, movie in self.list_movies().items())
+        return RatingIndex(ratings).summary()
+
+
+    def movies_by_rating(self, limit, cursor=None, descending=True):
+        """Return one page of movies ordered numerically by rating.
+
+        Ties are ordered by title. Movies without a numeric rating are left
+        out. Storages override this to read the page from a sorted index.
+
+        Args:
+        limit (int): The maximum number of movies on the page.
+        cursor (tuple): The cursor returned with the previous page, None for the first page.
+        descending (bool): Start with the best rating.
+
+        Returns:
+        tuple: The list of (title, rating) tuples and the cursor of the next
+            page, which is None after the last page.
+        """
+        entries = ((to_rating(movie['rating']), title)
+                   for title, movie in self.list_movies().items())
+        entries = (entry for entry in entries if entry[0] is not None)
+        if cursor is not None:
+            cursor = tuple(cursor)
+            if descending:
+                entries = (entry for entry in entries if entry < cursor)
+            else:
+                entries = (entry for entry in entries if entry > cursor)
+        select = heapq.nlargest if descending else heapq.nsmallest
+        page = select(limit + 1, entries)
+        next_cursor = page[limit - 1] if len(page) > limit else None
+        return [(title, rating) for rating, title in page[:limit]], next_cursor
+
+
+    def top_k(self, k):
+        """Return the k best rated movies.
+
+        Args:
+        k (int): The number of movies.
+
+        Returns:
+        list: (title, rating) tuples, best first.
+        """
+        return self.movies_by_rating(k)[0]
+
+
+    def bottom_k(self, k):
+        """Return the k worst rated movies.
+
+        Args:
+        k (int): The number of movies.
+
+        Returns:
+        list: (title, rating) tuples, worst first.
+        """
+        return self.movies_by_rating(k, descending=False)[0]
+
+
+    def iter_movies(self, fields=None):
+        """Yield the movies one at a time for commands which need a single pass.
+
+        Storages override this to stream the movies from their file instead
+        of building the whole catalog in memory.
+
+        Args:
+        fields (iterable): The movie fields to yield, None for all fields.
+
+        Returns:
+        generator: (title, movie details) tuples.
+        """
+        for title, movie in self.list_movies().items():
+            yield title, project_fields(movie, fields)
+
+
+    def columns(self, fields):
+        """Return some fields of all movies column by column, e.g. for analytics.
+
+        Storages override this to read only these columns in one pass
+        without building the movie details.
+
+        Args:
+        fields (iterable): The movie fields to read.
+
+        Returns:
+        dict: The column of every field in the order of iter_movies, see
+            to_column, the numeric fields as NumPy arrays.
         """
-        pass
\ No newline at end of file
+        fields = tuple(field for field in fields if field in MOVIE_FIELDS)
+        values = {field: [] for field in fields}
+        for _, movie in self.iter_movies(fields=fields):
+            for field in fields:
+                values[field].append(movie.get(field))
+        return {field: to_column(field, column) for field, column in values.items()}
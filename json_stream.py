@@ -0,0 +1,83 @@
+import json
+
+CHUNK_SIZE = 64 * 1024
+DELIMITERS = ',:}] \t\r\n'
+
+
+def iter_object_items(file, chunk_size=CHUNK_SIZE):
+    """
+    Yields the items of the top-level JSON object of a file one at a time.
+
+    Only the current item is kept in memory, so a catalog file of any size
+    can be read in one pass, e.g. '{"Titanic": {...}, "Up": {...}}' yields
+    ("Titanic", {...}) and ("Up", {...}).
+
+    Args:
+    file: A text file opened for reading.
+    chunk_size (int): The number of characters read at once.
+
+    Returns:
+    generator: (key, value) tuples in file order.
+
+    Raises:
+    json.JSONDecodeError: If the file does not hold a JSON object.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    end_of_file = False
+
+    def read_more():
+        nonlocal buffer, position, end_of_file
+        chunk = file.read(chunk_size)
+        if not chunk:
+            end_of_file = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def next_char():
+        # Skips whitespace and returns the next character without consuming it
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if end_of_file:
+                return ''
+            read_more()
+
+    def decode():
+        # Decodes the value at the position, a value is only complete once
+        # a delimiter follows it, otherwise e.g. a number could be cut off
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                if end_of_file or (end < len(buffer) and buffer[end] in DELIMITERS):
+                    position = end
+                    return value
+            except json.JSONDecodeError:
+                if end_of_file:
+                    raise
+            read_more()
+
+    if next_char() != '{':
+        raise json.JSONDecodeError("Expecting '{'", buffer, position)
+    position += 1
+    if next_char() == '}':
+        return
+    while True:
+        key = decode()
+        if next_char() != ':':
+            raise json.JSONDecodeError("Expecting ':'", buffer, position)
+        position += 1
+        next_char()
+        yield key, decode()
+        separator = next_char()
+        position += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise json.JSONDecodeError("Expecting ',' or '}'", buffer, position - 1)
+        next_char()
@@ -1,22 +1,99 @@
+import argparse
+import os
 from storage_json import StorageJson
 from movie_app import MovieApp
 from storage_csv import StorageCsv
+from storage_binary import StorageBinary
+from storage_sqlite import StorageSqlite
+from write_behind import DURABILITY_LEVELS
+
+STORAGE_TYPES = {
+    '.json': StorageJson,
+    '.csv': StorageCsv,
+    '.db': StorageSqlite,
+    '.sqlite': StorageSqlite,
+    '.mbin': StorageBinary,
+}
+
+
+def get_storage(file_path, durability=None):
+    """
+    Creates the storage matching the extension of the file.
+
+    Args:
+    file_path (str): The path of the movie storage file (.json, .csv, .db, .sqlite or .mbin).
+    durability (str): When a JSON or CSV storage saves, see write_behind.DURABILITY_LEVELS.
+
+    Returns:
+    IStorage: The storage for the file.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in STORAGE_TYPES:
+        raise ValueError(f"Unsupported storage file '{file_path}', "
+                         f"use one of: {', '.join(STORAGE_TYPES)}")
+    storage_class = STORAGE_TYPES[extension]
+    if durability is None:
+        return storage_class(file_path)
+    if storage_class is StorageSqlite:
+        raise ValueError("SQLite storages commit every change, --durability is not supported")
+    if storage_class is StorageBinary:
+        raise ValueError("Binary storages write every change in place, --durability is not supported")
+    return storage_class(file_path, durability=durability)
 
 
 def main():
     """
     The main function for the movie application.
-    
-    Creates a StorageJson instance with the filename "data.json",
-    creates a MovieApp instance using the created StorageJson instance,
-    and then calls the run method to start the movie application.
-    """ 
-    storage2 = StorageCsv("mom.csv")
-    movies = MovieApp(storage2)
-    movies.run()
-    # storage = StorageJson("data.json")
-    # movies = MovieApp(storage)
-    # movies.run()
+
+    Creates the storage for the given file (mom.csv by default),
+    optionally imports a JSON or CSV file into a SQLite storage,
+    creates a MovieApp instance using the created storage,
+    and then calls the run method to start the movie application,
+    or serves the movies over HTTP with --serve.
+    Pending changes, and the metrics if they are enabled, are written when the application ends.
+    """
+    parser = argparse.ArgumentParser(description="My Movies Database")
+    parser.add_argument('storage', nargs='?', default='mom.csv',
+                        help="movie storage file: .json, .csv, .db, .sqlite or .mbin")
+    parser.add_argument('--import', dest='import_path',
+                        help="JSON or CSV file to import into a SQLite storage")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="time the commands and storage operations and write the metrics on exit, "
+                             "in the Prometheus text format for .prom files, as JSON otherwise")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="with --metrics, also measure the peak memory of every call")
+    parser.add_argument('--durability', choices=DURABILITY_LEVELS,
+                        help="when a JSON or CSV storage saves: before every change returns "
+                             "(immediate, default), in the background (group-commit) or on exit (on-exit)")
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help="serve the movies as a website and JSON API on this port instead of the menu")
+    parser.add_argument('--host', default='127.0.0.1', help="with --serve, the address to listen on")
+    args = parser.parse_args()
+
+    try:
+        storage = get_storage(args.storage, args.durability)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.import_path:
+        if not isinstance(storage, StorageSqlite):
+            parser.error("--import is only supported for SQLite storages")
+        imported = storage.import_movies(get_storage(args.import_path))
+        print(f"Imported {imported} movies from {args.import_path}")
+    metrics = None
+    if args.metrics:
+        from metrics import Metrics
+        metrics = Metrics(trace_memory=args.trace_memory)
+    movies = MovieApp(storage, metrics=metrics)
+    try:
+        if args.serve is not None:
+            import web_server
+            web_server.serve(storage, args.host, args.serve)
+        else:
+            movies.run()
+    finally:
+        movies.close()
+        if metrics is not None:
+            metrics.save(args.metrics)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,465 @@
+import functools
+import inspect
+import json
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from istorage import IStorage
+
+# Upper bounds in seconds of the latency histogram buckets, like Prometheus histograms
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+PROC_IO_PATH = '/proc/self/io'
+METRIC_PREFIX = 'movie_app'
+# batch returns a context manager, timing the call itself would measure nothing
+SKIPPED_STORAGE_METHODS = ('batch',)
+STORAGE_HOOKS = ('_load_data', '_save_data')
+
+
+def _io_counters():
+    """
+    Returns the bytes the process read and wrote so far, files and sockets.
+
+    Returns:
+    tuple or None: (bytes read, bytes written), or None where the platform
+        does not expose the counters.
+    """
+    try:
+        with open(PROC_IO_PATH, 'rb') as file:
+            counters = dict(line.split(b': ') for line in file.read().splitlines())
+        return int(counters[b'rchar']), int(counters[b'wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class OperationStats:
+    """
+    The collected measurements of one instrumented operation.
+
+    Methods:
+    - record: Adds the measurements of one call.
+    - percentile: Estimates a latency percentile from the histogram.
+    - to_dict: Returns the measurements as a dictionary.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the class.
+
+        Returns:
+        None
+        """
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak_memory = None
+
+
+    def record(self, seconds, failed, io_delta, peak_memory):
+        """
+        Adds the measurements of one call.
+
+        Args:
+        seconds (float): The duration of the call.
+        failed (bool): Whether the call raised an exception.
+        io_delta (tuple): Bytes read and written during the call, or None.
+        peak_memory (int): The traced peak memory of the call in bytes, or None.
+
+        Returns:
+        None
+        """
+        self.calls += 1
+        self.errors += failed
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if io_delta is not None:
+            self.bytes_read += io_delta[0]
+            self.bytes_written += io_delta[1]
+        if peak_memory is not None:
+            self.peak_memory = max(self.peak_memory or 0, peak_memory)
+
+
+    def percentile(self, percent):
+        """
+        Estimates a latency percentile as the upper bound of its histogram bucket.
+
+        Args:
+        percent (float): The percentile, e.g. 95.
+
+        Returns:
+        float: The latency in seconds, the maximum for the last bucket.
+        """
+        rank = self.calls * percent / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+
+    def to_dict(self):
+        """
+        Returns the measurements as a dictionary.
+
+        Returns:
+        dict: Calls, errors, latencies, the histogram, bytes and peak memory.
+        """
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_seconds': self.total_seconds,
+            'mean_seconds': self.total_seconds / self.calls if self.calls else 0.0,
+            'max_seconds': self.max_seconds,
+            'p95_seconds': self.percentile(95),
+            'histogram': {str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'peak_memory_bytes': self.peak_memory,
+        }
+
+
+class Metrics:
+    """
+    Opt-in timing of the app commands and the storage operations.
+
+    Instrumented methods are wrapped on the instance, so nothing is measured
+    unless the app is started with metrics. Every call records its latency
+    in a histogram, the bytes the process read and wrote meanwhile, and with
+    trace_memory the peak of the Python memory allocated during the call.
+    Nested calls are measured inclusively, e.g. a command includes the
+    storage operations it runs.
+
+    Args:
+    trace_memory (bool): Measure the peak memory of every call with tracemalloc.
+
+    Methods:
+    - instrument: Wraps methods of an object with measurements.
+    - instrument_app: Instruments the commands of a MovieApp and its storage.
+    - measure: Runs a function and records its measurements.
+    - snapshot: Returns the measurements of all operations.
+    - to_json / save: Exports the measurements as JSON.
+    - to_prometheus: Exports the measurements in the Prometheus text format.
+    - summary_lines: Formats the measurements as a table.
+    """
+
+    def __init__(self, trace_memory=False):
+        """
+        Initializes a new instance of the class and starts tracemalloc if requested.
+
+        Returns:
+        None
+        """
+        self.trace_memory = trace_memory
+        self._operations = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+    def measure(self, name, function, *args, **kwargs):
+        """
+        Runs a function and records its latency, I/O and memory under a name.
+
+        Args:
+        name (str): The operation name, e.g. 'storage.add_movie'.
+        function (callable): The function to run.
+
+        Returns:
+        The return value of the function.
+        """
+        token = self._begin(self.trace_memory)
+        failed = True
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            self._end(name, token, failed)
+
+
+    def _measure_iteration(self, name, generator):
+        """
+        Yields the items of a generator and records the measurements of the
+        whole iteration, which ends when the generator is exhausted or closed.
+        The time the consumer spends between the items is included, the peak
+        memory is not traced because the consumer runs in between.
+
+        Args:
+        name (str): The operation name, e.g. 'storage.iter_movies'.
+        generator (generator): The generator returned by the method.
+
+        Returns:
+        generator: The items of the generator.
+        """
+        token = self._begin(False)
+        failed = True
+        try:
+            yield from generator
+            failed = False
+        except GeneratorExit:
+            # The consumer stopped early, e.g. a random pick or a single page
+            failed = False
+            raise
+        finally:
+            self._end(name, token, failed)
+
+
+    def _begin(self, trace_memory):
+        """
+        Starts the measurements of a call.
+
+        Args:
+        trace_memory (bool): Measure the peak memory of the call.
+
+        Returns:
+        tuple: The state handed to _end.
+        """
+        memory_stack = self._memory_enter() if trace_memory else None
+        return memory_stack, _io_counters(), time.perf_counter()
+
+
+    def _end(self, name, token, failed):
+        """
+        Ends the measurements of a call and records them.
+
+        Args:
+        name (str): The operation name.
+        token (tuple): The state returned by _begin.
+        failed (bool): Whether the call raised an exception.
+
+        Returns:
+        None
+        """
+        memory_stack, io_before, start = token
+        seconds = time.perf_counter() - start
+        io_after = _io_counters()
+        io_delta = None
+        if io_before is not None and io_after is not None:
+            io_delta = (io_after[0] - io_before[0], io_after[1] - io_before[1])
+        peak_memory = self._memory_exit(memory_stack)
+        with self._lock:
+            stats = self._operations.setdefault(name, OperationStats())
+            stats.record(seconds, failed, io_delta, peak_memory)
+
+
+    def _memory_enter(self):
+        """
+        Starts the peak memory measurement of a call.
+
+        tracemalloc has a single peak per process, so the peak seen so far is
+        handed to the enclosing call before it is reset for the nested one.
+
+        Returns:
+        list: The measurement stack of the thread.
+        """
+        stack = getattr(self._local, 'memory_stack', None)
+        if stack is None:
+            stack = self._local.memory_stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, current])
+        return stack
+
+
+    def _memory_exit(self, stack):
+        """
+        Ends the peak memory measurement of a call.
+
+        Args:
+        stack (list): The measurement stack returned by _memory_enter, or None.
+
+        Returns:
+        int or None: The bytes allocated at the peak of the call, None if not traced.
+        """
+        if stack is None:
+            return None
+        start, peak = stack.pop()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        return peak - start
+
+
+    def _wrap(self, name, method):
+        """
+        Returns a wrapper of a bound method which measures every call.
+
+        Args:
+        name (str): The operation name.
+        method (callable): The bound method.
+
+        Returns:
+        callable: The measuring wrapper.
+        """
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def generator_wrapper(*args, **kwargs):
+                return self._measure_iteration(name, method(*args, **kwargs))
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            return self.measure(name, method, *args, **kwargs)
+        return wrapper
+
+
+    def instrument(self, obj, prefix, names):
+        """
+        Wraps methods of an object with measurements, on the instance only.
+
+        Args:
+        obj (object): The object, e.g. a MovieApp or a storage.
+        prefix (str): The prefix of the operation names, e.g. 'storage'.
+        names (iterable): The names of the methods to wrap, missing ones are skipped.
+
+        Returns:
+        None
+        """
+        for name in names:
+            method = getattr(obj, name, None)
+            if callable(method):
+                setattr(obj, name, self._wrap(f"{prefix}.{name}", method))
+
+
+    def instrument_app(self, app, storage):
+        """
+        Instruments every command of a MovieApp, the website generation, every
+        IStorage method of its storage and the storage's load and save.
+
+        Args:
+        app (MovieApp): The app.
+        storage (IStorage): The storage of the app.
+
+        Returns:
+        None
+        """
+        commands = [name for name in dir(app) if name.startswith('_command_')]
+        self.instrument(app, 'app', commands + ['_generate_website'])
+        storage_methods = [
+            name for name, value in vars(IStorage).items()
+            if callable(value) and not name.startswith('_') and name not in SKIPPED_STORAGE_METHODS
+        ]
+        self.instrument(storage, 'storage', storage_methods + list(STORAGE_HOOKS))
+
+
+    def snapshot(self):
+        """
+        Returns the measurements of all operations.
+
+        Returns:
+        dict: The measurements keyed by operation name, sorted by name.
+        """
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in sorted(self._operations.items())}
+
+
+    def to_json(self):
+        """
+        Returns the measurements as a JSON document.
+
+        Returns:
+        str: The JSON text.
+        """
+        return json.dumps({
+            'trace_memory': self.trace_memory,
+            'latency_buckets': [str(bound) for bound in LATENCY_BUCKETS],
+            'operations': self.snapshot(),
+        }, indent=2)
+
+
+    def to_prometheus(self):
+        """
+        Returns the measurements in the Prometheus text exposition format.
+
+        Returns:
+        str: The metrics text.
+        """
+        lines = [
+            f"# HELP {METRIC_PREFIX}_calls_total Calls per operation.",
+            f"# TYPE {METRIC_PREFIX}_calls_total counter",
+        ]
+        snapshot = self.snapshot()
+        for name, stats in snapshot.items():
+            lines.append(f'{METRIC_PREFIX}_calls_total{{operation="{name}"}} {stats["calls"]}')
+        lines += [
+            f"# HELP {METRIC_PREFIX}_errors_total Calls per operation which raised an exception.",
+            f"# TYPE {METRIC_PREFIX}_errors_total counter",
+        ]
+        for name, stats in snapshot.items():
+            lines.append(f'{METRIC_PREFIX}_errors_total{{operation="{name}"}} {stats["errors"]}')
+        lines += [
+            f"# HELP {METRIC_PREFIX}_latency_seconds Latency per operation.",
+            f"# TYPE {METRIC_PREFIX}_latency_seconds histogram",
+        ]
+        for name, stats in snapshot.items():
+            cumulative = 0
+            for bound, count in stats['histogram'].items():
+                cumulative += count
+                le = '+Inf' if bound == 'inf' else bound
+                lines.append(f'{METRIC_PREFIX}_latency_seconds_bucket{{operation="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_latency_seconds_sum{{operation="{name}"}} {stats["total_seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_latency_seconds_count{{operation="{name}"}} {stats["calls"]}')
+        for key, help_text in (('bytes_read', 'Bytes read by the process during the operation.'),
+                               ('bytes_written', 'Bytes written by the process during the operation.')):
+            lines += [
+                f"# HELP {METRIC_PREFIX}_{key}_total {help_text}",
+                f"# TYPE {METRIC_PREFIX}_{key}_total counter",
+            ]
+            for name, stats in snapshot.items():
+                lines.append(f'{METRIC_PREFIX}_{key}_total{{operation="{name}"}} {stats[key]}')
+        if self.trace_memory:
+            lines += [
+                f"# HELP {METRIC_PREFIX}_peak_memory_bytes Highest traced memory allocated by one call.",
+                f"# TYPE {METRIC_PREFIX}_peak_memory_bytes gauge",
+            ]
+            for name, stats in snapshot.items():
+                if stats['peak_memory_bytes'] is not None:
+                    lines.append(f'{METRIC_PREFIX}_peak_memory_bytes{{operation="{name}"}} '
+                                 f'{stats["peak_memory_bytes"]}')
+        return '\n'.join(lines) + '\n'
+
+
+    def save(self, file_path):
+        """
+        Writes the measurements to a file, in the Prometheus text format for
+        .prom and .txt files and as JSON otherwise.
+
+        Args:
+        file_path (str): The file to write.
+
+        Returns:
+        None
+        """
+        prometheus = file_path.endswith(('.prom', '.txt'))
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(self.to_prometheus() if prometheus else self.to_json())
+
+
+    def summary_lines(self):
+        """
+        Formats the measurements as a table, slowest operations first.
+
+        Returns:
+        list: The lines of the table.
+        """
+        snapshot = self.snapshot()
+        lines = [f"{'operation':32} {'calls':>6} {'errors':>6} {'mean ms':>10} {'p95 ms':>10} "
+                 f"{'max ms':>10} {'read KB':>10} {'written KB':>10} {'peak KB':>10}"]
+        for name, stats in sorted(snapshot.items(), key=lambda item: -item[1]['total_seconds']):
+            peak = stats['peak_memory_bytes']
+            lines.append(
+                f"{name:32} {stats['calls']:>6} {stats['errors']:>6} "
+                f"{stats['mean_seconds'] * 1000:>10.2f} {stats['p95_seconds'] * 1000:>10.2f} "
+                f"{stats['max_seconds'] * 1000:>10.2f} {stats['bytes_read'] / 1024:>10.1f} "
+                f"{stats['bytes_written'] / 1024:>10.1f} {'-' if peak is None else f'{peak / 1024:.1f}':>10}"
+            )
+        return lines
@@ -1,13 +1,13 @@
 import random
 import sys
-import matplotlib.pyplot as plt
-import requests
-import docs_parcer
-from config.config_files import APIkeys
-from storage_csv import StorageCsv
+from omdb_cache import OmdbCache
 
-INDEX_HTML_PATH = '_static/index_template.html'
-MOVIE_HTML_PATH = '_static/movie_template.html'
+# matplotlib, numpy, requests and the site builder take hundreds of milliseconds to import,
+# so they are imported inside the commands which need them instead of before the menu appears
+
+MAX_MENU_CHOICE = 15
+TOP_GROUPS = 10
+PAGE_SIZE = 20
 
 
 class MovieApp:
@@ -16,11 +16,14 @@ class MovieApp:
 
     Attributes:
     _storage: The storage object used for storing and retrieving movie data.
+    _omdb_cache: The on-disk cache of OMDB responses.
+    _metrics: The timing of the commands and storage operations, None if disabled.
 
     Methods:
     - _command_list_movies: Displays the list of movies along with their ratings and year of release from the storage.
     - response_parser: Parses the response from an HTTP request and returns the appropriate data or error message.
     - _command_add_movie: Allows the user to add a new movie to the storage using the OMDB API.
+    - _command_bulk_import: Allows the user to add many movies at once from a file of titles.
     - _command_delete_movie: Allows the user to delete a specific movie from the storage.
     - _command_update_movie: Allows the user to update the rating or notes for a specific movie.
     - _command_random_movie: Retrieves the movie data from the storage and selects a random movie to watch for the night.
@@ -28,153 +31,275 @@ class MovieApp:
     - _command_sorted_movies: Retrieves the movie data from the storage and prints the movies sorted by their ratings in descending order.
     - _command_movie_stats: Computes and prints various statistics based on the movie data obtained from the storage.
     - _command_creating_histogram: Creates a histogram based on the ratings of the movies obtained from the storage.
-    - generate_movie_page: Generates individual HTML pages for each movie based on the movie data stored in the movie storage.
+    - _command_rating_analytics: Prints vectorized rating analytics of the whole catalog.
+    - _command_group_analytics: Prints the movie count and mean rating of the top genres and directors.
+    - _command_metrics_summary: Prints the timing of the commands and storage operations.
     - _generate_website: Generate a website based on the movie data.
+    - _command_mirror_posters: Downloads the posters for the website and links the pages to the local copies.
+    - close: Writes the pending changes of the storage and of the OMDB cache.
     - exit_program: Exit the program.
     - get_user_input: Get user input for menu options and validate the input.
     - display_menu: Display the menu options for the program.
     - run: Main function to run the program and interact with the user.
     """
-    def __init__(self, storage):
+    def __init__(self, storage, omdb_cache=None, metrics=None):
         """
         Initializes a new instance of the class.
 
         Args:
         storage: The storage object to be used for storing and retrieving movie data.
+        omdb_cache (OmdbCache): The cache of OMDB responses, defaults to omdb_cache.json.
+        metrics (Metrics): Instruments the commands and the storage when given.
 
         Returns:
         None
         """
         self._storage = storage
+        self._omdb_cache = omdb_cache if omdb_cache is not None else OmdbCache()
+        self._metrics = metrics
+        self._title_resolver = None
+        self._resolver_generation = None
+        if metrics is not None:
+            metrics.instrument_app(self, storage)
+
+
+    def _titles(self):
+        """
+        Returns the title resolver shared by delete, update and the duplicate
+        checks of add and bulk import.
+
+        Building it reads every title, so _resolve only asks for it when a
+        typed title is not stored exactly. It is built again whenever the
+        storage changed without the app knowing, e.g. by another process.
+
+        Returns:
+        TitleResolver: The resolver over all stored titles.
+        """
+        from title_resolver import TitleResolver
+        generation = self._storage.generation()
+        if self._title_resolver is None or generation is None or generation != self._resolver_generation:
+            self._title_resolver = TitleResolver(title for title, _ in self._storage.iter_movies(fields=()))
+            self._resolver_generation = generation
+        return self._title_resolver
+
+
+    def _resolve(self, text):
+        """
+        Resolves a typed title to the stored title. A title typed exactly
+        as stored is looked up in the storage, only a miss builds the title
+        resolver, which needs all titles.
+
+        Args:
+        text (str): The title the user entered.
+
+        Returns:
+        str or None: The stored title, None if no title matches.
+        """
+        if self._storage.get_movie(text) is not None:
+            return text
+        return self._titles().resolve(text)
+
+
+    def _titles_changed(self, removed=None, added=None):
+        """
+        Applies a change the app made to the storage to the title resolver,
+        so it does not have to be rebuilt from the storage.
+
+        Args:
+        removed (str): The title which was deleted.
+        added (str): The title which was added.
+
+        Returns:
+        None
+        """
+        if self._title_resolver is None:
+            return
+        if removed is not None:
+            self._title_resolver.remove(removed)
+        if added is not None:
+            self._title_resolver.add(added)
+        self._resolver_generation = self._storage.generation()
+
+
+    def _print_not_found(self, title, titles):
+        """
+        Tells the user that no movie has the given title and lists the
+        closest titles, if there are any.
+
+        Args:
+        title (str): The title the user entered.
+        titles (TitleResolver): The resolver over all stored titles.
+
+        Returns:
+        None
+        """
+        print(f"Movie with title '{title}' not found.")
+        suggestions = titles.suggest(title)
+        if suggestions:
+            print("Did you mean: " + ", ".join(stored_title for stored_title, _ in suggestions) + "?")
 
 
     def _command_list_movies(self):
         """
         Displays the list of movies along with their ratings and year of release from the storage.
 
-        Retrieves the list of movies and their details from the storage and prints the total number of movies. Then, 
-        iterates through the movies and prints each movie's name, rating, and year of release.
+        Streams the movies from the storage in a single pass and prints each movie's name, rating, and year of
+        release, followed by the total number of movies.
 
         Returns:
             None
         """
-        movies_data = self._storage.list_movies()
-        length = len(movies_data)
-        print(f"\n{length} movies in total\n")
-        for movie_name, movie_data in movies_data.items():
-            print(f"{movie_name}: {movie_data['rating']}", 
+        length = 0
+        print()
+        for movie_name, movie_data in self._storage.iter_movies(fields=('rating', 'year_of_release')):
+            print(f"{movie_name}: {movie_data['rating']}",
                 f"{movie_data['year_of_release']}")
+            length += 1
+        print(f"\n{length} movies in total\n")
 
     @staticmethod
     def response_parser(resp):
         """
-        Parses the response from an HTTP request and
-        returns the appropriate data or error message.
+        Parses the response from an HTTP request and returns the appropriate data or error message.
+
+        Kept on the class for callers which parse OMDB responses through the app.
 
         Args:
-        resp (requests.Response): The response object
-            from the HTTP request.
+        resp (requests.Response): The response object from an HTTP request.
 
         Returns:
-        dict or str: If the response status code is OK
-                    and the JSON response indicates success,
-                    returns the JSON data.
-                    If the JSON response indicates failure,
-                    returns an error message.
-                    If the response status code is not OK,
-                    returns an error message with the status code.
-        """
-        if resp.status_code == requests.codes.ok:
-            if resp.json()['Response'] == 'False':
-                error_resp = resp.json()
-                return f"Error: {error_resp['Error']}"
-            else:
-                return resp.json()
-        else:
-            return f"Error: {resp.status_code}"
+        dict or str: The parsed JSON data or an error message.
+        """
+        import omdb_client
+        return omdb_client.response_parser(resp)
 
 
     def _command_add_movie(self):
         """
         Allows the user to add a new movie to the storage using the OMDB API.
 
-        Prompts the user to enter the name of the new movie. Checks if the movie already exists in the storage. If the movie
-        exists, it notifies the user; if not, it fetches details about the movie using the OMDB API, parses the response,
-        and then adds the movie along with its details to the storage.
+        Prompts the user to enter the name of the new movie. Checks if the movie already exists in the storage, ignoring
+        case, accents and punctuation. If the movie exists, it notifies the user; if not, it fetches details about the movie
+        using the OMDB API, parses the response, and then adds the movie along with its details to the storage, unless the
+        title OMDB returned is already stored.
 
         Returns:
             None
         """
+        import omdb_client
         movie = input("Enter new movie name: ")
-        all_movies = self._storage.list_movies()
-        if movie in all_movies:
-            print(f"Movie {movie} already exist!")
+        existing_title = self._resolve(movie)
+        if existing_title is not None:
+            print(f"Movie {existing_title} already exist!")
             return
-        api_url = f'http://www.omdbapi.com/?apikey={APIkeys.APIkey}&t={movie}'
-        response = requests.get(api_url)
-        parsed_resp = self.response_parser(response)
+        parsed_resp = omdb_client.fetch_movie(movie, cache=self._omdb_cache)
         if parsed_resp == 'Error: Movie not found!':
             print(f"The movie {movie} doesn't exist")
         elif type(parsed_resp) == str:
             print(parsed_resp)
         else:
-            rating = float(parsed_resp['Ratings'][0]['Value'].split('/')[0])
-            year_str = parsed_resp['Year'] 
-            year = year_str[0:4]
-            print(rating)
-            self._storage.add_movie(
-                parsed_resp['Title'],
-                year, 
-                rating, 
-                parsed_resp['Poster'],
-                parsed_resp['Plot'],
-                parsed_resp['Genre'],
-                parsed_resp['Director']
-                )
+            new_movie = omdb_client.movie_from_response(parsed_resp)
+            existing_title = self._resolve(new_movie['title'])
+            if existing_title is not None:
+                print(f"Movie {existing_title} already exist!")
+                return
+            print(new_movie['rating'])
+            self._storage.add_movie(**new_movie)
+            self._titles_changed(added=new_movie['title'])
             print(f"Movie {movie} successfully added")
 
 
+    def _command_bulk_import(self):
+        """
+        Allows the user to add many movies at once from a text or CSV file of titles.
+
+        Prompts the user for the file with the titles, fetches the details of all titles concurrently
+        from the OMDB API and adds the found movies to the storage with a single save. Titles which
+        could not be imported are written to a report file.
+
+        Returns:
+            None
+        """
+        import bulk_import
+        file_path = input("Enter file with movie titles (.txt or .csv): ")
+        try:
+            titles = bulk_import.read_titles(file_path)
+        except FileNotFoundError:
+            print(f"File {file_path} not found")
+            return
+        added, failures = bulk_import.import_titles(self._storage, titles, cache=self._omdb_cache,
+                                                    resolver=self._titles())
+        self._titles_changed()
+        print(f"{added} movies successfully added")
+        if failures:
+            print(f"{len(failures)} titles failed, see {bulk_import.DEFAULT_REPORT_PATH}")
+        cache_stats = self._omdb_cache.stats()
+        print(f"OMDB cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"(hit rate {cache_stats['hit_rate']})")
+
+
     def _command_delete_movie(self):
         """
         Allows the user to delete a specific movie from the storage.
 
-        Prompts the user to enter the name of the movie to be deleted. The provided movie name is then passed to the storage
-        for deletion.
+        Prompts the user to enter the name of the movie to be deleted. Only a movie whose title matches the name, ignoring
+        case, accents and punctuation, is deleted; otherwise the closest titles are suggested.
 
         Returns:
             None
         """
         movie = input("Enter movie name to delete: ")
-        self._storage.delete_movie(movie)
+        stored_title = self._resolve(movie)
+        if stored_title is None:
+            self._print_not_found(movie, self._titles())
+            return
+        self._storage.delete_movie(stored_title)
+        self._titles_changed(removed=stored_title)
 
 
     def _command_update_movie(self):
         """
         Allows the user to update the rating or notes for a specific movie.
 
-        Prompts the user to enter the movie name and its updated rating or notes. The provided movie name and the associated
-        rating or notes are then passed to the storage for updating.
+        Prompts the user to enter the movie name and its updated rating or notes. The name is matched ignoring case, accents
+        and punctuation, if no title matches the closest titles are suggested. The matched title and the associated rating
+        or notes are then passed to the storage for updating.
 
         Returns:
             None
         """
         movie = input("Enter movie name: ")
+        stored_title = self._resolve(movie)
+        if stored_title is None:
+            self._print_not_found(movie, self._titles())
+            return
         rating = input("Enter movie's new rating: ")
-        self._storage.update_movie(movie, rating)
+        try:
+            self._storage.update_movie(stored_title, rating)
+        except ValueError as error:
+            print(error)
+            return
+        self._titles_changed()
 
 
     def _command_random_movie(self):
         """
         Retrieves the movie data from the storage and selects a random movie to watch for the night.
 
-        Fetches the movie data from the storage and randomly selects a movie from the list. The selected movie title and
-        its corresponding rating are then printed as a recommendation for the user's movie night.
+        Streams the movies from the storage and randomly selects one of them with reservoir sampling, so only the
+        current pick is kept in memory. The selected movie title and its corresponding rating are then printed as a
+        recommendation for the user's movie night.
 
         Returns:
             None
         """
-        movies_data = self._storage.list_movies()
-        [random_movie_dict] = random.sample(sorted(movies_data.items()), 1)
+        random_movie_dict = None
+        for count, movie in enumerate(self._storage.iter_movies(fields=('rating',)), start=1):
+            if random.randrange(count) == 0:
+                random_movie_dict = movie
+        if random_movie_dict is None:
+            print("No movies yet")
+            return
         print(f"Your movie for tonight: {random_movie_dict[0]}, "
               f"it's rated {random_movie_dict[1]['rating']}")
 
@@ -183,45 +308,46 @@ class MovieApp:
         """
         Retrieves the movie data from the storage and searches for movies based on a partial match of the movie name.
 
-        Retrieves the movie data from the storage and prompts the user to enter a part of a movie name. It then iterates over
-        the movie data and checks for a case-insensitive partial match with the entered search term. If a match is found,
-        the movie title and its corresponding rating are printed.
+        Prompts the user to enter a part of a movie name and asks the storage for the movies with a case-insensitive
+        partial match of the entered search term. For each match the movie title and its corresponding rating are printed.
 
         Returns:
             None
 
         """
-        movies_data = self._storage.list_movies()
         search_path = input("Enter part of movie name: ")
-        for movie, movie_data in movies_data.items():
-            if search_path.lower() in movie.lower():
-                print(f"{movie}, {movie_data['rating']}")
+        for movie, movie_data in self._storage.search_movies(search_path).items():
+            print(f"{movie}, {movie_data['rating']}")
 
 
     def _command_sorted_movies(self):
         """
         Retrieves the movie data from the storage and prints the movies sorted by their ratings in descending order.
 
-        Fetches the movie data from the storage and sorts the movies based on their ratings in descending order.
-        The sorted movies are then iterated over, and for each movie, its title and corresponding rating are printed.
+        Asks the storage for the movies ordered numerically by rating in descending order, one page of
+        PAGE_SIZE movies at a time, so only the shown movies have to be ordered. For each movie, its title
+        and corresponding rating are printed, and the user can ask for the next page.
 
         Returns:
             None
 
         """
-        movies_data = self._storage.list_movies()
-        sorted_movies = sorted(movies_data.items(), key=lambda item: item[1]['rating'], reverse=True)
-        for movie, details in sorted_movies:
-            print(f"{movie}: {details['rating']}")
+        cursor = None
+        while True:
+            page, cursor = self._storage.movies_by_rating(PAGE_SIZE, cursor)
+            for movie, rating in page:
+                print(f"{movie}: {rating}")
+            if cursor is None or input("Show more movies? (y/n): ").strip().lower() != 'y':
+                break
 
 
     def _command_movie_stats(self):
         """
         Computes and prints various statistics based on the movie data obtained from the storage.
 
-        Retrieves the movie data from the storage and calculates the average and median ratings of all
-        the movies. The average rating is rounded to two decimal places, and the median rating is
-        determined based on the sorted list of all ratings.
+        Retrieves the rating statistics which the storage keeps up to date on every change: the average
+        and median ratings of all the movies. The average rating is rounded to two decimal places, and
+        the median rating is determined by the order statistics of all ratings.
 
         Additionally, the function identifies the best-rated and worst-rated movies by finding the movie
         with the highest and lowest ratings, respectively. The titles and ratings of these movies are then
@@ -236,33 +362,27 @@ class MovieApp:
             None
 
         """
-        movies_data = self._storage.list_movies()
-        all_rating = [float(movie_data['rating']) for movie_data in movies_data.values()]
-        length_movie_data = len(all_rating)
-        average_rating = round(sum(all_rating) / length_movie_data, 2)
-        all_rating.sort()
-        if length_movie_data % 2 == 0:
-            index = length_movie_data // 2
-            median_rating = (all_rating[index] + all_rating[index - 1]) / 2
-        else:
-            index = length_movie_data // 2
-            median_rating = all_rating[index]
-        best_movie = max(movies_data.items(), key=lambda x: x[1]['rating'])
-        worst_movie = min(movies_data.items(), key=lambda x: x[1]['rating'])
-        print(f"Average rating: {average_rating}")
-        print(f"Median rating: {median_rating}")
-        print(f"Best movie: {best_movie[0]}, {best_movie[1]['rating']}")
-        print(f"Worst movie: {worst_movie[0]}, {worst_movie[1]['rating']}")
+        stats = self._storage.rating_stats()
+        if stats is None:
+            print("No rated movies yet")
+            return
+        best_movie = stats['best']
+        worst_movie = stats['worst']
+        print(f"Average rating: {round(stats['average'], 2)}")
+        print(f"Median rating: {stats['median']}")
+        print(f"Best movie: {best_movie[0]}, {best_movie[1]}")
+        print(f"Worst movie: {worst_movie[0]}, {worst_movie[1]}")
 
 
     def _command_creating_histogram(self):
         """
         Creates a histogram based on the ratings of the movies obtained from the storage.
 
-        Retrieves the movie data from the storage and extracts the ratings of the movies.
-        Then, a histogram is generated using Matplotlib to visualize the distribution of movie ratings.
+        Streams the ratings of the movies from the storage and bins them with the analytics engine.
+        Then, a histogram is drawn on a figure of its own to visualize the distribution of movie ratings.
         The x-axis represents the movie ratings, the y-axis represents the number of movies within
-        each rating range, and the histogram is divided into 10 bins.
+        each rating range, and the histogram is divided into 10 bins. The figure is released once it
+        is saved, so repeated histograms neither stack up nor use more and more memory.
 
         The user is prompted to enter a filename (e.g., ratings.png) to save the histogram as an image.
         Upon saving the histogram, a confirmation message is printed displaying the filename under which
@@ -271,100 +391,154 @@ class MovieApp:
         Returns:
             None
         """
-        movies_data = self._storage.list_movies()
-        ratings = [movie['rating'] for movie in movies_data.values()]
-        plt.hist(ratings, bins=10)
-        plt.xlabel("Movie Rating")
-        plt.ylabel("Number of Movies")
-        plt.title("Distribution of Movie Ratings")
-        plt.grid(True)
+        import charts
+        chart_data = charts.ChartData.from_movies(self._storage.iter_movies(fields=('rating',)))
         filename = input("Enter filename (e.g., ratings.png): ")
-        plt.savefig(filename)
+        try:
+            charts.render_chart(chart_data, 'rating_histogram', filename)
+        except (ValueError, OSError) as error:
+            print(f"Could not save the histogram: {error}")
+            return
         print(f"Histogram saved as {filename}")
 
 
-    def generate_movie_page(self):
+    def _command_rating_analytics(self):
         """
-        Generates individual HTML pages for each movie based
-        on the movie data stored in the movie storage.
-        
-        Retrieves all movies data from the movie storage.
-        Reads the movie HTML template from the specified path.
-        Iterates through each movie, replaces placeholders
-        in the HTML template with movie-specific data,
-        and writes the new HTML page for each movie.
-        Prints a success message after generating all movie pages.
+        Prints vectorized rating analytics of the whole catalog.
+
+        Loads the ratings and years of all movies into NumPy arrays and prints the mean, median and percentiles
+        of the ratings, the rating histogram, the number of movies and mean rating per decade, and the trend of
+        the ratings over the years.
 
         Returns:
-        None
+            None
+        """
+        from analytics import MovieAnalytics
+        movie_analytics = MovieAnalytics.from_storage(self._storage, fields=('rating', 'year_of_release'))
+        summary = movie_analytics.summary()
+        if summary is None:
+            print("No rated movies yet")
+            return
+        print(f"Rated movies: {summary['count']}")
+        print(f"Mean rating: {summary['mean']:.2f}, median rating: {summary['median']:.2f}")
+        print("Percentiles: " + ", ".join(
+            f"{key}={value:.2f}" for key, value in summary.items() if key.startswith('p')
+        ))
+        print("\nRating histogram:")
+        counts, edges = movie_analytics.histogram(bins=10)
+        for count, low, high in zip(counts, edges, edges[1:]):
+            print(f"{low:5.2f} - {high:5.2f}: {count}")
+        print("\nMovies per decade:")
+        for decade, group in movie_analytics.by_decade().items():
+            mean = 'n/a' if group['mean'] is None else f"{group['mean']:.2f}"
+            print(f"{decade}s: {group['count']} movies, mean rating {mean}")
+        _, slope = movie_analytics.trend_by_year()
+        if slope is not None:
+            print(f"\nRating trend: {slope:+.3f} per year")
+
+
+    def _command_group_analytics(self):
+        """
+        Prints the number of movies and the mean rating of the top genres and directors.
+
+        Loads the ratings, genres and directors of all movies into NumPy arrays and prints the TOP_GROUPS genres
+        and directors with the most movies.
+
+        Returns:
+            None
+        """
+        from analytics import MovieAnalytics
+        movie_analytics = MovieAnalytics.from_storage(self._storage, fields=('rating', 'genre', 'director'))
+        for heading, groups in (("Top genres:", movie_analytics.by_genre()),
+                                ("Top directors:", movie_analytics.by_director())):
+            print(f"\n{heading}")
+            for name, group in list(groups.items())[:TOP_GROUPS]:
+                mean = 'n/a' if group['mean'] is None else f"{group['mean']:.2f}"
+                print(f"{name}: {group['count']} movies, mean rating {mean}")
+
+
+    def _command_metrics_summary(self):
+        """
+        Prints the calls, latencies, bytes read and written and peak memory of
+        every instrumented command and storage operation, slowest first.
+
+        Returns:
+            None
         """
-        all_movies_data = self._storage.list_movies()
-        movie_html_string = docs_parcer.read_html(MOVIE_HTML_PATH)
-        for title, movie in all_movies_data.items():
-            new_html_movie = movie_html_string.replace(
-            '__MOVIE_NAME__', title
-            )
-            poster_string = f"<img class='movie-poster' src={movie['poster']}> \n"
-            new_html_movie = new_html_movie.replace('__MOVIE_POSTER__', poster_string)
-            description_string = ''
-            description_string += f"<div class='movie-description'>"
-            description_string += f"<ul><li>Director:{movie['director']}</li>"
-            description_string += f"<li>Genre: {movie['genre']} </li> </ul> "
-            description_string += f"Summary: {movie['plot']} </div>"
-            description_string += f"<p><button><a href='index.html'>RETURN</a></button></p>"
-            new_html_movie = new_html_movie.replace(
-            '__MOVIE_DESCRIPTION__', description_string
-            )
-            docs_parcer.write_new_html(new_html_movie, f'_static/movie_{title}.html')
-        print("Movie pages was successfully generated")
+        if self._metrics is None:
+            print("Metrics are disabled, start the app with --metrics <file> to collect them")
+            return
+        print()
+        for line in self._metrics.summary_lines():
+            print(line)
 
 
     def _generate_website(self):
         """
         Generate a web site based on the movie data.
 
-        This function retrieves all movies data from the movie storage, 
-        reads an HTML template, replaces
-        the title with the output website name, 
-        generates HTML content for each movie,
-        replaces the movie grid template 
-        in the HTML with the generated movie content,
-        writes the new HTML data 
-        to a file, and prints a success message.
+        This function streams the movies data from the movie storage
+        and builds the index pages of 100 movies each, a page for every
+        movie from the HTML templates and the search index which lets the
+        index pages search the whole catalog, and draws the rating charts
+        of charts.py. Only pages and charts whose movie data or template changed
+        since the last build are written, pages of deleted movies are
+        removed, and the number of written, skipped and removed pages
+        is printed.
 
         Returns:
         None
         """
-        all_movies_data = self._storage.list_movies()
-        html_string = docs_parcer.read_html(INDEX_HTML_PATH)
-        output_website_name = 'Interesting movies - website for everyone'
-        new_html_data = html_string.replace("__TEMPLATE_TITLE__", output_website_name)
-        output_movies = ''
-        for title, movie in all_movies_data.items():
-            output_movies += '\n<li> <div class="movie"> '
-            output_movies += f"<img class='movie-poster' src={movie['poster']}>"
-            output_movies += f"<div class='movie-title'><a href='./movie_{title}"
-            output_movies += f".html'>{title}</a></div>"
-            output_movies += f"<div class='movie-year'>{movie['year_of_release']}</div>"
-            output_movies += f"<div class='movie-rating'>"
-            output_movies += f"<span class='rating-value'>{movie['rating']}</span></div>"
-            if 'notes' in movie:
-                output_movies += f"<div class='movie-note'>{movie['notes']}</div>"
-            output_movies += '</div> \n </li>'
-        new_html_data = new_html_data.replace('__TEMPLATE_MOVIE_GRID__', output_movies)
-        self.generate_movie_page()
-        docs_parcer.write_new_html(new_html_data, '_static/index.html')
+        import site_builder
+        report = site_builder.build_site(self._storage.iter_movies, with_charts=True)
         print('Website was generated successfully.')
+        print(f"{report['written']} pages written, {report['skipped']} skipped, "
+              f"{report['removed']} removed.")
 
 
-    @staticmethod
-    def exit_program():
+    def _command_mirror_posters(self):
+        """
+        Downloads the posters of all movies into the static directory and
+        regenerates the website so its pages show the local copies.
+
+        Posters which were mirrored before are skipped, identical images
+        are only stored once, and posters which could not be downloaded
+        are printed and keep their remote URL.
+
+        Returns:
+        None
+        """
+        import poster_mirror
+        import site_builder
+        report = poster_mirror.mirror_posters(self._storage.iter_movies)
+        print(f"{report['downloaded']} posters downloaded, {report['duplicates']} duplicates, "
+              f"{report['skipped']} already mirrored, {len(report['failed'])} failed.")
+        for url, reason in report['failed']:
+            print(f"{url}: {reason}")
+        pages = site_builder.build_site(self._storage.iter_movies)
+        print(f"{pages['written']} pages written, {pages['skipped']} skipped, "
+              f"{pages['removed']} removed.")
+
+
+    def close(self):
+        """
+        Writes the pending changes of the storage and of the OMDB cache.
+
+        Returns:
+        None
+        """
+        self._storage.close()
+        self._omdb_cache.close()
+
+
+    def exit_program(self):
         """
-        Exit the program.
+        Exit the program after the storage and the OMDB cache have written their pending changes.
 
         Returns:
         None
         """
+        self.close()
         print()
         print("\nBye!\n")
         sys.exit() # noqa: E0602
@@ -379,13 +553,13 @@ class MovieApp:
         int: User's choice for the menu option.
         """
         while True:
-            user_input = input("Enter choice (0-10): ")
+            user_input = input(f"Enter choice (0-{MAX_MENU_CHOICE}): ")
             try:
                 user_input = int(user_input)
-                if 0 <= user_input <= 10:
+                if 0 <= user_input <= MAX_MENU_CHOICE:
                     return user_input
                 else:
-                    print("Invalid input. Please enter a number between 0 and 10.")
+                    print(f"Invalid input. Please enter a number between 0 and {MAX_MENU_CHOICE}.")
             except ValueError:
                 print("Invalid input. Please enter a valid number.")
 
@@ -403,7 +577,10 @@ class MovieApp:
             " Delete movie\n4. Update movie\n5. Stats\n6."
             " Random movie\n7. Search movie\n8."
             " Movies sorted by rating\n9."
-            " Create Rating Histogram\n10. Generate website\n")
+            " Create Rating Histogram\n10. Generate website\n"
+            "11. Bulk import movies\n12. Rating analytics\n"
+            "13. Genre and director stats\n14. Performance summary\n"
+            "15. Mirror posters\n")
 
 
     def run(self):
@@ -428,7 +605,12 @@ class MovieApp:
                 7: self._command_search,
                 8: self._command_sorted_movies,
                 9: self._command_creating_histogram,
-                10: self._generate_website
+                10: self._generate_website,
+                11: self._command_bulk_import,
+                12: self._command_rating_analytics,
+                13: self._command_group_analytics,
+                14: self._command_metrics_summary,
+                15: self._command_mirror_posters
         }
             if user_input in menu_functionality:
                 menu_functionality[user_input]()
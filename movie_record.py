@@ -0,0 +1,199 @@
+import sys
+from rating_index import to_rating
+
+MOVIE_FIELDS = ('year_of_release', 'rating', 'poster', 'plot', 'genre', 'director', 'notes')
+INTERNED_FIELDS = ('genre', 'director')
+
+
+def _coerce_rating(value):
+    """
+    Converts a rating to a float once, when the record is built.
+
+    Args:
+    value (str or float): The rating as read from a file or typed by the user.
+
+    Returns:
+    float or str: The numeric rating, or the raw value if it is not a finite
+        number, see rating_index.to_rating.
+    """
+    rating = to_rating(value)
+    return value if rating is None else rating
+
+
+def _coerce_year(value):
+    """
+    Converts a year of release to an int once, when the record is built.
+
+    Args:
+    value (str or int): The year as read from a file or from OMDB.
+
+    Returns:
+    int or str: The numeric year, or the raw value if it is not a number.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def to_year(value):
+    """
+    Converts a stored year of release to a number for analytics.
+
+    Args:
+    value (str or int): The year as stored, e.g. 2004, '2004' or '2004–2010'.
+
+    Returns:
+    float or None: The year, or None if it does not start with a number.
+    """
+    try:
+        return float(str(value)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def _intern(value):
+    """
+    Interns a string which repeats across many movies, e.g. a genre or a director.
+
+    Args:
+    value (str): The field value.
+
+    Returns:
+    str: The shared string object, other values are returned unchanged.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+COERCIONS = {
+    'rating': _coerce_rating,
+    'year_of_release': _coerce_year,
+    'genre': _intern,
+    'director': _intern,
+}
+
+
+class MovieRecord:
+    """
+    A compact movie record with typed fields.
+
+    The fields are kept in __slots__ instead of a per-movie dict, the rating
+    is a float and the year an int as soon as the record is built, and
+    genre and director strings are interned so repeated values are stored
+    once. The record can be read and written like the movie dicts the
+    storages used before, e.g. movie['rating'] or 'notes' in movie.
+
+    Methods:
+    - from_dict: Builds a record from a movie dictionary.
+    - to_dict: Returns the fields as a movie dictionary.
+    - keys, items, get, copy: Dictionary-like access to the fields.
+    """
+
+    __slots__ = MOVIE_FIELDS
+
+    def __init__(self, year_of_release=None, rating=None, poster=None, plot=None,
+                 genre=None, director=None, notes=None):
+        """
+        Initializes a new instance of the class and coerces the field types.
+
+        Returns:
+        None
+        """
+        self['year_of_release'] = year_of_release
+        self['rating'] = rating
+        self['poster'] = poster
+        self['plot'] = plot
+        self['genre'] = genre
+        self['director'] = director
+        self['notes'] = notes
+
+
+    @classmethod
+    def from_dict(cls, movie):
+        """
+        Builds a record from a movie dictionary, unknown fields are dropped.
+
+        Args:
+        movie (dict): The movie details as stored in a JSON or CSV file.
+
+        Returns:
+        MovieRecord: The typed record.
+        """
+        return cls(**{field: movie.get(field) for field in MOVIE_FIELDS})
+
+
+    def __getitem__(self, field):
+        if field not in MOVIE_FIELDS or (field == 'notes' and self.notes is None):
+            raise KeyError(field)
+        return getattr(self, field)
+
+
+    def __setitem__(self, field, value):
+        if field not in MOVIE_FIELDS:
+            raise KeyError(field)
+        coerce = COERCIONS.get(field)
+        setattr(self, field, coerce(value) if coerce else value)
+
+
+    def __contains__(self, field):
+        return field in MOVIE_FIELDS and (field != 'notes' or self.notes is not None)
+
+
+    def __eq__(self, other):
+        if isinstance(other, MovieRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+
+    def __repr__(self):
+        return f"MovieRecord({self.to_dict()!r})"
+
+
+    def keys(self):
+        """
+        Returns the names of the set fields, 'notes' only if it is set.
+
+        Returns:
+        list: The field names.
+        """
+        return [field for field in MOVIE_FIELDS if field in self]
+
+
+    def items(self):
+        """
+        Returns the set fields with their values.
+
+        Returns:
+        list: (field, value) tuples.
+        """
+        return [(field, getattr(self, field)) for field in self.keys()]
+
+
+    def get(self, field, default=None):
+        """
+        Returns the value of a field, or the default if the field is not set.
+
+        Returns:
+        The field value or the default.
+        """
+        return self[field] if field in self else default
+
+
+    def to_dict(self):
+        """
+        Returns the set fields as a movie dictionary, e.g. for json.dump.
+
+        Returns:
+        dict: The movie details.
+        """
+        return dict(self.items())
+
+
+    def copy(self):
+        """
+        Returns a copy of the record.
+
+        Returns:
+        MovieRecord: The copy.
+        """
+        return MovieRecord(*(getattr(self, field) for field in MOVIE_FIELDS))
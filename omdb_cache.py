@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = 'omdb_cache.json'
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_NEGATIVE_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+NOT_FOUND_ERROR = 'Error: Movie not found!'
+
+
+class OmdbCache:
+    """
+    An on-disk cache of parsed OMDB responses keyed by the normalized title.
+
+    Found movies are kept for ttl seconds and "Movie not found!" results
+    for negative_ttl seconds, other errors are never cached. The number of
+    entries is capped by evicting the least recently used ones. Hit and
+    miss counts are persisted with the entries. Lookups only change the
+    cache in memory, close writes them once.
+
+    Args:
+    file_path (str): The path of the JSON file holding the cache.
+    ttl (float): Seconds a found movie stays valid.
+    negative_ttl (float): Seconds a "Movie not found!" result stays valid.
+    max_entries (int): The maximum number of cached titles.
+
+    Methods:
+    - normalize_title: Builds the cache key of a title.
+    - get: Returns the cached response of a title.
+    - put: Caches the response of a title.
+    - save: Writes the cache to its file.
+    - close: Writes the cache to its file if it changed since the last save.
+    - stats: Returns the hit and miss counts.
+    """
+
+    def __init__(self, file_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Initializes a new instance of the class, the cache file is only read on first use.
+
+        Returns:
+        None
+        """
+        self.file_path = file_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+
+    def _ensure_loaded(self):
+        """
+        Loads the cache file if that did not happen yet, the caller holds the lock.
+
+        Returns:
+        None
+        """
+        if self._entries is None:
+            self._load()
+
+
+    def _load(self):
+        """
+        Loads the entries and counters from the cache file.
+
+        Returns:
+        None
+        """
+        self._entries = OrderedDict()
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        self.hits = data.get('hits', 0)
+        self.misses = data.get('misses', 0)
+        self._entries = OrderedDict(data.get('entries', []))
+
+
+    @staticmethod
+    def normalize_title(title):
+        """
+        Builds the cache key of a title, so differently typed titles share an entry.
+
+        Args:
+        title (str): The movie title.
+
+        Returns:
+        str: The case-folded title with collapsed whitespace.
+        """
+        return ' '.join(title.casefold().split())
+
+
+    def get(self, title):
+        """
+        Returns the cached response of a title and counts a hit or a miss.
+
+        Args:
+        title (str): The movie title.
+
+        Returns:
+        dict or str or None: The cached parsed response, or None if the
+            title is not cached or the entry expired.
+        """
+        key = self.normalize_title(title)
+        with self._lock:
+            self._ensure_loaded()
+            # The counters change either way, and a hit changes the LRU order
+            self._dirty = True
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires'] < time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['response']
+
+
+    def put(self, title, response, save=True):
+        """
+        Caches the parsed response of a title and saves the cache.
+
+        Args:
+        title (str): The movie title.
+        response (dict or str): The parsed OMDB response.
+        save (bool): Write the cache file right away, bulk callers save once at the end.
+
+        Returns:
+        None
+        """
+        if isinstance(response, str) and response != NOT_FOUND_ERROR:
+            return
+        ttl = self.negative_ttl if isinstance(response, str) else self.ttl
+        key = self.normalize_title(title)
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[key] = {'expires': time.time() + ttl, 'response': response}
+            self._dirty = True
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if save:
+            self.save()
+
+
+    def save(self):
+        """
+        Writes the entries in LRU order and the counters to the cache file.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            data = {'hits': self.hits, 'misses': self.misses,
+                    'entries': list(self._entries.items())}
+            temp_path = f"{self.file_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file, separators=(',', ':'))
+            os.replace(temp_path, self.file_path)
+            self._dirty = False
+
+
+    def close(self):
+        """
+        Writes the cache to its file if lookups or new entries changed it
+        since the last save.
+
+        Returns:
+        None
+        """
+        if self._dirty:
+            self.save()
+
+
+    def stats(self):
+        """
+        Returns the hit and miss counts of the cache.
+
+        Returns:
+        dict: The hits, misses, hit rate and number of entries.
+        """
+        with self._lock:
+            self._ensure_loaded()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 2) if lookups else 0.0,
+            'entries': len(self._entries),
+        }
@@ -0,0 +1,82 @@
+import requests
+from config.config_files import get_api_keys
+
+OMDB_API_URL = 'http://www.omdbapi.com/'
+
+
+def response_parser(resp):
+    """
+    Parses the response from an HTTP request and
+    returns the appropriate data or error message.
+
+    Args:
+    resp (requests.Response): The response object
+        from the HTTP request.
+
+    Returns:
+    dict or str: If the response status code is OK
+                and the JSON response indicates success,
+                returns the JSON data.
+                If the JSON response indicates failure,
+                returns an error message.
+                If the response status code is not OK,
+                returns an error message with the status code.
+    """
+    if resp.status_code == requests.codes.ok:
+        if resp.json()['Response'] == 'False':
+            error_resp = resp.json()
+            return f"Error: {error_resp['Error']}"
+        else:
+            return resp.json()
+    else:
+        return f"Error: {resp.status_code}"
+
+
+def fetch_movie(title, session=None, api_url=OMDB_API_URL, timeout=10, cache=None):
+    """
+    Fetches the details of a movie from the OMDB API.
+
+    Args:
+    title (str): The title of the movie.
+    session (requests.Session): Optional session to reuse connections.
+    api_url (str): The URL of the OMDB API, e.g. a local stub server in tests.
+    timeout (float): Timeout of the request in seconds.
+    cache (OmdbCache): Optional cache which is asked before the API.
+
+    Returns:
+    dict or str: The parsed response, see response_parser.
+    """
+    if cache is not None:
+        cached_resp = cache.get(title)
+        if cached_resp is not None:
+            return cached_resp
+    http = session or requests
+    response = http.get(api_url, params={'apikey': get_api_keys().APIkey, 't': title}, timeout=timeout)
+    parsed_resp = response_parser(response)
+    if cache is not None:
+        cache.put(title, parsed_resp)
+    return parsed_resp
+
+
+def movie_from_response(parsed_resp):
+    """
+    Extracts the fields stored for a movie from a successful OMDB response.
+
+    Args:
+    parsed_resp (dict): The JSON data of the OMDB response.
+
+    Returns:
+    dict: The keyword arguments for IStorage.add_movie.
+
+    Raises:
+    KeyError, IndexError, ValueError: If the response has no usable rating.
+    """
+    return {
+        'title': parsed_resp['Title'],
+        'year': parsed_resp['Year'][0:4],
+        'rating': float(parsed_resp['Ratings'][0]['Value'].split('/')[0]),
+        'poster': parsed_resp['Poster'],
+        'plot': parsed_resp['Plot'],
+        'genre': parsed_resp['Genre'],
+        'director': parsed_resp['Director'],
+    }
@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+import site_builder
+from write_behind import atomic_open
+
+DEFAULT_WORKERS = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_TIMEOUT = 10
+RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+IMAGE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+
+
+class PosterError(Exception):
+    """
+    Raised when a poster could not be downloaded, with the reason as message.
+    """
+
+
+def poster_urls(iter_movies):
+    """
+    Collects the distinct poster URLs of all movies, in the order of the storage.
+
+    Movies without a poster, e.g. 'N/A' from OMDB, are skipped.
+
+    Args:
+    iter_movies (callable): Returns an iterator of (title, movie details)
+        tuples, e.g. IStorage.iter_movies.
+
+    Returns:
+    list: The http and https poster URLs.
+    """
+    urls = {}
+    for _, movie in iter_movies():
+        poster = movie.get('poster')
+        if isinstance(poster, str) and urlsplit(poster).scheme in ('http', 'https'):
+            urls[poster] = None
+    return list(urls)
+
+
+def download_poster(session, url, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT):
+    """
+    Downloads a poster, retrying connection errors, timeouts and temporary
+    server errors with an exponentially growing pause.
+
+    Args:
+    session (requests.Session): The session to download with.
+    url (str): The poster URL.
+    retries (int): How often a failed download is repeated.
+    backoff (float): Seconds to wait before the first retry, doubled for every further one.
+    timeout (float): Timeout of each request in seconds.
+
+    Returns:
+    tuple: The image bytes and the file extension matching its type.
+
+    Raises:
+    PosterError: If the poster could not be downloaded or is not an image.
+    """
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            response = session.get(url, timeout=timeout)
+        except requests.RequestException as error:
+            reason = f"Error: {error}"
+            continue
+        if response.status_code in RETRY_STATUSES:
+            reason = f"Error: {response.status_code}"
+            continue
+        if response.status_code != requests.codes.ok:
+            raise PosterError(f"Error: {response.status_code}")
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith('image/'):
+            raise PosterError(f"Error: Not an image ({content_type or 'no content type'})")
+        extension = IMAGE_EXTENSIONS.get(content_type)
+        if extension is None:
+            extension = os.path.splitext(urlsplit(url).path)[1].lower() or '.img'
+        return response.content, extension
+    raise PosterError(reason)
+
+
+def store_poster(content, extension, poster_dir):
+    """
+    Stores an image under the hash of its content, so a poster used by
+    several URLs is only kept once.
+
+    Args:
+    content (bytes): The image.
+    extension (str): The file extension, e.g. '.jpg'.
+    poster_dir (str): The directory holding the posters.
+
+    Returns:
+    tuple: The file name and whether the image was new.
+    """
+    file_name = hashlib.sha256(content).hexdigest() + extension
+    file_path = os.path.join(poster_dir, file_name)
+    if os.path.exists(file_path):
+        return file_name, False
+    # One temporary file per thread, two URLs may deliver the same image at once
+    temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(content)
+    os.replace(temp_path, file_path)
+    return file_name, True
+
+
+def save_posters(posters, static_dir=site_builder.STATIC_DIR):
+    """
+    Saves the local poster paths for site_builder.load_posters.
+
+    Args:
+    posters (dict): The local path of every mirrored poster keyed by URL.
+    static_dir (str): The directory holding the generated pages.
+
+    Returns:
+    None
+    """
+    with atomic_open(os.path.join(static_dir, site_builder.POSTER_MANIFEST_NAME), encoding='utf-8') as file:
+        json.dump(posters, file, indent=4, sort_keys=True)
+
+
+def mirror_posters(iter_movies, static_dir=site_builder.STATIC_DIR, workers=DEFAULT_WORKERS,
+                   retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT):
+    """
+    Downloads the posters of all movies into the posters directory of the
+    static site, so the pages do not depend on the image host.
+
+    The downloads run on a bounded thread pool where each worker thread
+    keeps its own requests.Session. Posters whose local copy exists are
+    skipped, the images are stored by content hash and the URL of every
+    mirrored poster is recorded for site_builder, which links the pages
+    to the local copies the next time the site is built.
+
+    Args:
+    iter_movies (callable): Returns an iterator of (title, movie details)
+        tuples, e.g. IStorage.iter_movies.
+    static_dir (str): The directory holding the generated pages.
+    workers (int): The maximum number of concurrent downloads.
+    retries (int): How often a failed download is repeated.
+    backoff (float): Seconds to wait before the first retry, doubled for every further one.
+    timeout (float): Timeout of each request in seconds.
+
+    Returns:
+    dict: The number of posters 'downloaded', 'duplicates' (images already
+        stored for another URL) and 'skipped', and the (URL, reason) tuples
+        of the 'failed' ones.
+    """
+    poster_dir = os.path.join(static_dir, site_builder.POSTER_DIR)
+    os.makedirs(poster_dir, exist_ok=True)
+    posters = site_builder.load_posters(static_dir)
+    urls = poster_urls(iter_movies)
+    missing = [url for url in urls
+               if url not in posters or not os.path.exists(os.path.join(static_dir, posters[url]))]
+    local = threading.local()
+
+    def mirror(url):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        try:
+            content, extension = download_poster(local.session, url, retries, backoff, timeout)
+        except PosterError as error:
+            return url, None, str(error)
+        file_name, new = store_poster(content, extension, poster_dir)
+        return url, f"{site_builder.POSTER_DIR}/{file_name}", new
+
+    failed = []
+    mirrored = 0
+    # Counted by file, two threads may both have written the same new image
+    new_files = set()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for url, local_path, result in executor.map(mirror, missing):
+                if local_path is None:
+                    failed.append((url, result))
+                    continue
+                posters[url] = local_path
+                mirrored += 1
+                if result:
+                    new_files.add(local_path)
+    finally:
+        # Also after an interruption, so finished downloads are not repeated
+        if missing:
+            save_posters(posters, static_dir)
+    return {'downloaded': len(new_files), 'duplicates': mirrored - len(new_files),
+            'skipped': len(urls) - len(missing), 'failed': failed}
+
+
+def main():
+    """
+    Mirrors the posters of a storage and rebuilds the website to use them,
+    e.g. python poster_mirror.py data.json
+    """
+    from main import get_storage
+    parser = argparse.ArgumentParser(description="Download the movie posters for the website")
+    parser.add_argument('storage', help="movie storage file: .json, .csv, .db, .sqlite or .mbin")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="concurrent downloads")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="retries of a failed download")
+    parser.add_argument('--static-dir', default=site_builder.STATIC_DIR,
+                        help="directory holding the templates and the generated pages")
+    args = parser.parse_args()
+    try:
+        storage = get_storage(args.storage)
+    except ValueError as error:
+        parser.error(str(error))
+    try:
+        report = mirror_posters(storage.iter_movies, args.static_dir, args.workers, args.retries)
+        pages = site_builder.build_site(storage.iter_movies, args.static_dir)
+    finally:
+        storage.close()
+    print(f"{report['downloaded']} posters downloaded, {report['duplicates']} duplicates, "
+          f"{report['skipped']} already mirrored, {len(report['failed'])} failed.")
+    for url, reason in report['failed']:
+        print(f"  {url}: {reason}")
+    print(f"{pages['written']} pages written, {pages['skipped']} skipped, {pages['removed']} removed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+import math
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+BUCKETS_PER_POINT = 100
+MAX_RATING = 10
+BUCKET_COUNT = MAX_RATING * BUCKETS_PER_POINT + 1
+
+
+def _sort_key(entry):
+    """
+    Orders (title, rating) entries by rating, ties by title.
+    """
+    return entry[1], entry[0]
+
+
+def to_rating(value):
+    """
+    Converts a stored rating to a float.
+
+    Args:
+    value (str or float): The rating as stored, CSV storages keep strings.
+
+    Returns:
+    float or None: The rating, or None if it is not a finite number,
+        e.g. 'abc', 'nan' or 'inf'.
+    """
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rating if math.isfinite(rating) else None
+
+
+def require_rating(value):
+    """
+    Converts a new rating, e.g. typed by the user, to a float.
+
+    Args:
+    value (str or float): The rating.
+
+    Returns:
+    float: The rating.
+
+    Raises:
+    ValueError: If the rating is not a finite number.
+    """
+    rating = to_rating(value)
+    if rating is None:
+        raise ValueError(f"Rating '{value}' is not a number.")
+    return rating
+
+
+class RatingIndex:
+    """
+    Running aggregates of the movie ratings which are updated per mutation.
+
+    The ratings are counted in a Fenwick tree over rating buckets of 0.01,
+    so adding or removing a movie and finding the k-th smallest rating are
+    O(log buckets) no matter how many movies are stored. Ratings outside of
+    0 to 10 go into the first or last bucket, the exact values inside a
+    bucket are kept so the order statistics stay exact.
+
+    Args:
+    ratings (iterable): (title, rating) pairs to index initially.
+
+    Methods:
+    - add: Adds or replaces the rating of a title.
+    - remove: Removes the rating of a title.
+    - kth: Returns the k-th smallest rating.
+    - median: Returns the median rating.
+    - percentile: Returns a percentile of the ratings.
+    - best: Returns the best rated title.
+    - worst: Returns the worst rated title.
+    - summary: Returns count, average, median, best and worst at once.
+    - iter_sorted: Yields the titles ordered by rating.
+    - top_k: Returns the best rated titles.
+    - bottom_k: Returns the worst rated titles.
+    - page: Returns one page of titles ordered by rating.
+    """
+
+    def __init__(self, ratings=()):
+        """
+        Initializes a new instance of the class.
+
+        Args:
+        ratings (iterable): (title, rating) pairs to index initially.
+
+        Returns:
+        None
+        """
+        self.count = 0
+        self.total = 0.0
+        self._tree = [0] * (BUCKET_COUNT + 1)
+        self._buckets = [None] * BUCKET_COUNT
+        self._sorted_buckets = {}
+        self._ratings = {}
+        for title, rating in ratings:
+            self.add(title, rating)
+
+
+    @staticmethod
+    def _bucket(rating):
+        """
+        Returns the bucket of a rating.
+
+        Args:
+        rating (float): The rating.
+
+        Returns:
+        int: The bucket index.
+        """
+        return min(max(int(round(rating * BUCKETS_PER_POINT)), 0), BUCKET_COUNT - 1)
+
+
+    def _change_count(self, bucket, delta):
+        """
+        Adds delta to the count of a bucket in the Fenwick tree.
+
+        Returns:
+        None
+        """
+        position = bucket + 1
+        while position <= BUCKET_COUNT:
+            self._tree[position] += delta
+            position += position & -position
+
+
+    def _find_bucket(self, k):
+        """
+        Finds the bucket holding the k-th smallest rating.
+
+        Args:
+        k (int): The zero-based rank.
+
+        Returns:
+        tuple: The bucket index and the rank of the rating inside the bucket.
+        """
+        position = 0
+        remaining = k + 1
+        step = 1 << BUCKET_COUNT.bit_length()
+        while step:
+            next_position = position + step
+            if next_position <= BUCKET_COUNT and self._tree[next_position] < remaining:
+                position = next_position
+                remaining -= self._tree[next_position]
+            step >>= 1
+        return position, remaining - 1
+
+
+    def add(self, title, rating):
+        """
+        Adds the rating of a title, replacing a previous rating of the title.
+        Ratings which are not numbers are not indexed.
+
+        Args:
+        title (str): The movie title.
+        rating (str or float): The movie rating.
+
+        Returns:
+        None
+        """
+        rating = to_rating(rating)
+        bucket = None if rating is None else self._bucket(rating)
+        self.remove(title)
+        if rating is None:
+            return
+        if self._buckets[bucket] is None:
+            self._buckets[bucket] = {}
+        self._buckets[bucket][title] = rating
+        self._sorted_buckets.pop(bucket, None)
+        self._ratings[title] = rating
+        self._change_count(bucket, 1)
+        self.count += 1
+        self.total += rating
+
+
+    def remove(self, title):
+        """
+        Removes the rating of a title.
+
+        Args:
+        title (str): The movie title.
+
+        Returns:
+        None
+        """
+        rating = self._ratings.pop(title, None)
+        if rating is None:
+            return
+        bucket = self._bucket(rating)
+        del self._buckets[bucket][title]
+        self._sorted_buckets.pop(bucket, None)
+        self._change_count(bucket, -1)
+        self.count -= 1
+        self.total -= rating
+
+
+    def _kth_entry(self, k):
+        """
+        Returns the title and rating with the k-th smallest rating.
+
+        Args:
+        k (int): The zero-based rank.
+
+        Returns:
+        tuple: The title and its rating.
+        """
+        bucket, rank = self._find_bucket(k)
+        return self._sorted_bucket(bucket)[rank]
+
+
+    def _sorted_bucket(self, bucket):
+        """
+        Returns the entries of a bucket ordered by rating and title.
+        The order is computed lazily and kept until the bucket changes.
+
+        Args:
+        bucket (int): The bucket index.
+
+        Returns:
+        list: (title, rating) tuples.
+        """
+        entries = self._sorted_buckets.get(bucket)
+        if entries is None:
+            entries = sorted(self._buckets[bucket].items(), key=_sort_key)
+            self._sorted_buckets[bucket] = entries
+        return entries
+
+
+    def kth(self, k):
+        """
+        Returns the k-th smallest rating.
+
+        Args:
+        k (int): The zero-based rank, must be smaller than count.
+
+        Returns:
+        float: The rating.
+        """
+        return self._kth_entry(k)[1]
+
+
+    def median(self):
+        """
+        Returns the median rating, the mean of the two middle ratings for an even count.
+
+        Returns:
+        float or None: The median, or None if no ratings are indexed.
+        """
+        if not self.count:
+            return None
+        index = self.count // 2
+        if self.count % 2 == 0:
+            return (self.kth(index) + self.kth(index - 1)) / 2
+        return self.kth(index)
+
+
+    def percentile(self, percent):
+        """
+        Returns a percentile of the ratings with linear interpolation
+        between the closest ranks.
+
+        Args:
+        percent (float): The percentile between 0 and 100.
+
+        Returns:
+        float or None: The percentile, or None if no ratings are indexed.
+        """
+        if not self.count:
+            return None
+        position = (self.count - 1) * percent / 100
+        lower = int(position)
+        lower_rating = self.kth(lower)
+        if lower == self.count - 1:
+            return lower_rating
+        return lower_rating + (self.kth(lower + 1) - lower_rating) * (position - lower)
+
+
+    def best(self):
+        """
+        Returns the best rated title, the first indexed one on ties.
+
+        Returns:
+        tuple or None: The title and its rating, or None if no ratings are indexed.
+        """
+        if not self.count:
+            return None
+        bucket, _ = self._find_bucket(self.count - 1)
+        return max(self._buckets[bucket].items(), key=lambda entry: entry[1])
+
+
+    def worst(self):
+        """
+        Returns the worst rated title, the first indexed one on ties.
+
+        Returns:
+        tuple or None: The title and its rating, or None if no ratings are indexed.
+        """
+        if not self.count:
+            return None
+        bucket, _ = self._find_bucket(0)
+        return min(self._buckets[bucket].items(), key=lambda entry: entry[1])
+
+
+    def summary(self):
+        """
+        Returns the rating statistics.
+
+        Returns:
+        dict or None: count, average, median, best and worst, or None if
+            no ratings are indexed.
+        """
+        if not self.count:
+            return None
+        return {
+            'count': self.count,
+            'average': self.total / self.count,
+            'median': self.median(),
+            'best': self.best(),
+            'worst': self.worst(),
+        }
+
+
+    def iter_sorted(self, descending=True, after=None):
+        """
+        Yields the titles ordered by rating, ties ordered by title. Only the
+        buckets which are actually read are sorted, so the first entries
+        are available without sorting all ratings.
+
+        Args:
+        descending (bool): Start with the best rating.
+        after (tuple): Optional (rating, title) cursor, only entries after it are yielded.
+
+        Returns:
+        generator: (title, rating) tuples.
+        """
+        if descending:
+            start = BUCKET_COUNT - 1 if after is None else self._bucket(after[0])
+            buckets = range(start, -1, -1)
+        else:
+            start = 0 if after is None else self._bucket(after[0])
+            buckets = range(start, BUCKET_COUNT)
+        for bucket in buckets:
+            if not self._buckets[bucket]:
+                continue
+            entries = self._sorted_bucket(bucket)
+            if descending:
+                end = len(entries)
+                if after is not None and bucket == start:
+                    end = bisect_left(entries, tuple(after), key=_sort_key)
+                for index in range(end - 1, -1, -1):
+                    yield entries[index]
+            else:
+                begin = 0
+                if after is not None and bucket == start:
+                    begin = bisect_right(entries, tuple(after), key=_sort_key)
+                yield from islice(entries, begin, None)
+
+
+    def top_k(self, k):
+        """
+        Returns the k best rated titles.
+
+        Args:
+        k (int): The number of titles.
+
+        Returns:
+        list: (title, rating) tuples, best first.
+        """
+        return list(islice(self.iter_sorted(descending=True), k))
+
+
+    def bottom_k(self, k):
+        """
+        Returns the k worst rated titles.
+
+        Args:
+        k (int): The number of titles.
+
+        Returns:
+        list: (title, rating) tuples, worst first.
+        """
+        return list(islice(self.iter_sorted(descending=False), k))
+
+
+    def page(self, limit, cursor=None, descending=True):
+        """
+        Returns one page of titles ordered by rating.
+
+        Args:
+        limit (int): The maximum number of titles on the page.
+        cursor (tuple): The cursor returned with the previous page, None for the first page.
+        descending (bool): Start with the best rating.
+
+        Returns:
+        tuple: The list of (title, rating) tuples and the cursor of the next
+            page, which is None after the last page.
+        """
+        entries = list(islice(self.iter_sorted(descending, cursor), limit + 1))
+        if len(entries) <= limit:
+            return entries, None
+        title, rating = entries[limit - 1]
+        return entries[:limit], (rating, title)
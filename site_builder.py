@@ -0,0 +1,541 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from urllib.parse import quote
+import docs_parcer
+from rating_index import to_rating
+from title_resolver import normalize_title
+from write_behind import atomic_open
+
+STATIC_DIR = '_static'
+INDEX_TEMPLATE_NAME = 'index_template.html'
+MOVIE_TEMPLATE_NAME = 'movie_template.html'
+MANIFEST_NAME = '.build_manifest.json'
+POSTER_DIR = 'posters'
+POSTER_MANIFEST_NAME = '.poster_manifest.json'
+SEARCH_INDEX_NAME = 'search_index.json'
+CHART_DIR = 'charts'
+CHARTS_PAGE_NAME = 'charts.html'
+SEARCH_INDEX_FIELDS = ['title', 'tokens', 'year', 'rating', 'url']
+WEBSITE_TITLE = 'Interesting movies - website for everyone'
+MOVIE_PLACEHOLDERS = ('__MOVIE_NAME__', '__MOVIE_POSTER__', '__MOVIE_DESCRIPTION__')
+INDEX_PLACEHOLDERS = ('__TEMPLATE_TITLE__', '__TEMPLATE_CHARTS_LINK__', '__TEMPLATE_MOVIE_GRID__',
+                      '__TEMPLATE_PAGINATION__')
+INDEX_PAGE_SIZE = 100
+# Page links shown on each side of the current page, besides the first and the last
+PAGINATION_WINDOW = 2
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+WRITE_BATCH_SIZE = 1000
+
+
+def movie_page_name(title):
+    """
+    Returns the file name of the page of a movie.
+
+    Args:
+    title (str): The movie title.
+
+    Returns:
+    str: The file name inside the static directory.
+    """
+    return f'movie_{title}.html'
+
+
+def index_page_name(page):
+    """
+    Returns the file name of a page of the index.
+
+    Args:
+    page (int): The page number, starting at 1.
+
+    Returns:
+    str: The file name inside the static directory.
+    """
+    return 'index.html' if page == 1 else f'index_{page}.html'
+
+
+def title_tokens(title):
+    """
+    Splits a title into the normalized words _static/search.js matches
+    queries against: case-folded, without accents and punctuation, see
+    title_resolver.normalize_title.
+
+    Args:
+    title (str): The movie title.
+
+    Returns:
+    list: The words of the title.
+    """
+    return normalize_title(title).split()
+
+
+def search_entry(title, movie):
+    """
+    Builds the entry of a movie in the search index, in the order of
+    SEARCH_INDEX_FIELDS.
+
+    Args:
+    title (str): The movie title.
+    movie (dict): The movie details.
+
+    Returns:
+    list: The title, its tokens, the year, the rating and the page URL.
+    """
+    year = movie.get('year_of_release')
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        year = None
+    return [title, ' '.join(title_tokens(title)), year, to_rating(movie.get('rating')),
+            quote(movie_page_name(title))]
+
+
+def iter_search_index(movies):
+    """
+    Serializes the search index one movie at a time, so it can be written
+    or sent without holding the catalog in memory.
+
+    The index is a JSON object with the 'fields' of an entry and the
+    'movies', one compact array per movie, see search_entry.
+
+    Args:
+    movies (iterable): (title, movie details) tuples.
+
+    Returns:
+    generator: The parts of the JSON text.
+    """
+    yield f'{{"fields":{json.dumps(SEARCH_INDEX_FIELDS, separators=(",", ":"))},"movies":['
+    for number, (title, movie) in enumerate(movies):
+        if number:
+            yield ','
+        yield json.dumps(search_entry(title, movie), separators=(',', ':'), ensure_ascii=False)
+    yield ']}'
+
+
+def load_posters(static_dir=STATIC_DIR):
+    """
+    Loads the local copies of the posters made by poster_mirror.
+
+    Args:
+    static_dir (str): The directory holding the generated pages.
+
+    Returns:
+    dict: The path of the local copy, relative to the static directory,
+        keyed by the poster URL. Empty if no posters were mirrored.
+    """
+    return _load_manifest(os.path.join(static_dir, POSTER_MANIFEST_NAME))
+
+
+def poster_source(movie, posters=None):
+    """
+    Returns the image source of the poster of a movie, its local copy if
+    there is one.
+
+    Args:
+    movie (dict): The movie details.
+    posters (dict): Local poster paths keyed by URL, see load_posters.
+
+    Returns:
+    str: The local path or the poster URL.
+    """
+    poster = movie['poster']
+    if posters:
+        return posters.get(poster, poster)
+    return poster
+
+
+def load_templates(static_dir=STATIC_DIR):
+    """
+    Reads the HTML templates and compiles them into placeholder slots once.
+
+    Args:
+    static_dir (str): The directory holding the templates.
+
+    Returns:
+    dict: The 'movie' and 'index' compiled templates and the 'movie_hash'
+        and 'index_hash' of their sources.
+    """
+    movie_template = docs_parcer.read_html(os.path.join(static_dir, MOVIE_TEMPLATE_NAME))
+    index_template = docs_parcer.read_html(os.path.join(static_dir, INDEX_TEMPLATE_NAME))
+    return {
+        'movie': docs_parcer.compile_template(movie_template, MOVIE_PLACEHOLDERS),
+        'index': docs_parcer.compile_template(index_template, INDEX_PLACEHOLDERS),
+        'movie_hash': _content_hash(movie_template),
+        'index_hash': _content_hash(index_template),
+    }
+
+
+def render_movie_page(template, title, movie, posters=None):
+    """
+    Fills the slots of the compiled movie template with the data of a movie.
+
+    Args:
+    template (list): The compiled movie HTML template.
+    title (str): The movie title.
+    movie (dict): The movie details.
+    posters (dict): Local poster paths keyed by URL, see load_posters.
+
+    Returns:
+    str: The HTML page of the movie.
+    """
+    description_string = ''.join((
+        "<div class='movie-description'>",
+        f"<ul><li>Director:{movie['director']}</li>",
+        f"<li>Genre: {movie['genre']} </li> </ul> ",
+        f"Summary: {movie['plot']} </div>",
+        "<p><button><a href='index.html'>RETURN</a></button></p>",
+    ))
+    return docs_parcer.fill_template(template, {
+        '__MOVIE_NAME__': title,
+        '__MOVIE_POSTER__': f"<img class='movie-poster' src={poster_source(movie, posters)}> \n",
+        '__MOVIE_DESCRIPTION__': description_string,
+    })
+
+
+def render_movie_card(title, movie, posters=None):
+    """
+    Renders the grid entry of a movie on the index page.
+
+    Args:
+    title (str): The movie title.
+    movie (dict): The movie details.
+    posters (dict): Local poster paths keyed by URL, see load_posters.
+
+    Returns:
+    str: The HTML list item of the movie.
+    """
+    note = f"<div class='movie-note'>{movie['notes']}</div>" if 'notes' in movie else ''
+    return ''.join((
+        '\n<li> <div class="movie"> ',
+        f"<img class='movie-poster' src={poster_source(movie, posters)}>",
+        f"<div class='movie-title'><a href='./{quote(movie_page_name(title))}'>{title}</a></div>",
+        f"<div class='movie-year'>{movie['year_of_release']}</div>",
+        f"<div class='movie-rating'><span class='rating-value'>{movie['rating']}</span></div>",
+        note,
+        '</div> \n </li>',
+    ))
+
+
+def render_pagination(page, page_count):
+    """
+    Renders the links between the pages of the index: previous and next,
+    the first and the last page and the pages around the current one.
+
+    Args:
+    page (int): The current page number.
+    page_count (int): The number of index pages.
+
+    Returns:
+    str: The HTML navigation, empty if there is only one page.
+    """
+    if page_count <= 1:
+        return ''
+    shown = {1, page_count, *range(max(1, page - PAGINATION_WINDOW), min(page_count, page + PAGINATION_WINDOW) + 1)}
+    links = []
+    if page > 1:
+        links.append(f"<a class='page-link' href='{index_page_name(page - 1)}'>&laquo; Previous</a>")
+    previous = 0
+    for number in sorted(shown):
+        if number > previous + 1:
+            links.append("<span class='page-gap'>&hellip;</span>")
+        if number == page:
+            links.append(f"<span class='page-current'>{number}</span>")
+        else:
+            links.append(f"<a class='page-link' href='{index_page_name(number)}'>{number}</a>")
+        previous = number
+    if page < page_count:
+        links.append(f"<a class='page-link' href='{index_page_name(page + 1)}'>Next &raquo;</a>")
+    return f"<nav class='pagination'>{' '.join(links)}</nav>"
+
+
+def render_index(template, movies, posters=None, page=1, page_count=1, charts=False):
+    """
+    Fills the slots of the compiled index template with the grid of the
+    movies of one index page and the links to the other pages.
+
+    Args:
+    template (list): The compiled index HTML template.
+    movies (iterable): (title, movie details) tuples of the page.
+    posters (dict): Local poster paths keyed by URL, see load_posters.
+    page (int): The page number.
+    page_count (int): The number of index pages.
+    charts (bool): Whether charts.html exists, only then it is linked.
+
+    Returns:
+    str: The HTML index page.
+    """
+    movie_grid = ''.join(render_movie_card(title, movie, posters) for title, movie in movies)
+    charts_link = f"<a class='charts-link' href='{CHARTS_PAGE_NAME}'>Rating charts</a>" if charts else ''
+    return docs_parcer.fill_template(template, {
+        '__TEMPLATE_TITLE__': WEBSITE_TITLE,
+        '__TEMPLATE_CHARTS_LINK__': charts_link,
+        '__TEMPLATE_MOVIE_GRID__': movie_grid,
+        '__TEMPLATE_PAGINATION__': render_pagination(page, page_count),
+    })
+
+
+def _content_hash(*parts):
+    """
+    Hashes the inputs of a page.
+
+    Args:
+    parts: Strings or JSON serializable values the page is rendered from.
+
+    Returns:
+    str: The hex digest of the inputs.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, default=dict)
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _load_manifest(manifest_path):
+    """
+    Loads the content hashes of the pages written by the last build.
+
+    Args:
+    manifest_path (str): The path of the manifest file.
+
+    Returns:
+    dict: The content hash of every page keyed by file name.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(manifest, manifest_path):
+    """
+    Saves the content hashes of the pages of this build.
+
+    Args:
+    manifest (dict): The content hash of every page keyed by file name.
+    manifest_path (str): The path of the manifest file.
+
+    Returns:
+    None
+    """
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+
+
+def _write_page(page_path, render):
+    """
+    Renders a page and writes it to its file.
+
+    Args:
+    page_path (str): The path of the page.
+    render (callable): Returns the HTML of the page.
+
+    Returns:
+    None
+    """
+    docs_parcer.write_new_html(render(), page_path)
+
+
+def _write_index_pages(iter_movies, templates, posters, stale_pages, page_count, search_path, charts):
+    """
+    Renders the stale pages of the index and the search index in a single
+    pass over the movies, holding only one page of movies at a time.
+
+    Args:
+    iter_movies (callable): Returns an iterator of (title, movie details) tuples.
+    templates (dict): The compiled templates, see load_templates.
+    posters (dict): Local poster paths keyed by URL, see load_posters.
+    stale_pages (dict): The path of every index page to write keyed by page number.
+    page_count (int): The number of index pages.
+    search_path (str): The path of the search index, None if it is up to date.
+    charts (bool): Whether the pages link to charts.html.
+
+    Returns:
+    None
+    """
+    last_page = page_count if search_path else max(stale_pages)
+
+    def paged_movies():
+        movies = iter_movies()
+        for page in range(1, last_page + 1):
+            chunk = list(islice(movies, INDEX_PAGE_SIZE))
+            if page in stale_pages:
+                _write_page(stale_pages[page],
+                            partial(render_index, templates['index'], chunk, posters, page, page_count, charts))
+            yield from chunk
+
+    if search_path is None:
+        for _ in paged_movies():
+            pass
+        return
+    with atomic_open(search_path, encoding='utf-8') as file:
+        file.writelines(iter_search_index(paged_movies()))
+
+
+def render_charts_page(chart_names):
+    """
+    Renders the page showing the charts of the catalog.
+
+    Args:
+    chart_names (iterable): The names of the charts in the chart directory.
+
+    Returns:
+    str: The HTML page.
+    """
+    images = ''.join(f"<p><img class='chart' src='{CHART_DIR}/{name}.png' alt='{name}'></p>\n"
+                     for name in chart_names)
+    return ''.join((
+        "<html>\n<head>\n<title>My Movie App</title>\n",
+        "<link rel='stylesheet' href='style.css'/>\n</head>\n<body>\n",
+        f"<div class='list-movies-title'><h1>{WEBSITE_TITLE}</h1></div>\n",
+        f"<div class='charts'>\n{images}",
+        "<p><button><a href='index.html'>RETURN</a></button></p>\n</div>\n</body>\n</html>",
+    ))
+
+
+def _write_charts(iter_movies, static_dir, stale_path):
+    """
+    Draws the charts of the catalog into the chart directory, skipping
+    charts whose data did not change, and writes the page showing them.
+
+    Args:
+    iter_movies (callable): Returns an iterator of (title, movie details) tuples.
+    static_dir (str): The directory holding the generated pages.
+    stale_path (callable): Records the content hash of a file in the
+        manifest and returns its path if it has to be written, else None.
+
+    Returns:
+    int: The number of files written.
+    """
+    # matplotlib and NumPy are only imported by builds which draw charts
+    import charts
+    chart_data = charts.ChartData.from_movies(iter_movies())
+    stale = [name for name in charts.CHART_NAMES
+             if stale_path(f"{CHART_DIR}/{name}.png",
+                           _content_hash(name, chart_data.fingerprint(name))) is not None]
+    charts.export_charts(chart_data, os.path.join(static_dir, CHART_DIR), stale)
+    page_path = stale_path(CHARTS_PAGE_NAME, _content_hash(WEBSITE_TITLE, list(charts.CHART_NAMES)))
+    if page_path is not None:
+        _write_page(page_path, partial(render_charts_page, charts.CHART_NAMES))
+    return len(stale) + (page_path is not None)
+
+
+def build_site(iter_movies, static_dir=STATIC_DIR, workers=DEFAULT_WORKERS, with_charts=False):
+    """
+    Writes the pages of the index, one page per movie and the search index
+    into the static directory.
+
+    The index is split into pages of INDEX_PAGE_SIZE movies, index.html
+    being the first one. The search index lists the normalized title
+    tokens, year, rating and page URL of every movie for _static/search.js,
+    which searches the whole catalog in the browser.
+
+    The manifest of the last build stores a content hash of the inputs of
+    every page, including the templates. Only pages whose hash changed or
+    whose file is missing are rendered and written, spread over a thread
+    pool, and pages of movies which no longer exist are deleted. The movies
+    are streamed, a second pass is only made if an index page or the
+    search index changed.
+    Posters mirrored by poster_mirror are linked to their local copies.
+
+    With charts, a further pass draws the rating charts of charts.py into
+    the chart directory and writes charts.html. Like the pages, a chart is
+    only drawn again if its data changed. Builds without charts keep the
+    charts of the last build. The index only links to charts.html if it
+    exists.
+
+    Args:
+    iter_movies (callable): Returns an iterator of (title, movie details)
+        tuples, e.g. IStorage.iter_movies.
+    static_dir (str): The directory holding the templates and the generated pages.
+    workers (int): The number of threads rendering and writing pages.
+    with_charts (bool): Also draw the charts, which needs matplotlib.
+
+    Returns:
+    dict: The number of files 'written', 'skipped' and 'removed'.
+    """
+    manifest_path = os.path.join(static_dir, MANIFEST_NAME)
+    old_manifest = _load_manifest(manifest_path)
+    new_manifest = {}
+    pending = []
+    written = 0
+    templates = load_templates(static_dir)
+    posters = load_posters(static_dir)
+
+    def stale_path(page_name, content_hash):
+        # The path of a file which has to be written, None if it is up to date
+        new_manifest[page_name] = content_hash
+        page_path = os.path.join(static_dir, page_name)
+        if old_manifest.get(page_name) != content_hash or not os.path.exists(page_path):
+            return page_path
+        return None
+
+    def plan_page(page_name, content_hash, render):
+        page_path = stale_path(page_name, content_hash)
+        if page_path is not None:
+            pending.append((page_path, render))
+
+    def write_pending(executor):
+        # Written in batches, so only a batch of movies is held in memory
+        nonlocal written
+        list(executor.map(lambda job: _write_page(*job), pending))
+        written += len(pending)
+        pending.clear()
+
+    # Builds without charts keep the charts of the last build, if there are any
+    charts = with_charts or (CHARTS_PAGE_NAME in old_manifest
+                             and os.path.exists(os.path.join(static_dir, CHARTS_PAGE_NAME)))
+    index_seed = f"{templates['index_hash']}\0{WEBSITE_TITLE}\0{charts}".encode('utf-8')
+    index_digests = []
+    search_digest = hashlib.sha256()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for number, (title, movie) in enumerate(iter_movies()):
+            # The index pages only show the movie, not the movie page template
+            entry_hash = _content_hash(title, movie, poster_source(movie, posters))
+            movie_hash = _content_hash(templates['movie_hash'], entry_hash)
+            if number % INDEX_PAGE_SIZE == 0:
+                index_digests.append(hashlib.sha256(index_seed))
+            index_digests[-1].update(entry_hash.encode('ascii'))
+            search_digest.update(json.dumps(search_entry(title, movie)).encode('utf-8'))
+            plan_page(movie_page_name(title), movie_hash,
+                      partial(render_movie_page, templates['movie'], title, movie, posters))
+            if len(pending) >= WRITE_BATCH_SIZE:
+                write_pending(executor)
+        write_pending(executor)
+
+    # An empty catalog still gets an empty index.html
+    page_count = max(1, len(index_digests))
+    stale_pages = {}
+    for page in range(1, page_count + 1):
+        digest = index_digests[page - 1] if index_digests else hashlib.sha256(index_seed)
+        # The links to the other pages depend on the number of pages
+        digest.update(f"\0{page_count}".encode('ascii'))
+        page_path = stale_path(index_page_name(page), digest.hexdigest())
+        if page_path is not None:
+            stale_pages[page] = page_path
+    search_path = stale_path(SEARCH_INDEX_NAME, search_digest.hexdigest())
+    # The index reads the storage again, which is done in the calling
+    # thread because e.g. a SQLite connection may only be used there
+    if stale_pages or search_path:
+        _write_index_pages(iter_movies, templates, posters, stale_pages, page_count, search_path, charts)
+    written += len(stale_pages) + (search_path is not None)
+    if with_charts:
+        written += _write_charts(iter_movies, static_dir, stale_path)
+    else:
+        new_manifest.update((name, content_hash) for name, content_hash in old_manifest.items()
+                            if name == CHARTS_PAGE_NAME or name.startswith(f"{CHART_DIR}/"))
+
+    removed = 0
+    for page_name in old_manifest.keys() - new_manifest.keys():
+        page_path = os.path.join(static_dir, page_name)
+        if os.path.exists(page_path):
+            os.remove(page_path)
+            removed += 1
+    _save_manifest(new_manifest, manifest_path)
+    return {'written': written, 'skipped': len(new_manifest) - written, 'removed': removed}
@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+from rating_index import RatingIndex
+from title_index import TrigramIndex
+
+# Marks a title which did not exist before the batch touched it
+MISSING = object()
+
+
+class BatchLog:
+    """
+    The undo log and the pending writes of an open storage batch.
+
+    While a batch is open the storages apply their mutations in memory and
+    only remember the order of the titles, the state of every touched movie
+    before its first change and the journal records to write. The outermost
+    batch writes everything once when it exits, or restores the remembered
+    state if it exits with an exception. Nested batches join the outer one.
+
+    Methods:
+    - remember: Records the state of a movie before its first change.
+    - defer: Keeps journal records until the batch is flushed.
+    - rollback: Restores the movies and indexes of a storage to their state before the batch.
+    - run: Runs a batch of a storage, used by the storages' batch methods.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the class.
+
+        Returns:
+        None
+        """
+        self.depth = 0
+        self.previous = {}
+        self.records = []
+        self.order = None
+
+
+    @property
+    def active(self):
+        """
+        Whether a batch is open.
+
+        Returns:
+        bool: True inside a batch.
+        """
+        return self.depth > 0
+
+
+    def remember(self, movies, title):
+        """
+        Records the state of a movie before the batch changes it for the first time.
+
+        Args:
+        movies (dict): The movies of the storage keyed by title.
+        title (str): The title of the movie which is about to change.
+
+        Returns:
+        None
+        """
+        if self.active and title not in self.previous:
+            if self.order is None:
+                self.order = list(movies)
+            movie = movies.get(title)
+            self.previous[title] = MISSING if movie is None else movie.copy()
+
+
+    def defer(self, records):
+        """
+        Keeps journal records until the batch is flushed.
+
+        Args:
+        records (tuple): The journal records of a mutation.
+
+        Returns:
+        bool: True if the records were deferred, False outside of a batch.
+        """
+        if not self.active:
+            return False
+        self.records.extend(records)
+        return True
+
+
+    def rollback(self, storage):
+        """
+        Restores the movies of a storage to their state before the batch, in
+        their original order, and rebuilds its indexes from them.
+
+        Args:
+        storage (IStorage): The storage whose batch failed.
+
+        Returns:
+        None
+        """
+        movies = storage._movies
+        restored = {title: self.previous.get(title, movies.get(title)) for title in self.order}
+        movies.clear()
+        movies.update(restored)
+        storage._title_index = TrigramIndex(movies)
+        storage._rating_index = RatingIndex((title, movie['rating']) for title, movie in movies.items())
+
+
+    @contextmanager
+    def run(self, storage, flush):
+        """
+        Runs a batch: mutations inside it are only applied in memory, the
+        outermost batch calls flush once on success and rolls the movies
+        back if an exception leaves it.
+
+        Args:
+        storage (IStorage): The storage, yielded to the with block.
+        flush (callable): Writes the changes, called with the deferred journal records.
+
+        Returns:
+        generator: The context manager of the batch.
+        """
+        self.depth += 1
+        try:
+            yield storage
+        except BaseException:
+            self.depth -= 1
+            if not self.active:
+                if self.previous:
+                    self.rollback(storage)
+                self.previous, self.records, self.order = {}, [], None
+            raise
+        self.depth -= 1
+        if not self.active:
+            changed = bool(self.previous)
+            records = self.records
+            self.previous, self.records, self.order = {}, [], None
+            if changed:
+                flush(records)
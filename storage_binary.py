@@ -0,0 +1,1041 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from file_lock import FileLock, locked_write
+from istorage import IStorage, project_fields, to_column
+from movie_record import COERCIONS, MOVIE_FIELDS, MovieRecord
+from rating_index import RatingIndex, require_rating, to_rating
+
+DATA_MAGIC = b'MOVBIN01'
+INDEX_MAGIC = b'MOVIDX01'
+HEADER_SIZE = 64
+# magic, epoch, end of the records, live records, bytes of deleted records
+DATA_HEADER = struct.Struct('<8sQQQQ')
+# magic, epoch of the data file, slot count, used slots, end of the indexed records
+INDEX_HEADER = struct.Struct('<8sQQQQ')
+# record length, flags, rating and the byte lengths of the title and TEXT_FIELDS
+RECORD_HEADER = struct.Struct('<IBd7I')
+FLAGS_OFFSET = 4
+RATING_OFFSET = 5
+LENGTHS_OFFSET = 13
+DELETED = 1
+NO_VALUE = 0xFFFFFFFF
+TEXT_FIELDS = ('year_of_release', 'genre', 'director', 'poster', 'plot', 'notes')
+# (title hash, record offset), offsets below HEADER_SIZE mark free slots
+SLOT = struct.Struct('<QQ')
+EMPTY = 0
+REMOVED = 1
+MIN_SLOTS = 1024
+MAX_LOAD = 0.7
+INITIAL_CAPACITY = 64 * 1024
+
+
+def _title_hash(title):
+    """
+    Hashes a title for the index, the same in every process unlike hash().
+
+    Titles are looked up exactly, the hash ignores the case only so that
+    index files written before stay valid.
+
+    Args:
+    title (str): The movie title.
+
+    Returns:
+    int: A 64-bit hash of the case-folded title.
+    """
+    digest = hashlib.blake2b(title.casefold().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _encode_record(title, movie):
+    """
+    Encodes a movie as a record of the data file.
+
+    Args:
+    title (str): The movie title.
+    movie (dict): The movie details, missing fields are stored as unset.
+
+    Returns:
+    bytes: The record.
+    """
+    values = [title] + [movie.get(field) for field in TEXT_FIELDS]
+    encoded = [None if value is None else str(value).encode('utf-8') for value in values]
+    rating = to_rating(movie.get('rating'))
+    body = b''.join(value for value in encoded if value)
+    return RECORD_HEADER.pack(
+        RECORD_HEADER.size + len(body), 0, math.nan if rating is None else rating,
+        *(NO_VALUE if value is None else len(value) for value in encoded)
+    ) + body
+
+
+class BinaryMovie:
+    """
+    A movie read from a binary storage, which decodes its text fields only
+    when they are accessed, so listing titles and ratings never decodes
+    plots or poster URLs.
+
+    The movie can be read like a MovieRecord, e.g. movie['plot'] or
+    'notes' in movie. It stays readable until the storage is compacted.
+
+    Methods:
+    - keys, items, get: Dictionary-like access to the fields.
+    - to_dict: Returns the fields as a movie dictionary.
+    - copy: Returns the fields as a MovieRecord.
+    """
+
+    __slots__ = ('_storage', '_epoch', '_offset', '_rating', '_lengths', '_values')
+
+    def __init__(self, storage, offset):
+        """
+        Initializes a new instance of the class from the record header.
+
+        Args:
+        storage (StorageBinary): The storage holding the record.
+        offset (int): The offset of the record in the data file.
+
+        Returns:
+        None
+        """
+        _, _, rating, *lengths = RECORD_HEADER.unpack_from(storage._data, offset)
+        self._storage = storage
+        self._epoch = storage._epoch
+        self._offset = offset
+        self._rating = None if math.isnan(rating) else rating
+        self._lengths = lengths
+        self._values = {}
+
+
+    def _decode(self, field):
+        """
+        Decodes a text field, the fields before it are skipped by their lengths.
+
+        Args:
+        field (str): One of TEXT_FIELDS.
+
+        Returns:
+        str or None: The text, None if the field is unset.
+        """
+        position = self._offset + RECORD_HEADER.size
+        for name, length in zip(('title',) + TEXT_FIELDS, self._lengths):
+            if name == field:
+                return None if length == NO_VALUE else self._storage._read_text(self._epoch, position, length)
+            if length != NO_VALUE:
+                position += length
+
+
+    def _decode_all(self):
+        """
+        Decodes all text fields in one pass over the record.
+
+        Returns:
+        None
+        """
+        position = self._offset + RECORD_HEADER.size
+        for field, length in zip(('title',) + TEXT_FIELDS, self._lengths):
+            value = None
+            if length != NO_VALUE:
+                if field != 'title' and field not in self._values:
+                    value = self._storage._read_text(self._epoch, position, length)
+                position += length
+            if field != 'title' and field not in self._values:
+                coerce = COERCIONS.get(field)
+                self._values[field] = coerce(value) if coerce else value
+
+
+    def __getitem__(self, field):
+        if field not in self:
+            raise KeyError(field)
+        if field == 'rating':
+            return self._rating
+        if field not in self._values:
+            value = self._decode(field)
+            coerce = COERCIONS.get(field)
+            self._values[field] = coerce(value) if coerce else value
+        return self._values[field]
+
+
+    def __contains__(self, field):
+        return field in MOVIE_FIELDS and (field != 'notes' or self._lengths[-1] != NO_VALUE)
+
+
+    def __eq__(self, other):
+        if isinstance(other, (BinaryMovie, MovieRecord)):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+
+    def __repr__(self):
+        return f"BinaryMovie({self.to_dict()!r})"
+
+
+    def keys(self):
+        """
+        Returns the names of the set fields, 'notes' only if it is set.
+
+        Returns:
+        list: The field names.
+        """
+        return [field for field in MOVIE_FIELDS if field in self]
+
+
+    def items(self):
+        """
+        Returns the set fields with their values, decoding all of them.
+
+        Returns:
+        list: (field, value) tuples.
+        """
+        if len(self._values) < len(TEXT_FIELDS):
+            self._decode_all()
+        return [(field, self[field]) for field in self.keys()]
+
+
+    def get(self, field, default=None):
+        """
+        Returns the value of a field, or the default if the field is not set.
+
+        Returns:
+        The field value or the default.
+        """
+        return self[field] if field in self else default
+
+
+    def to_dict(self):
+        """
+        Returns the set fields as a movie dictionary, e.g. for json.dump.
+
+        Returns:
+        dict: The movie details.
+        """
+        return dict(self.items())
+
+
+    def copy(self):
+        """
+        Returns the fields as a record which no longer reads from the storage.
+
+        Returns:
+        MovieRecord: The copy.
+        """
+        return MovieRecord.from_dict(self.to_dict())
+
+
+class StorageBinary(IStorage):
+    """
+    A storage implementation keeping the movies as binary records in a
+    memory-mapped file, for catalogs too large to parse on every start.
+
+    The data file '<file>' holds a header and the records one after the
+    other. A record starts with a fixed header holding its length, a
+    deleted flag, the rating as a float and the byte lengths of its text
+    fields, followed by the UTF-8 text of the title and the other fields.
+    The index file '<file>.idx' is an open addressing hash table from the
+    case-folded title to the offset of the record.
+
+    Opening the storage only maps both files, so it takes the same time
+    for any catalog size. Looking up a title reads a few index slots and
+    one record, updating a rating overwrites the float in place, deleting
+    sets the flag, and adding appends a record. Deleted and replaced
+    records stay in the file until compact is called. Changes are written
+    to the shared mapping, they are visible to other processes at once and
+    reach the disk when the system writes the pages back or on close.
+
+    Several processes can share the files: writes hold an exclusive lock on
+    a sidecar lock file and bump its generation counter, and every
+    operation maps the files again if the generation changed.
+
+    Args:
+    file_path (str): The file path for the binary file used for storing movie data.
+
+    Methods:
+    - _refresh: Maps the files again if another process changed them.
+    - _find: Looks up the index slot and record of a title.
+    - compact: Rewrites the files without deleted records.
+    - close: Writes the mapped pages and closes the files.
+    - generation: Returns a value which changes whenever the movies change.
+    - get_movie: Looks up a movie through the title index.
+    - iter_movies: Yields the movies one at a time, decoding fields on access.
+    - columns: Returns some fields of all movies column by column, read at fixed record offsets.
+    - list_movies: Returns a dictionary of all movies in the storage.
+    - add_movie: Appends a new movie to the storage.
+    - add_movies: Appends several movies under a single lock.
+    - append_movies: Appends (title, movie details) pairs, e.g. read from another storage.
+    - batch: Holds the lock for several mutations, which are written as they happen.
+    - search_movies: Returns the movies whose title contains a query.
+    - rating_stats: Returns the rating statistics from the running aggregates.
+    - movies_by_rating: Returns one page of movies ordered by rating.
+    - delete_movie: Deletes a specific movie from the storage.
+    - update_movie: Updates the rating of a specific movie in place.
+    """
+
+    def __init__(self, file_path):
+        """
+        Initializes a new instance of the class and maps the files, creating
+        them if they do not exist.
+
+        Args:
+        file_path (str): The file path for the binary file used for storing movie data.
+
+        Returns:
+        None
+        """
+        self.file_path = file_path
+        self.index_path = f"{file_path}.idx"
+        self._file_lock = FileLock(file_path)
+        self._data_file = None
+        self._data = None
+        self._index_file = None
+        self._index = None
+        self._epoch = None
+        self._ratings = None
+        self._batch_depth = 0
+        self._changed = False
+        self._changes = 0
+        with self._file_lock.locked():
+            if not os.path.exists(file_path):
+                self._create()
+            self._generation = self._file_lock.read_generation()
+            self._map_files()
+
+
+    def _create(self):
+        """
+        Writes an empty data file, the caller holds the exclusive lock.
+
+        Returns:
+        None
+        """
+        epoch = int.from_bytes(os.urandom(8), 'little')
+        with open(self.file_path, 'wb') as file:
+            file.write(DATA_HEADER.pack(DATA_MAGIC, epoch, HEADER_SIZE, 0, 0))
+            file.truncate(INITIAL_CAPACITY)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+
+    def _map_files(self):
+        """
+        Maps the data and index files. An index which is missing or belongs
+        to another version of the data file is rebuilt, records appended
+        after the last indexed one, e.g. before a crash, are indexed.
+
+        Returns:
+        None
+        """
+        self._data_file, self._data = self._map(self.file_path, self._data_file, self._data)
+        magic, self._epoch, data_end, _, _ = DATA_HEADER.unpack_from(self._data)
+        if magic != DATA_MAGIC:
+            raise ValueError(f"'{self.file_path}' is not a binary movie storage")
+        if os.path.exists(self.index_path):
+            self._index_file, self._index = self._map(self.index_path, self._index_file, self._index)
+            magic, epoch, _, _, indexed_end = INDEX_HEADER.unpack_from(self._index)
+            if magic == INDEX_MAGIC and epoch == self._epoch:
+                if indexed_end < data_end:
+                    with self._file_lock.locked():
+                        self._index_tail(indexed_end)
+                return
+        with self._file_lock.locked():
+            self._write_index(self._scan_hashes(), self._header()[1])
+
+
+    @staticmethod
+    def _map(file_path, file, mapping):
+        """
+        Maps a whole file for reading and writing, closing its previous mapping.
+
+        Args:
+        file_path (str): The file to map.
+        file: The previously mapped file object, or None.
+        mapping (mmap.mmap): The previous mapping, or None.
+
+        Returns:
+        tuple: The open file object and its mapping.
+        """
+        if mapping is not None:
+            mapping.close()
+            file.close()
+        file = open(file_path, 'r+b')
+        return file, mmap.mmap(file.fileno(), 0)
+
+
+    def _header(self):
+        """
+        Returns the header of the data file.
+
+        Returns:
+        tuple: The epoch, end of the records, live records and deleted bytes.
+        """
+        return DATA_HEADER.unpack_from(self._data)[1:]
+
+
+    def _set_header(self, data_end, live, dead):
+        """
+        Writes the header of the data file.
+
+        Returns:
+        None
+        """
+        DATA_HEADER.pack_into(self._data, 0, DATA_MAGIC, self._epoch, data_end, live, dead)
+
+
+    def _refresh(self):
+        """
+        Maps the files again if another process changed them, e.g. grew the
+        data file, resized the index or compacted, and drops the rating
+        aggregates, which are rebuilt on the next use. Inside a batch this
+        process holds the lock, so nothing can have changed.
+
+        Returns:
+        None
+        """
+        if self._batch_depth:
+            return
+        generation = self._file_lock.read_generation()
+        if generation == self._generation:
+            return
+        self._generation = generation
+        self._ratings = None
+        self._map_files()
+
+
+    def _bump(self):
+        """
+        Tells other processes that the files changed, once per batch.
+
+        Returns:
+        None
+        """
+        self._changes += 1
+        if self._batch_depth:
+            self._changed = True
+            return
+        self._generation = self._file_lock.bump_generation()
+
+
+    def _read_text(self, epoch, start, length):
+        """
+        Decodes a text field of a record.
+
+        Args:
+        epoch (int): The epoch of the data file the record was read from.
+        start (int): The offset of the text.
+        length (int): The byte length of the text.
+
+        Returns:
+        str: The text.
+        """
+        if epoch != self._epoch:
+            raise RuntimeError("The storage was compacted since the movie was read, read it again")
+        return self._data[start:start + length].decode('utf-8')
+
+
+    def _record(self, offset):
+        """
+        Reads the header fields of a record which are needed without decoding its text.
+
+        Args:
+        offset (int): The offset of the record.
+
+        Returns:
+        tuple: The record length, whether it is deleted, the title and the rating or None.
+        """
+        length, flags, rating, title_length = RECORD_HEADER.unpack_from(self._data, offset)[:4]
+        start = offset + RECORD_HEADER.size
+        title = self._data[start:start + title_length].decode('utf-8')
+        return length, flags & DELETED, title, None if math.isnan(rating) else rating
+
+
+    def _scan(self, start=HEADER_SIZE):
+        """
+        Yields the live records in the order they were added.
+
+        Args:
+        start (int): The offset of the first record to read.
+
+        Returns:
+        generator: (offset, title, rating) tuples.
+        """
+        data_end = self._header()[1]
+        offset = start
+        while offset < data_end:
+            length, deleted, title, rating = self._record(offset)
+            if not deleted:
+                yield offset, title, rating
+            offset += length
+
+
+    def _scan_hashes(self):
+        """
+        Yields the index entries of all live records.
+
+        Returns:
+        generator: (title hash, offset) tuples.
+        """
+        for offset, title, _ in self._scan():
+            yield _title_hash(title), offset
+
+
+    def _find(self, title):
+        """
+        Looks up the exact title in the index. The hash ignores the case,
+        titles only differing in case share it and are told apart by
+        comparing the stored title.
+
+        Args:
+        title (str): The exact title.
+
+        Returns:
+        tuple: The slot holding the title, or the slot to insert it into,
+            the offset of its record or None, and the hash of the title.
+        """
+        title_hash = _title_hash(title)
+        slot_count = INDEX_HEADER.unpack_from(self._index)[2]
+        slot = title_hash % slot_count
+        free_slot = None
+        while True:
+            stored_hash, offset = SLOT.unpack_from(self._index, HEADER_SIZE + slot * SLOT.size)
+            if offset == EMPTY:
+                return (slot if free_slot is None else free_slot), None, title_hash
+            if offset == REMOVED:
+                if free_slot is None:
+                    free_slot = slot
+            elif stored_hash == title_hash and self._record(offset)[2] == title:
+                return slot, offset, title_hash
+            slot = (slot + 1) % slot_count
+
+
+    def _set_slot(self, slot, title_hash, offset):
+        """
+        Writes an index slot and counts the slots which were never used before.
+
+        Returns:
+        None
+        """
+        magic, epoch, slot_count, used, indexed_end = INDEX_HEADER.unpack_from(self._index)
+        position = HEADER_SIZE + slot * SLOT.size
+        if SLOT.unpack_from(self._index, position)[1] == EMPTY:
+            INDEX_HEADER.pack_into(self._index, 0, magic, epoch, slot_count, used + 1, indexed_end)
+        SLOT.pack_into(self._index, position, title_hash, offset)
+
+
+    def _write_index(self, entries, indexed_end, live=None):
+        """
+        Writes a new index file sized for the live records and maps it.
+
+        Args:
+        entries (iterable): (title hash, offset) tuples of the live records.
+        indexed_end (int): The end of the indexed records.
+        live (int): The number of live records, read from the header if None.
+
+        Returns:
+        None
+        """
+        if live is None:
+            live = self._header()[2]
+        slot_count = MIN_SLOTS
+        while slot_count * MAX_LOAD < live * 2:
+            slot_count *= 2
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w+b') as file:
+            file.truncate(HEADER_SIZE + slot_count * SLOT.size)
+            with mmap.mmap(file.fileno(), 0) as index:
+                used = 0
+                for title_hash, offset in entries:
+                    slot = title_hash % slot_count
+                    while SLOT.unpack_from(index, HEADER_SIZE + slot * SLOT.size)[1] != EMPTY:
+                        slot = (slot + 1) % slot_count
+                    SLOT.pack_into(index, HEADER_SIZE + slot * SLOT.size, title_hash, offset)
+                    used += 1
+                INDEX_HEADER.pack_into(index, 0, INDEX_MAGIC, self._epoch, slot_count, used, indexed_end)
+                index.flush()
+        os.replace(temp_path, self.index_path)
+        self._index_file, self._index = self._map(self.index_path, self._index_file, self._index)
+        self._bump()
+
+
+    def _reserve_slot(self):
+        """
+        Grows the index before an insert would fill it beyond MAX_LOAD.
+
+        Returns:
+        None
+        """
+        _, _, slot_count, used, indexed_end = INDEX_HEADER.unpack_from(self._index)
+        if used + 1 <= slot_count * MAX_LOAD:
+            return
+        entries = []
+        for slot in range(slot_count):
+            title_hash, offset = SLOT.unpack_from(self._index, HEADER_SIZE + slot * SLOT.size)
+            if offset > REMOVED:
+                entries.append((title_hash, offset))
+        self._write_index(entries, indexed_end, len(entries))
+
+
+    def _index_tail(self, start):
+        """
+        Indexes the records appended after start, replacing older records
+        with the same title.
+
+        Args:
+        start (int): The end of the indexed records.
+
+        Returns:
+        None
+        """
+        for offset, title, _ in self._scan(start):
+            self._reserve_slot()
+            slot, old_offset, title_hash = self._find(title)
+            if old_offset is not None and old_offset != offset:
+                self._delete_record(old_offset)
+            self._set_slot(slot, title_hash, offset)
+        self._set_indexed_end(self._header()[1])
+
+
+    def _set_indexed_end(self, indexed_end):
+        """
+        Records up to where the index covers the data file.
+
+        Returns:
+        None
+        """
+        magic, epoch, slot_count, used, _ = INDEX_HEADER.unpack_from(self._index)
+        INDEX_HEADER.pack_into(self._index, 0, magic, epoch, slot_count, used, indexed_end)
+
+
+    def _append(self, record):
+        """
+        Appends a record, growing the data file if it is full.
+
+        Args:
+        record (bytes): The encoded record.
+
+        Returns:
+        int: The offset of the record.
+        """
+        _, data_end, live, dead = self._header()
+        needed = data_end + len(record)
+        if needed > len(self._data):
+            # Doubling keeps the number of remaps logarithmic in the catalog size
+            capacity = max(needed, 2 * len(self._data))
+            self._data.close()
+            self._data_file.truncate(capacity)
+            self._data = mmap.mmap(self._data_file.fileno(), 0)
+        self._data[data_end:needed] = record
+        self._set_header(needed, live + 1, dead)
+        return data_end
+
+
+    def _delete_record(self, offset):
+        """
+        Flags a record as deleted and removes its rating from the aggregates.
+
+        Args:
+        offset (int): The offset of the record.
+
+        Returns:
+        None
+        """
+        length, _, title, _ = self._record(offset)
+        self._data[offset + FLAGS_OFFSET] |= DELETED
+        _, data_end, live, dead = self._header()
+        self._set_header(data_end, live - 1, dead + length)
+        if self._ratings is not None:
+            self._ratings.remove(title)
+
+
+    def _add(self, title, movie):
+        """
+        Appends a movie and points the index at it, replacing a movie with the same title.
+
+        Args:
+        title (str): The title of the movie.
+        movie (dict): The movie details.
+
+        Returns:
+        None
+        """
+        self._reserve_slot()
+        slot, old_offset, title_hash = self._find(title)
+        offset = self._append(_encode_record(title, movie))
+        if old_offset is not None:
+            self._delete_record(old_offset)
+        self._set_slot(slot, title_hash, offset)
+        self._set_indexed_end(self._header()[1])
+        if self._ratings is not None:
+            self._ratings.add(title, movie.get('rating'))
+
+
+    @locked_write
+    def add_movie(self, title, year, rating, poster, plot, genre, director):
+        """
+        Appends a new movie to the storage.
+
+        Args:
+        title (str): The title of the movie.
+        year (str): The year of release of the movie.
+        rating (float): The rating of the movie.
+        poster (str): The URL of the movie poster.
+        plot (str): The plot summary of the movie.
+        genre (str): The genre of the movie.
+        director (str): The director of the movie.
+
+        Returns:
+        None
+        """
+        self._add(title, {
+            'year_of_release': year,
+            'rating': rating,
+            'poster': poster,
+            'plot': plot,
+            'genre': genre,
+            'director': director,
+        })
+        self._bump()
+
+
+    @locked_write
+    def add_movies(self, movies):
+        """
+        Appends several movies under a single lock and generation bump.
+
+        Args:
+        movies (iterable): Dictionaries with the keyword arguments of add_movie.
+
+        Returns:
+        None
+        """
+        with self.batch():
+            for movie in movies:
+                self.add_movie(**movie)
+
+
+    @locked_write
+    def append_movies(self, movies):
+        """
+        Appends movies given as (title, movie details) pairs under a single
+        lock and generation bump, keeping every field including the notes,
+        e.g. to fill a new storage from another one.
+
+        Args:
+        movies (iterable): (title, movie details) tuples, e.g. from IStorage.iter_movies.
+
+        Returns:
+        int: The number of appended movies.
+        """
+        count = 0
+        with self.batch():
+            for title, movie in movies:
+                self._add(title, movie)
+                self._bump()
+                count += 1
+        return count
+
+
+    @contextmanager
+    def batch(self):
+        """
+        Holds the exclusive lock for several mutations, so other processes
+        see them together. The mutations are written as they happen and
+        are not rolled back if an exception leaves the block.
+
+        Returns:
+        contextmanager: The batch, e.g. with storage.batch(): ...
+        """
+        with self._file_lock.locked():
+            self._refresh()
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._changed:
+                    self._changed = False
+                    self._bump()
+
+
+    @locked_write
+    def delete_movie(self, title):
+        """
+        Deletes a specific movie from the storage by flagging its record.
+
+        Only the exact title is looked up, through the index, so a delete
+        does not depend on the catalog size. Typed titles are matched by
+        the caller, see title_resolver.
+
+        Args:
+        title (str): The title of the movie to be deleted.
+
+        Returns:
+        None
+        """
+        slot, offset, _ = self._find(title)
+        if offset is None:
+            print(f"Movie with title '{title}' not found.")
+            return
+        self._delete_record(offset)
+        SLOT.pack_into(self._index, HEADER_SIZE + slot * SLOT.size, 0, REMOVED)
+        self._bump()
+        print(f"Movie with title '{title}' was successfully deleted.")
+
+
+    @locked_write
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a specific movie in place.
+
+        Args:
+        title (str): The title of the movie to be updated.
+        rating (float): The new rating of the movie.
+
+        Returns:
+        None
+
+        Raises:
+        ValueError: If the rating is not a number.
+        """
+        # The record only has room for a number, so other ratings are rejected
+        new_rating = require_rating(rating)
+        _, offset, _ = self._find(title)
+        if offset is None:
+            print(f"Movie with title '{title}' not found.")
+            return
+        struct.pack_into('<d', self._data, offset + RATING_OFFSET, new_rating)
+        if self._ratings is not None:
+            self._ratings.add(self._record(offset)[2], new_rating)
+        self._bump()
+
+
+    def generation(self):
+        """
+        Returns a value which changes whenever the movies change, here or in
+        another process.
+
+        Returns:
+        tuple: The generation counter and the number of local changes.
+        """
+        self._refresh()
+        return self._generation, self._changes
+
+
+    def get_movie(self, title):
+        """
+        Looks up the movie with exactly the given title through the title index.
+
+        Args:
+        title (str): The title of the movie.
+
+        Returns:
+        BinaryMovie or None: The movie, None if there is no such movie.
+        """
+        self._refresh()
+        offset = self._find(title)[1]
+        return None if offset is None else BinaryMovie(self, offset)
+
+
+    def list_movies(self):
+        """
+        Returns a dictionary of all movies in the storage.
+
+        Returns:
+        dict: The movies keyed by title, their text fields are decoded on access.
+        """
+        self._refresh()
+        return {title: BinaryMovie(self, offset) for offset, title, _ in self._scan()}
+
+
+    def iter_movies(self, fields=None):
+        """
+        Yields the movies one at a time, only the requested fields are decoded.
+
+        Args:
+        fields (iterable): The movie fields to yield, None for all fields.
+
+        Returns:
+        generator: (title, movie details) tuples.
+        """
+        self._refresh()
+        for offset, title, _ in self._scan():
+            yield title, project_fields(BinaryMovie(self, offset), fields)
+
+
+    def columns(self, fields):
+        """
+        Returns some fields of all movies column by column, gathered with
+        NumPy at fixed offsets of the mapped records: the live record offsets
+        come from the index, the rating sits in the record header and the
+        field lengths give the start of every text field. Only the text
+        fields asked for are decoded, the years only if they do not start
+        with four digits.
+
+        Args:
+        fields (iterable): The movie fields to read.
+
+        Returns:
+        dict: The column of every field in the order of iter_movies, see
+            istorage.to_column, the numeric fields as NumPy arrays.
+        """
+        import numpy as np
+        self._refresh()
+        slot_count = INDEX_HEADER.unpack_from(self._index)[2]
+        slots = np.frombuffer(self._index, dtype='<u8', count=slot_count * 2, offset=HEADER_SIZE)
+        data = np.frombuffer(self._data, dtype=np.uint8)
+        columns = {}
+        try:
+            # The records in the order they were added, like _scan, free slots hold offsets below HEADER_SIZE
+            offsets = np.sort(slots[1::2][slots[1::2] >= HEADER_SIZE]).astype(np.int64)
+            lengths = data[offsets[:, None] + np.arange(LENGTHS_OFFSET, RECORD_HEADER.size)].view('<u4')
+            lengths = lengths.astype(np.int64)
+            # Unset fields take no bytes
+            sizes = np.where(lengths == NO_VALUE, 0, lengths)
+            starts = offsets[:, None] + RECORD_HEADER.size + np.cumsum(sizes, axis=1) - sizes
+            for field in fields:
+                if field == 'rating':
+                    ratings = data[offsets[:, None] + np.arange(RATING_OFFSET, RATING_OFFSET + 8)]
+                    columns[field] = ratings.view('<f8').ravel()
+                elif field == 'year_of_release':
+                    columns[field] = self._year_column(data, starts[:, 1], lengths[:, 1])
+                elif field in TEXT_FIELDS:
+                    position = TEXT_FIELDS.index(field) + 1
+                    columns[field] = [
+                        None if length == NO_VALUE else self._data[start:start + length].decode('utf-8')
+                        for start, length in zip(starts[:, position].tolist(), lengths[:, position].tolist())
+                    ]
+        finally:
+            # Views of the mappings must not outlive this call, they would keep them from being remapped
+            del slots, data
+        return columns
+
+
+    def _year_column(self, data, starts, lengths):
+        """
+        Reads the years of release at their offsets, four ASCII digits are
+        converted with NumPy, any other year by movie_record.to_year.
+
+        Args:
+        data (np.ndarray): The bytes of the data file.
+        starts (np.ndarray): The offset of the year of every record.
+        lengths (np.ndarray): The byte length of the year of every record, NO_VALUE if unset.
+
+        Returns:
+        np.ndarray: The years as floats, NaN where a year is missing or not a number.
+        """
+        import numpy as np
+        positions = np.minimum(starts[:, None] + np.arange(4), data.size - 1)
+        digits = data[positions].astype(np.int64) - ord('0')
+        four_digits = (lengths >= 4) & (lengths != NO_VALUE) & ((digits >= 0) & (digits <= 9)).all(axis=1)
+        years = np.where(four_digits, digits @ np.array([1000, 100, 10, 1]), np.nan)
+        others = np.flatnonzero(~four_digits & (lengths != NO_VALUE))
+        texts = [self._data[start:start + length].decode('utf-8')
+                 for start, length in zip(starts[others].tolist(), lengths[others].tolist())]
+        years[others] = to_column('year_of_release', texts)
+        return years
+
+
+    def search_movies(self, query):
+        """
+        Returns the movies whose title contains the query, ignoring the case.
+
+        Only the titles are decoded while searching.
+
+        Args:
+        query (str): The part of the movie title to search for.
+
+        Returns:
+        dict: The matching movies keyed by title.
+        """
+        self._refresh()
+        query = query.lower()
+        return {title: BinaryMovie(self, offset) for offset, title, _ in self._scan()
+                if query in title.lower()}
+
+
+    def _rating_index(self):
+        """
+        Returns the rating aggregates, built from one pass over the records
+        on first use and then updated per mutation.
+
+        Returns:
+        RatingIndex: The rating aggregates.
+        """
+        if self._ratings is None:
+            self._ratings = RatingIndex((title, rating) for _, title, rating in self._scan())
+        return self._ratings
+
+
+    def rating_stats(self):
+        """
+        Returns the rating statistics from the running aggregates.
+
+        Returns:
+        dict or None: count, average, median, best and worst, where best and
+            worst are (title, rating) tuples, or None if there are no ratings.
+        """
+        self._refresh()
+        return self._rating_index().summary()
+
+
+    def movies_by_rating(self, limit, cursor=None, descending=True):
+        """
+        Returns one page of movies ordered numerically by rating, read from
+        the rating aggregates without sorting the whole catalog.
+
+        Args:
+        limit (int): The maximum number of movies on the page.
+        cursor (tuple): The cursor returned with the previous page, None for the first page.
+        descending (bool): Start with the best rating.
+
+        Returns:
+        tuple: The list of (title, rating) tuples and the cursor of the next
+            page, which is None after the last page.
+        """
+        self._refresh()
+        return self._rating_index().page(limit, cursor, descending)
+
+
+    @locked_write
+    def compact(self):
+        """
+        Rewrites the data file without deleted and replaced records and
+        builds a fresh index for it. Movies read before stop being readable.
+
+        Returns:
+        None
+        """
+        epoch = int.from_bytes(os.urandom(8), 'little')
+        entries = []
+        temp_path = f"{self.file_path}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(bytes(HEADER_SIZE))
+            position = HEADER_SIZE
+            for offset, title, _ in self._scan():
+                length = RECORD_HEADER.unpack_from(self._data, offset)[0]
+                file.write(self._data[offset:offset + length])
+                entries.append((_title_hash(title), position))
+                position += length
+            file.seek(0)
+            file.write(DATA_HEADER.pack(DATA_MAGIC, epoch, position, len(entries), 0))
+            file.truncate(max(position, INITIAL_CAPACITY))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.file_path)
+        self._data_file, self._data = self._map(self.file_path, self._data_file, self._data)
+        self._epoch = epoch
+        self._write_index(entries, position, len(entries))
+
+
+    def close(self):
+        """
+        Writes the mapped pages to disk and closes the files.
+
+        Returns:
+        None
+        """
+        for mapping, file in ((self._data, self._data_file), (self._index, self._index_file)):
+            if mapping is not None:
+                mapping.flush()
+                mapping.close()
+                file.close()
+        self._data = self._data_file = self._index = self._index_file = None
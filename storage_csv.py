@@ -1,150 +1,74 @@
 import csv
-from istorage import IStorage
+from movie_record import MovieRecord
+from storage_memory import InMemoryStorage
+from write_behind import atomic_open
 
 
-class StorageCsv(IStorage):
+class StorageCsv(InMemoryStorage):
     """
     A storage implementation using CSV file to store and manage movie data.
 
+    The movies are held in memory by InMemoryStorage, this class reads and
+    writes the CSV file.
+
     Args:
     file_path (str): The file path for the CSV file used for storing movie data.
+    durability (str): When saves happen: 'immediate' before a mutation
+        returns, 'group-commit' in a background thread every flush_interval
+        seconds, or 'on-exit' only on close.
+    flush_interval (float): Seconds a group commit collects mutations.
 
     Methods:
     - _load_data: Loads movie data from the CSV file.
     - _save_data: Saves movie data to the CSV file.
-    - list_movies: Returns a dictionary of all movies in the storage.
-    - add_movie: Adds a new movie to the storage.
-    - delete_movie: Deletes a specific movie from the storage.
-    - update_movie: Updates the rating of a specific movie in the storage.
+    - _stream_movies: Yields the movies row by row from the CSV file.
     """
 
-    def __init__(self, file_path):
-        """
-        Initializes a new instance of the class.
-
-        Args:
-        file_path (str): The file path for the CSV file used for storing movie data.
-
-        Returns:
-        None
-        """
-        self.file_path = file_path
-        self.movies = {}
-        self._load_data()
-
-
     def _load_data(self):
         """
-        Loads movie data from the CSV file.
+        Loads movie data from the CSV file, the caller holds the lock.
 
         Returns:
-        None
+        dict: The MovieRecords keyed by title.
         """
-        try:
-            with open(self.file_path, 'r', newline='') as file:
-                csv_reader = csv.DictReader(file)
-                for row in csv_reader:
-                    title = row.pop('title')
-                    self.movies[title] = row
-        except FileNotFoundError:
-            # If the file does not exist, initialize an empty dictionary for movies
-            self.movies = {}
+        # A missing file yields no rows, which starts with an empty dictionary for movies
+        return dict(self._stream_movies())
 
 
     def _save_data(self):
         """
         Saves movie data to the CSV file.
 
-        Returns:
-        None
-        """
-        with open(self.file_path, 'w', newline='', encoding='utf-8') as file:
-            fieldnames = ['title', 'year_of_release', 'rating', 'poster', 'plot', 'genre', 'director']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            for title, movie_details in self.movies.items():
-                data = {'title': title, 'year_of_release': movie_details['year_of_release'], 'rating': movie_details['rating'], 'poster': movie_details['poster'], 'plot': movie_details['plot'], 'genre': movie_details['genre'], 'director': movie_details['director']}
-                writer.writerow(data)
-
-
-    def list_movies(self):
-        """
-        Returns a dictionary of all movies in the storage.
-
-        Returns:
-        dict: A dictionary of all movies in the storage.
-        """
-        return self.movies
-
-
-    def add_movie(self, title, year, rating, poster, plot, genre, director):
-        """
-        Adds a new movie to the storage.
-
-        Args:
-        title (str): The title of the movie.
-        year (str): The year of release of the movie.
-        rating (str): The rating of the movie.
-        poster (str): The URL of the movie poster.
-        plot (str): The plot summary of the movie.
-        genre (str): The genre of the movie.
-        director (str): The director of the movie.
-
-        Returns:
-        None
-        """
-        new_movie = {
-            "year_of_release": year,
-            "rating": rating,
-            "poster": poster,
-            "plot": plot,
-            "genre": genre,
-            "director": director
-        }
-        self.movies[title] = new_movie
-        self._save_data()
-
-
-    @staticmethod
-    def is_exist(title, movies_dict):
-        for movie in movies_dict:
-            if title.lower() in movie.lower():
-                return (True, movie)
-        return (False, title)
-
-
-    def delete_movie(self, title):
-        """
-        Deletes a specific movie from the storage.
-
-        Args:
-        title (str): The title of the movie to be deleted.
+        The rows are written to a temporary file which atomically replaces the
+        CSV file, so a crash mid-write keeps the previous catalog. The items are
+        copied first, so the background writer can save while mutations go on.
 
         Returns:
         None
         """
-        movie_exist = self.is_exist(title, self.movies)
-        if movie_exist[0]:
-            del self.movies[movie_exist[1]]
-            print(f"Movie with title '{title}' was successfully deleted.")
-        else:
-                print(f"Movie with title '{title}' not found.")
-        self._save_data()
-
-
-    def update_movie(self, title, rating):
+        snapshot = list(self.movies.items())
+        with self._file_lock.locked():
+            with atomic_open(self.file_path, newline='', encoding='utf-8') as file:
+                fieldnames = ['title', 'year_of_release', 'rating', 'poster', 'plot', 'genre', 'director']
+                writer = csv.DictWriter(file, fieldnames=fieldnames)
+                writer.writeheader()
+                for title, movie_details in snapshot:
+                    data = {'title': title, 'year_of_release': movie_details['year_of_release'], 'rating': movie_details['rating'], 'poster': movie_details['poster'], 'plot': movie_details['plot'], 'genre': movie_details['genre'], 'director': movie_details['director']}
+                    writer.writerow(data)
+            self._mark_written()
+
+
+    def _stream_movies(self):
         """
-        Updates the rating of a specific movie in the storage.
-
-        Args:
-        title (str): The title of the movie to be updated.
-        rating (str): The new rating of the movie.
+        Yields the movies row by row from the CSV file.
 
         Returns:
-        None
+        generator: (title, MovieRecord) tuples.
         """
-        if title in self.movies:
-            self.movies[title]["rating"] = rating
-            self._save_data()
-        else:
-            print(f"Movie with title '{title}' not found.")
+        try:
+            with open(self.file_path, 'r', newline='') as file:
+                for row in csv.DictReader(file):
+                    title = row.pop('title')
+                    yield title, MovieRecord.from_dict(row)
+        except FileNotFoundError:
+            return
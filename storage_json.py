@@ -1,141 +1,297 @@
 import json
-from istorage import IStorage
+import os
+import shutil
+import threading
+from file_lock import file_signature
+from json_stream import iter_object_items
+from movie_record import MovieRecord
+from storage_memory import InMemoryStorage
+from write_behind import DEFAULT_FLUSH_INTERVAL, IMMEDIATE, atomic_open
 
+# Size in bytes after which the journal is folded back into the snapshot
+COMPACT_THRESHOLD = 1024 * 1024
 
-class StorageJson(IStorage):
+
+class StorageJson(InMemoryStorage):
     """
     A storage implementation using JSON file to store and manage movie data.
 
+    The movies are held in memory by InMemoryStorage, this class reads and
+    writes the JSON file and the journal.
+
     Args:
     file_path (str): The file path for the JSON file used for storing movie data.
+    journaled (bool): If True, every mutation is appended as one compact record
+        to a journal next to the JSON file instead of rewriting the whole file.
+    compact_threshold (int): Journal size in bytes which triggers a background
+        compaction of the journal into the JSON snapshot.
+    durability (str): When full saves happen: 'immediate' before a mutation
+        returns, 'group-commit' in a background thread every flush_interval
+        seconds, or 'on-exit' only on close.
+    flush_interval (float): Seconds a group commit collects mutations.
 
     Methods:
-    - _load_data: Loads movie data from the JSON file.
+    - _load_data: Loads movie data from the JSON file and replays the journal.
     - _save_data: Saves movie data to the JSON file.
-    - list_movies: Returns a list of all movies in the storage.
-    - add_movie: Adds a new movie to the storage.
-    - delete_movie: Deletes a specific movie from the storage.
-    - update_movie: Updates the rating of a specific movie in the storage.
+    - _stream_movies: Yields the movies item by item from the JSON file.
+    - _persist: Persists mutations, either journaled or by a full save.
+    - compact: Folds the journal into the JSON snapshot.
+    - close: Writes the pending changes and stops the background writer.
     """
-    def __init__(self, file_path):
+    def __init__(self, file_path, journaled=False, compact_threshold=COMPACT_THRESHOLD,
+                 durability=IMMEDIATE, flush_interval=DEFAULT_FLUSH_INTERVAL):
         """
         Initializes a new instance of the class.
 
         Args:
         file_path (str): The file path for the JSON file used for storing movie data.
+        journaled (bool): Append mutations to a journal instead of rewriting the file.
+        compact_threshold (int): Journal size in bytes which triggers a compaction.
+        durability (str): 'immediate', 'group-commit' or 'on-exit'.
+        flush_interval (float): Seconds a group commit collects mutations.
 
         Returns:
         None
         """
-        self.file_path = file_path
-        self.movies = {}
-        self._load_data()
+        self.journal_path = f"{file_path}.log"
+        self._compacting_path = f"{file_path}.log.compacting"
+        self.journaled = journaled
+        self.compact_threshold = compact_threshold
+        self._journal_lock = threading.Lock()
+        self._compaction = None
+        super().__init__(file_path, durability, flush_interval)
+
+
+    def _disk_signature(self):
+        """
+        Returns the generation counter and the signatures of the JSON file
+        and the journals, which change with every write of any process.
+
+        Returns:
+        tuple: The current signature.
+        """
+        return (self._file_lock.read_generation(), file_signature(self.file_path),
+                file_signature(self.journal_path), file_signature(self._compacting_path))
 
 
     def _load_data(self):
         """
-        Loads movie data from the JSON file.
+        Loads movie data from the JSON file and replays the journals, the
+        caller holds the lock.
 
         Returns:
-        None
+        dict: The MovieRecords keyed by title.
         """
+        movies = {}
         try:
             with open(self.file_path, 'r') as file:
-                self.movies = json.load(file)
+                # Converted item by item, so the parsed dicts never pile up
+                for title, movie in iter_object_items(file):
+                    movies[title] = MovieRecord.from_dict(movie)
         except FileNotFoundError:
-            # If the file does not exist, initialize an empty dictionary for movies
-            self.movies = {}
+            # If the file does not exist, start with an empty dictionary for movies
+            movies = {}
+        # A leftover compacting journal means the last compaction did not finish,
+        # its records are older than the ones in the current journal.
+        self._replay_journal(self._compacting_path, movies)
+        self._replay_journal(self.journal_path, movies)
+        return movies
+
+
+    def _replay_journal(self, journal_path, movies):
+        """
+        Applies the records of a journal file on top of the loaded snapshot.
+
+        Every record carries the full new value, so replaying a record which
+        is already part of the snapshot is harmless.
+
+        Args:
+        journal_path (str): The path of the journal file to replay.
+        movies (dict): The movies loaded from the snapshot.
+
+        Returns:
+        None
+        """
+        try:
+            with open(journal_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn line left by a crash mid-append
+                        continue
+                    self._apply_record(record, movies)
+        except FileNotFoundError:
+            pass
+
+
+    def _apply_record(self, record, movies):
+        """
+        Applies a single journal record to the loaded movies.
+
+        Args:
+        record (dict): The journal record with the keys 'op', 'title' and
+            either 'movie' or 'rating'.
+        movies (dict): The movies loaded from the snapshot.
+
+        Returns:
+        None
+        """
+        operation = record['op']
+        title = record['title']
+        if operation == 'add':
+            movies[title] = MovieRecord.from_dict(record['movie'])
+        elif operation == 'delete':
+            movies.pop(title, None)
+        elif operation == 'update' and title in movies:
+            movies[title]['rating'] = record['rating']
 
 
     def _save_data(self):
         """
         Saves movie data to the JSON file.
 
+        The movies are written to a temporary file which atomically replaces
+        the JSON file, so a crash mid-write keeps the previous catalog. The
+        items are copied first, a single C-level call, so the background
+        writer can save while mutations go on. The full snapshot supersedes
+        the journal, so the journal is removed afterwards.
+
         Returns:
         None
         """
-        with open(self.file_path, 'w') as file:
-            json.dump(self.movies, file, indent=4)
+        self._wait_for_compaction()
+        snapshot = dict(list(self.movies.items()))
+        with self._file_lock.locked():
+            with atomic_open(self.file_path) as file:
+                json.dump(snapshot, file, indent=4, default=MovieRecord.to_dict)
+            for journal_path in (self.journal_path, self._compacting_path):
+                if os.path.exists(journal_path):
+                    os.remove(journal_path)
+            self._mark_written()
 
 
-    def list_movies(self):
+    def _stream_movies(self):
         """
-        Returns a dict of all movies in the storage.
+        Yields the movies item by item from the JSON file. A pending journal
+        has to be replayed first, in that case the movies are loaded.
 
         Returns:
-        dict: A dict of all movies in the storage.
+        generator: (title, MovieRecord) tuples.
         """
-        return self.movies
+        if os.path.exists(self.journal_path) or os.path.exists(self._compacting_path):
+            self._refresh()
+            yield from self._movies.items()
+            return
+        try:
+            with open(self.file_path, 'r') as file:
+                for title, movie in iter_object_items(file):
+                    yield title, MovieRecord.from_dict(movie)
+        except FileNotFoundError:
+            return
 
 
-    def add_movie(self, title, year, rating, poster, plot, genre, director):
+    def _persist(self, records):
         """
-        Adds a new movie to the storage.
+        Persists one or more mutations.
+
+        In journaled mode the records are appended to the journal, which is
+        O(1) per record regardless of the catalog size, otherwise the whole
+        file is saved according to the durability.
 
         Args:
-        title (str): The title of the movie.
-        year (str): The year of release of the movie.
-        rating (float): The rating of the movie.
-        poster (str): The URL of the movie poster.
-        plot (str): The plot summary of the movie.
-        genre (str): The genre of the movie.
-        director (str): The director of the movie.
+        records (tuple): The journal records describing the mutations.
 
         Returns:
         None
         """
-        new_movie = {
-            "year_of_release": year,
-            "rating": rating,
-            "poster": poster,
-            "plot": plot,
-            "genre": genre,
-            "director": director
-            }
-        self.movies[title] = new_movie
-        self._save_data()
-
-
-    @staticmethod
-    def is_exist(title, movies_dict):
-        for movie in movies_dict:
-            if title.lower() in movie.lower():
-                return (True, movie)
-        return (False, title)
+        if not self.journaled:
+            self._writer.mark_dirty()
+            return
+        lines = ''.join(json.dumps(record, separators=(',', ':'), default=MovieRecord.to_dict) + '\n'
+                        for record in records)
+        with self._journal_lock, self._file_lock.locked():
+            with open(self.journal_path, 'a', encoding='utf-8') as file:
+                file.write(lines)
+                journal_size = file.tell()
+            self._mark_written()
+        if journal_size >= self.compact_threshold:
+            self.compact(background=True)
 
 
-    def delete_movie(self, title):
+    def compact(self, background=False):
         """
-        Deletes a specific movie from the storage.
+        Folds the journal into the JSON snapshot.
+
+        The current journal is moved aside and a copy of the movies is taken,
+        so new mutations keep going to a fresh journal while the snapshot is
+        written.
 
         Args:
-        title (str): The title of the movie to be deleted.
+        background (bool): Write the snapshot in a background thread.
 
         Returns:
         None
         """
-        movie_exist = self.is_exist(title, self.movies)
-        if movie_exist[0]:
-            del self.movies[movie_exist[1]]
-            print(f"Movie with title '{title}' was successfully deleted.")
+        with self._journal_lock, self._file_lock.locked():
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            if not os.path.exists(self.journal_path):
+                return
+            if os.path.exists(self._compacting_path):
+                # Leftover of an interrupted compaction, fold the journal into it
+                with open(self.journal_path, 'r', encoding='utf-8') as source, \
+                        open(self._compacting_path, 'a', encoding='utf-8') as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self._compacting_path)
+            self._mark_written()
+            snapshot = {title: movie.to_dict() for title, movie in self.movies.items()}
+        if background:
+            self._compaction = threading.Thread(target=self._write_snapshot, args=(snapshot,))
+            self._compaction.start()
         else:
-                print(f"Movie with title '{title}' not found.")
-        self._save_data()
+            self._write_snapshot(snapshot)
 
 
-    def update_movie(self, title, rating):
+    def _write_snapshot(self, snapshot):
         """
-        Updates the rating of a specific movie in the storage.
+        Atomically replaces the JSON file with the snapshot and drops the
+        journal which the snapshot already contains.
 
         Args:
-        title (str): The title of the movie to be updated.
-        rating (float): The new rating of the movie.
+        snapshot (dict): The movies to write.
 
         Returns:
         None
         """
-        if title in self.movies:
-            self.movies[title]["rating"] = rating
-            self._save_data()
-        else:
-            print(f"Movie with title '{title}' not found.")
+        with self._file_lock.locked():
+            with atomic_open(self.file_path) as file:
+                json.dump(snapshot, file, indent=4)
+            os.remove(self._compacting_path)
+            self._mark_written()
+
+
+    def _wait_for_compaction(self):
+        """
+        Blocks until a running background compaction has finished.
+
+        Returns:
+        None
+        """
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+
+    def close(self):
+        """
+        Writes the pending changes and waits for the background writer and
+        a running compaction.
+
+        Returns:
+        None
+        """
+        super().close()
+        self._wait_for_compaction()
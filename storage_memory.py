@@ -0,0 +1,504 @@
+from contextlib import contextmanager
+from file_lock import FileLock, file_signature, locked_write
+from istorage import IStorage, project_fields, to_column
+from movie_record import MOVIE_FIELDS, MovieRecord
+from rating_index import RatingIndex, require_rating
+from storage_batch import BatchLog
+from title_index import TrigramIndex
+from write_behind import DEFAULT_FLUSH_INTERVAL, IMMEDIATE, WriteBehind
+
+
+class InMemoryStorage(IStorage):
+    """
+    The common part of the storages which hold all movies in memory and
+    write them to a file, StorageJson and StorageCsv.
+
+    The file is only parsed on first use, into MovieRecords keyed by title,
+    with a TrigramIndex of the titles and a RatingIndex of the ratings which
+    every mutation keeps up to date. Until then iter_movies streams the
+    movies straight from the file.
+
+    Several processes can share the file: writes hold an exclusive lock on a
+    sidecar lock file and mutations first reload the movies if another
+    process changed them. Every operation compares the generation counter
+    in the lock file and the modification time and size of the files with
+    the ones seen last, so the file is only parsed again after a change.
+    Changes which are not written yet are never replaced by a reload, with
+    a deferred durability the last process to write wins.
+
+    Subclasses read and write the file format:
+    - _load_data: Reads the movies from the files, the caller holds the lock.
+    - _save_data: Writes all movies to the file.
+    - _stream_movies: Yields the movies from the file without loading them.
+    and may override _disk_signature and _persist, e.g. to journal mutations.
+
+    Args:
+    file_path (str): The file path of the file used for storing movie data.
+    durability (str): When saves happen: 'immediate' before a mutation
+        returns, 'group-commit' in a background thread every flush_interval
+        seconds, or 'on-exit' only on close.
+    flush_interval (float): Seconds a group commit collects mutations.
+
+    Methods:
+    - _refresh: Loads the movie data, or reloads it if another process changed it.
+    - _commit: Persists a mutation according to the durability unless a batch is open.
+    - close: Writes the pending changes and stops the background writer.
+    - iter_movies: Yields the movies one at a time, streamed from the file until they are loaded.
+    - list_movies: Returns a dictionary of all movies in the storage.
+    - add_movie: Adds a new movie to the storage.
+    - add_movies: Adds several movies to the storage with a single save.
+    - batch: Groups several mutations into one write, rolled back on an exception.
+    - generation: Returns a value which changes whenever the movies change.
+    - get_movie: Returns the movie with exactly the given title.
+    - columns: Returns some fields of all movies column by column, cached per generation.
+    - is_exist: Looks up the first movie whose title contains a text.
+    - search_movies: Returns the movies whose title contains a query.
+    - rating_stats: Returns the rating statistics from the running aggregates.
+    - movies_by_rating: Returns one page of movies ordered by rating.
+    - delete_movie: Deletes a specific movie from the storage.
+    - update_movie: Updates the rating of a specific movie in the storage.
+    """
+
+    def __init__(self, file_path, durability=IMMEDIATE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        Initializes a new instance of the class.
+
+        Args:
+        file_path (str): The file path of the file used for storing movie data.
+        durability (str): 'immediate', 'group-commit' or 'on-exit'.
+        flush_interval (float): Seconds a group commit collects mutations.
+
+        Returns:
+        None
+        """
+        self.file_path = file_path
+        self._movies = None
+        self._title_index = TrigramIndex()
+        self._rating_index = RatingIndex()
+        self._batch_log = BatchLog()
+        self._file_lock = FileLock(file_path)
+        self._signature = None
+        self._loads = 0
+        self._changes = 0
+        self._columns = None
+        # _save_data is looked up on every flush, so a wrapped (e.g. instrumented) method is used
+        self._writer = WriteBehind(lambda: self._save_data(), durability, flush_interval)
+
+
+    @property
+    def movies(self):
+        """
+        The movies keyed by title, the file is only parsed on first use.
+
+        Returns:
+        dict: The movies in the storage.
+        """
+        self._ensure_loaded()
+        return self._movies
+
+
+    def _ensure_loaded(self):
+        """
+        Loads the movie data and builds the indexes if that did not happen yet.
+
+        Returns:
+        None
+        """
+        if self._movies is None:
+            self._reload()
+
+
+    def _refresh(self):
+        """
+        Loads the movie data on first use and reloads it when another process
+        changed the files since they were last read or written here. Pending
+        local changes, in an open batch or not written yet, are kept.
+
+        Returns:
+        None
+        """
+        if self._movies is None:
+            self._reload()
+        elif (not self._batch_log.active and not self._writer.pending
+              and self._disk_signature() != self._signature):
+            self._reload()
+
+
+    def _disk_signature(self):
+        """
+        Returns the generation counter and the signature of the file, which
+        change with every write of any process.
+
+        Returns:
+        tuple: The current signature.
+        """
+        return self._file_lock.read_generation(), file_signature(self.file_path)
+
+
+    def _mark_written(self):
+        """
+        Bumps the generation counter after a write and remembers the new
+        signature, so this process does not reload its own write. The
+        caller holds the exclusive lock.
+
+        Returns:
+        None
+        """
+        self._file_lock.bump_generation()
+        self._signature = self._disk_signature()
+
+
+    def _reload(self):
+        """
+        Loads the movies with _load_data under the shared lock and builds
+        the indexes.
+
+        Returns:
+        None
+        """
+        with self._file_lock.locked(shared=True):
+            self._movies = self._load_data()
+            self._signature = self._disk_signature()
+        self._title_index = TrigramIndex(self._movies)
+        self._rating_index = RatingIndex(
+            (title, movie['rating']) for title, movie in self._movies.items()
+        )
+        self._loads += 1
+
+
+    def _load_data(self):
+        """
+        Reads the movies from the files, the caller holds the lock.
+
+        Returns:
+        dict: The MovieRecords keyed by title.
+        """
+        raise NotImplementedError
+
+
+    def _save_data(self):
+        """
+        Writes all movies to the file.
+
+        Returns:
+        None
+        """
+        raise NotImplementedError
+
+
+    def _stream_movies(self):
+        """
+        Yields the movies from the file one at a time without loading them.
+
+        Returns:
+        generator: (title, MovieRecord) tuples.
+        """
+        raise NotImplementedError
+
+
+    def _commit(self, *records):
+        """
+        Persists one or more mutations, or leaves them to the end of an open batch.
+
+        Args:
+        records (dict): The journal records describing the mutations.
+
+        Returns:
+        None
+        """
+        self._changes += 1
+        if self._batch_log.defer(records):
+            return
+        self._persist(records)
+
+
+    def _persist(self, records):
+        """
+        Saves the movie data according to the durability.
+
+        Args:
+        records (tuple): The journal records of the mutations, unused here.
+
+        Returns:
+        None
+        """
+        self._writer.mark_dirty()
+
+
+    def close(self):
+        """
+        Writes the pending changes and stops the background writer.
+
+        Returns:
+        None
+        """
+        self._writer.close()
+
+
+    def list_movies(self):
+        """
+        Returns a dictionary of all movies in the storage.
+
+        Returns:
+        dict: A dictionary of all movies in the storage.
+        """
+        self._refresh()
+        return self._movies
+
+
+    def iter_movies(self, fields=None):
+        """
+        Yields the movies one at a time. Until the movies are loaded they
+        are streamed from the file, so memory stays flat no matter how
+        large the file is.
+
+        Args:
+        fields (iterable): The movie fields to yield, None for all fields.
+
+        Returns:
+        generator: (title, movie details) tuples.
+        """
+        if self._movies is None:
+            movies = self._stream_movies()
+        else:
+            self._refresh()
+            movies = self._movies.items()
+        for title, movie in movies:
+            yield title, project_fields(movie, fields)
+
+
+    @locked_write
+    def add_movie(self, title, year, rating, poster, plot, genre, director):
+        """
+        Adds a new movie to the storage.
+
+        Args:
+        title (str): The title of the movie.
+        year (str): The year of release of the movie.
+        rating (float): The rating of the movie.
+        poster (str): The URL of the movie poster.
+        plot (str): The plot summary of the movie.
+        genre (str): The genre of the movie.
+        director (str): The director of the movie.
+
+        Returns:
+        None
+        """
+        new_movie = MovieRecord(
+            year_of_release=year,
+            rating=rating,
+            poster=poster,
+            plot=plot,
+            genre=genre,
+            director=director
+        )
+        self._batch_log.remember(self.movies, title)
+        self.movies[title] = new_movie
+        self._title_index.add(title)
+        self._rating_index.add(title, new_movie['rating'])
+        self._commit({"op": "add", "title": title, "movie": new_movie})
+
+
+    @locked_write
+    def add_movies(self, movies):
+        """
+        Adds several movies to the storage with a single save.
+
+        Args:
+        movies (list): Dictionaries with the keyword arguments of add_movie.
+
+        Returns:
+        None
+        """
+        with self.batch():
+            for movie in movies:
+                self.add_movie(**movie)
+
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups several mutations into one write.
+
+        Inside the with block the mutations are only applied in memory and
+        written once when the block exits. If an exception leaves the block,
+        the touched movies are restored to their state before the batch.
+        Other processes cannot write while the batch is open.
+
+        Returns:
+        contextmanager: The batch, e.g. with storage.batch(): ...
+        """
+        with self._file_lock.locked():
+            self._refresh()
+            with self._batch_log.run(self, lambda records: self._commit(*records)):
+                yield self
+
+
+    def generation(self):
+        """
+        Returns a value which changes whenever the movies change, by a
+        mutation here, also one not written yet, or by another process.
+        Writing the mutations of this process, e.g. by the background
+        writer, does not change it.
+
+        Returns:
+        tuple: The number of times the files were loaded, i.e. changes of
+            other processes were read, and the number of local mutations.
+        """
+        self._refresh()
+        return self._loads, self._changes
+
+
+    def get_movie(self, title):
+        """
+        Returns the details of the movie with exactly the given title.
+
+        Args:
+        title (str): The title of the movie.
+
+        Returns:
+        MovieRecord or None: The movie details, None if there is no such movie.
+        """
+        self._refresh()
+        return self._movies.get(title)
+
+
+    def columns(self, fields):
+        """
+        Returns some fields of all movies column by column. Until the movies
+        are loaded they are streamed from the file like iter_movies. Once
+        loaded, the columns are kept until the generation changes, so
+        repeated analytics of an unchanged catalog do not walk the movies
+        again.
+
+        Args:
+        fields (iterable): The movie fields to read.
+
+        Returns:
+        dict: The column of every field in the order of iter_movies, see
+            istorage.to_column, the numeric fields as NumPy arrays.
+        """
+        if self._movies is None:
+            return super().columns(fields)
+        generation = self.generation()
+        if self._columns is None or self._columns[0] != generation:
+            self._columns = (generation, {})
+        cached = self._columns[1]
+        for field in fields:
+            if field in MOVIE_FIELDS and field not in cached:
+                cached[field] = to_column(field, [getattr(movie, field) for movie in self._movies.values()])
+        return {field: cached[field] for field in fields if field in cached}
+
+
+    def is_exist(self, title):
+        """
+        Looks up the first movie whose title contains the given text, ignoring the case.
+
+        Args:
+        title (str): The title, or a part of the title, to look up.
+
+        Returns:
+        tuple: (True, stored title) if a movie matches, otherwise (False, title).
+        """
+        self._refresh()
+        movie = self._title_index.first_match(title)
+        if movie is not None:
+            return (True, movie)
+        return (False, title)
+
+
+    def search_movies(self, query):
+        """
+        Returns the movies whose title contains the query, ignoring the case.
+
+        Only the titles sharing all trigrams with the query are compared.
+
+        Args:
+        query (str): The part of the movie title to search for.
+
+        Returns:
+        dict: The matching movies keyed by title.
+        """
+        self._refresh()
+        return {title: self._movies[title] for title in self._title_index.search(query)}
+
+
+    def rating_stats(self):
+        """
+        Returns the rating statistics from the running aggregates, which are
+        updated on every mutation instead of being recomputed.
+
+        Returns:
+        dict or None: count, average, median, best and worst, where best and
+            worst are (title, rating) tuples, or None if there are no ratings.
+        """
+        self._refresh()
+        return self._rating_index.summary()
+
+
+    def movies_by_rating(self, limit, cursor=None, descending=True):
+        """
+        Returns one page of movies ordered numerically by rating, read from
+        the rating index without sorting the whole catalog.
+
+        Args:
+        limit (int): The maximum number of movies on the page.
+        cursor (tuple): The cursor returned with the previous page, None for the first page.
+        descending (bool): Start with the best rating.
+
+        Returns:
+        tuple: The list of (title, rating) tuples and the cursor of the next
+            page, which is None after the last page.
+        """
+        self._refresh()
+        return self._rating_index.page(limit, cursor, descending)
+
+
+    @locked_write
+    def delete_movie(self, title):
+        """
+        Deletes a specific movie from the storage.
+
+        Args:
+        title (str): The title of the movie to be deleted.
+
+        Returns:
+        None
+        """
+        # An exact title wins over titles merely containing it
+        movie_exist = (True, title) if title in self.movies else self.is_exist(title)
+        if movie_exist[0]:
+            self._batch_log.remember(self.movies, movie_exist[1])
+            del self.movies[movie_exist[1]]
+            self._title_index.remove(movie_exist[1])
+            self._rating_index.remove(movie_exist[1])
+            self._commit({"op": "delete", "title": movie_exist[1]})
+            print(f"Movie with title '{title}' was successfully deleted.")
+        else:
+            print(f"Movie with title '{title}' not found.")
+
+
+    @locked_write
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a specific movie in the storage.
+
+        Args:
+        title (str): The title of the movie to be updated.
+        rating (float): The new rating of the movie.
+
+        Returns:
+        None
+
+        Raises:
+        ValueError: If the rating is not a number.
+        """
+        # Checked before anything changes, a bad rating must not leave the movie half updated
+        new_rating = require_rating(rating)
+        if title in self.movies:
+            self._batch_log.remember(self.movies, title)
+            self.movies[title]["rating"] = new_rating
+            self._rating_index.add(title, new_rating)
+            self._commit({"op": "update", "title": title, "rating": new_rating})
+        else:
+            print(f"Movie with title '{title}' not found.")
@@ -0,0 +1,471 @@
+import sqlite3
+from contextlib import contextmanager
+from itertools import islice
+from istorage import IStorage, to_column
+from movie_record import MOVIE_FIELDS
+from rating_index import require_rating, to_rating
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    title TEXT PRIMARY KEY,
+    year_of_release TEXT,
+    rating REAL,
+    poster TEXT,
+    plot TEXT,
+    genre TEXT,
+    director TEXT,
+    notes TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_movies_title_nocase ON movies (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_movies_rating ON movies (rating);
+CREATE INDEX IF NOT EXISTS idx_movies_year ON movies (year_of_release);
+CREATE INDEX IF NOT EXISTS idx_movies_director ON movies (director);
+"""
+# Rows inserted per executemany call of an import, only these are held in memory
+IMPORT_CHUNK_SIZE = 1000
+
+
+class StorageSqlite(IStorage):
+    """
+    A storage implementation using a SQLite database to store and manage movie data.
+
+    Every mutation touches a single row, and title lookups go through the
+    case-insensitive title index instead of scanning all movies.
+
+    Args:
+    file_path (str): The file path for the SQLite database used for storing movie data.
+
+    Methods:
+    - _find_title: Resolves a title to the stored title using the title index.
+    - iter_movies: Yields the movies one at a time from a database cursor.
+    - columns: Returns some fields of all movies column by column, selecting only these columns.
+    - list_movies: Returns a dictionary of all movies in the storage.
+    - get_movie: Returns the movie with exactly the given title.
+    - search_movies: Returns the movies whose title contains a query.
+    - generation: Returns a value which changes whenever the movies change.
+    - add_movie: Adds a new movie to the storage.
+    - add_movies: Adds several movies to the storage in a single transaction.
+    - batch: Groups several mutations into one transaction, rolled back on an exception.
+    - delete_movie: Deletes a specific movie from the storage.
+    - update_movie: Updates the rating of a specific movie in the storage.
+    - rating_stats: Returns the rating statistics computed by the database.
+    - movies_by_rating: Returns one page of movies ordered by rating.
+    - import_movies: Imports the movies of another storage.
+    - close: Closes the database connection.
+    """
+
+    def __init__(self, file_path):
+        """
+        Initializes a new instance of the class.
+
+        Args:
+        file_path (str): The file path for the SQLite database used for storing movie data.
+
+        Returns:
+        None
+        """
+        self.file_path = file_path
+        self._connection = sqlite3.connect(file_path)
+        self._connection.executescript(SCHEMA)
+        self._batch_depth = 0
+
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs a write in its own transaction, or in the transaction of an open batch.
+
+        Returns:
+        contextmanager: The transaction.
+        """
+        if self._batch_depth:
+            yield self._connection
+            return
+        with self._connection:
+            yield self._connection
+
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups several mutations into one transaction, which is committed when
+        the with block exits and rolled back if an exception leaves it.
+        Nested batches join the outer one.
+
+        Returns:
+        contextmanager: The batch, e.g. with storage.batch(): ...
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._connection.rollback()
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self._connection.commit()
+
+
+    @staticmethod
+    def _row_to_movie(row):
+        """
+        Converts a database row without the title into a movie dictionary.
+
+        Args:
+        row (tuple): The column values in the order of MOVIE_FIELDS.
+
+        Returns:
+        dict: The movie details, 'notes' is only present if it is set.
+        """
+        movie = dict(zip(MOVIE_FIELDS, row))
+        if movie['notes'] is None:
+            del movie['notes']
+        return movie
+
+
+    def list_movies(self):
+        """
+        Returns a dictionary of all movies in the storage.
+
+        Returns:
+        dict: A dictionary of all movies in the storage.
+        """
+        cursor = self._connection.execute(
+            f"SELECT title, {', '.join(MOVIE_FIELDS)} FROM movies ORDER BY rowid"
+        )
+        return {row[0]: self._row_to_movie(row[1:]) for row in cursor}
+
+
+    def iter_movies(self, fields=None):
+        """
+        Yields the movies one at a time straight from a database cursor,
+        only selecting the requested columns.
+
+        Args:
+        fields (iterable): The movie fields to yield, None for all fields.
+
+        Returns:
+        generator: (title, movie details) tuples.
+        """
+        if fields is None:
+            columns = MOVIE_FIELDS
+        else:
+            columns = tuple(field for field in fields if field in MOVIE_FIELDS)
+        select = ', '.join(('title',) + columns)
+        cursor = self._connection.execute(f"SELECT {select} FROM movies ORDER BY rowid")
+        for row in cursor:
+            movie = dict(zip(columns, row[1:]))
+            if movie.get('notes', '') is None:
+                del movie['notes']
+            yield row[0], movie
+
+
+    def columns(self, fields):
+        """
+        Returns some fields of all movies column by column, selecting only
+        these columns. Ratings which are not stored as numbers are read as
+        NULL, like rating_stats does.
+
+        Args:
+        fields (iterable): The movie fields to read.
+
+        Returns:
+        dict: The column of every field in the order of iter_movies, see
+            istorage.to_column, the numeric fields as NumPy arrays.
+        """
+        fields = tuple(field for field in fields if field in MOVIE_FIELDS)
+        if not fields:
+            return {}
+        select = ', '.join(
+            "CASE WHEN typeof(rating) IN ('real', 'integer') THEN rating END" if field == 'rating' else field
+            for field in fields
+        )
+        rows = self._connection.execute(f"SELECT {select} FROM movies ORDER BY rowid").fetchall()
+        values = list(zip(*rows)) or [()] * len(fields)
+        return {field: to_column(field, list(column)) for field, column in zip(fields, values)}
+
+
+    def get_movie(self, title):
+        """
+        Returns the details of the movie with exactly the given title.
+
+        Args:
+        title (str): The title of the movie.
+
+        Returns:
+        dict or None: The movie details, None if there is no such movie.
+        """
+        row = self._connection.execute(
+            f"SELECT {', '.join(MOVIE_FIELDS)} FROM movies WHERE title = ?", (title,)
+        ).fetchone()
+        return None if row is None else self._row_to_movie(row)
+
+
+    @staticmethod
+    def _escape_like(text):
+        """
+        Escapes the wildcards of a LIKE pattern, for use with ESCAPE '\\'.
+
+        Args:
+        text (str): The literal text.
+
+        Returns:
+        str: The text matching itself in a LIKE pattern.
+        """
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+    def search_movies(self, query):
+        """
+        Returns the movies whose title contains the query, ignoring the case,
+        selected by the database instead of listing all movies.
+
+        Args:
+        query (str): The part of the movie title to search for.
+
+        Returns:
+        dict: The matching movies keyed by title.
+        """
+        cursor = self._connection.execute(
+            f"SELECT title, {', '.join(MOVIE_FIELDS)} FROM movies "
+            "WHERE title LIKE ? ESCAPE '\\' ORDER BY rowid", (f"%{self._escape_like(query)}%",)
+        )
+        return {row[0]: self._row_to_movie(row[1:]) for row in cursor}
+
+
+    def generation(self):
+        """
+        Returns a value which changes whenever the movies change. The data
+        version changes with the commits of other connections, the total
+        changes with every write of this connection.
+
+        Returns:
+        tuple: The data version and the number of changed rows.
+        """
+        data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self._connection.total_changes
+
+
+    def add_movie(self, title, year, rating, poster, plot, genre, director):
+        """
+        Adds a new movie to the storage.
+
+        Args:
+        title (str): The title of the movie.
+        year (str): The year of release of the movie.
+        rating (float): The rating of the movie.
+        poster (str): The URL of the movie poster.
+        plot (str): The plot summary of the movie.
+        genre (str): The genre of the movie.
+        director (str): The director of the movie.
+
+        Returns:
+        None
+        """
+        with self._transaction():
+            self._connection.execute(
+                "INSERT OR REPLACE INTO movies "
+                "(title, year_of_release, rating, poster, plot, genre, director) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (title, year, to_rating(rating), poster, plot, genre, director)
+            )
+
+
+    def add_movies(self, movies):
+        """
+        Adds several movies to the storage in a single transaction.
+
+        Args:
+        movies (list): Dictionaries with the keyword arguments of add_movie.
+
+        Returns:
+        None
+        """
+        with self._transaction():
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO movies "
+                "(title, year_of_release, rating, poster, plot, genre, director) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(movie['title'], movie['year'], to_rating(movie['rating']),
+                  movie['poster'], movie['plot'], movie['genre'], movie['director'])
+                 for movie in movies]
+            )
+
+
+    def _find_title(self, title):
+        """
+        Resolves a title to the title stored in the database.
+
+        The exact title wins, then a case-insensitive match, otherwise the
+        first title starting with the given text is used. The exact title
+        is served by the primary key, the others by the case-insensitive
+        title index.
+
+        Args:
+        title (str): The title, or the beginning of the title, to look up.
+
+        Returns:
+        str or None: The stored title, or None if no movie matches.
+        """
+        row = self._connection.execute("SELECT title FROM movies WHERE title = ?", (title,)).fetchone()
+        if row is None:
+            row = self._connection.execute(
+                "SELECT title FROM movies WHERE title = ? COLLATE NOCASE LIMIT 1", (title,)
+            ).fetchone()
+        if row is None:
+            row = self._connection.execute(
+                "SELECT title FROM movies WHERE title LIKE ? ESCAPE '\\' "
+                "ORDER BY title COLLATE NOCASE LIMIT 1", (f"{self._escape_like(title)}%",)
+            ).fetchone()
+        return row[0] if row else None
+
+
+    def delete_movie(self, title):
+        """
+        Deletes a specific movie from the storage.
+
+        Args:
+        title (str): The title of the movie to be deleted.
+
+        Returns:
+        None
+        """
+        stored_title = self._find_title(title)
+        if stored_title is None:
+            print(f"Movie with title '{title}' not found.")
+            return
+        with self._transaction():
+            self._connection.execute("DELETE FROM movies WHERE title = ?", (stored_title,))
+        print(f"Movie with title '{title}' was successfully deleted.")
+
+
+    def update_movie(self, title, rating):
+        """
+        Updates the rating of a specific movie in the storage.
+
+        Args:
+        title (str): The title of the movie to be updated.
+        rating (float): The new rating of the movie.
+
+        Returns:
+        None
+
+        Raises:
+        ValueError: If the rating is not a number.
+        """
+        new_rating = require_rating(rating)
+        with self._transaction():
+            cursor = self._connection.execute(
+                "UPDATE movies SET rating = ? WHERE title = ?", (new_rating, title)
+            )
+        if cursor.rowcount == 0:
+            print(f"Movie with title '{title}' not found.")
+
+
+    def rating_stats(self):
+        """
+        Returns the rating statistics, computed by the database with the rating index.
+
+        Returns:
+        dict or None: count, average, median, best and worst, where best and
+            worst are (title, rating) tuples, or None if there are no ratings.
+        """
+        numeric = "typeof(rating) IN ('real', 'integer')"
+        count, average = self._connection.execute(
+            f"SELECT COUNT(*), AVG(rating) FROM movies WHERE {numeric}"
+        ).fetchone()
+        if not count:
+            return None
+        middle = self._connection.execute(
+            f"SELECT rating FROM movies WHERE {numeric} ORDER BY rating LIMIT ? OFFSET ?",
+            (2 - count % 2, (count - 1) // 2)
+        ).fetchall()
+        best = self._connection.execute(
+            f"SELECT title, rating FROM movies WHERE {numeric} ORDER BY rating DESC, rowid LIMIT 1"
+        ).fetchone()
+        worst = self._connection.execute(
+            f"SELECT title, rating FROM movies WHERE {numeric} ORDER BY rating, rowid LIMIT 1"
+        ).fetchone()
+        return {
+            'count': count,
+            'average': average,
+            'median': sum(row[0] for row in middle) / len(middle),
+            'best': best,
+            'worst': worst,
+        }
+
+
+    def movies_by_rating(self, limit, cursor=None, descending=True):
+        """
+        Returns one page of movies ordered numerically by rating, read
+        through the rating index with keyset pagination.
+
+        Args:
+        limit (int): The maximum number of movies on the page.
+        cursor (tuple): The cursor returned with the previous page, None for the first page.
+        descending (bool): Start with the best rating.
+
+        Returns:
+        tuple: The list of (title, rating) tuples and the cursor of the next
+            page, which is None after the last page.
+        """
+        direction = 'DESC' if descending else 'ASC'
+        query = "SELECT title, rating FROM movies WHERE typeof(rating) IN ('real', 'integer')"
+        parameters = []
+        if cursor is not None:
+            query += f" AND (rating, title) {'<' if descending else '>'} (?, ?)"
+            parameters.extend(cursor)
+        query += f" ORDER BY rating {direction}, title {direction} LIMIT ?"
+        parameters.append(limit + 1)
+        page = self._connection.execute(query, parameters).fetchall()
+        if len(page) <= limit:
+            return page, None
+        title, rating = page[limit - 1]
+        return page[:limit], (rating, title)
+
+
+    def import_movies(self, storage):
+        """
+        Imports all movies of another storage, e.g. a StorageJson or StorageCsv,
+        in a single transaction. Movies with an existing title are replaced.
+        The movies are streamed from the other storage and inserted in chunks
+        of IMPORT_CHUNK_SIZE, so the catalog is never held in memory at once.
+
+        Args:
+        storage (IStorage): The storage to import the movies from.
+
+        Returns:
+        int: The number of imported movies.
+        """
+        rows = (
+            (title, movie.get('year_of_release'), to_rating(movie.get('rating')),
+             movie.get('poster'), movie.get('plot'), movie.get('genre'),
+             movie.get('director'), movie.get('notes'))
+            for title, movie in storage.iter_movies()
+        )
+        imported = 0
+        with self._transaction():
+            while True:
+                chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO movies "
+                    "(title, year_of_release, rating, poster, plot, genre, director, notes) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    chunk
+                )
+                imported += len(chunk)
+        return imported
+
+
+    def close(self):
+        """
+        Closes the database connection.
+
+        Returns:
+        None
+        """
+        self._connection.close()
@@ -0,0 +1,106 @@
+import csv
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pytest
+import bulk_import
+from storage_json import StorageJson
+
+# The stub's answer for every title, unknown titles are not found
+OMDB_RESPONSES = {
+    'Alien': {'Response': 'True', 'Title': 'Alien', 'Year': '1979', 'Ratings': [{'Value': '8.5/10'}],
+              'Poster': 'https://posters.example/alien.jpg', 'Plot': 'In space.', 'Genre': 'Horror, Sci-Fi',
+              'Director': 'Ridley Scott'},
+    'heat': {'Response': 'True', 'Title': 'Heat', 'Year': '1995', 'Ratings': [{'Value': '8.3/10'}],
+             'Poster': 'N/A', 'Plot': 'A heist.', 'Genre': 'Crime', 'Director': 'Michael Mann'},
+    'No Rating': {'Response': 'True', 'Title': 'No Rating', 'Year': '2001', 'Ratings': [],
+                  'Poster': 'N/A', 'Plot': 'Unrated.', 'Genre': 'Drama', 'Director': 'Nobody'},
+}
+# Titles the stub answers with a server error
+BROKEN_TITLES = {'Broken'}
+
+
+class OmdbStub(BaseHTTPRequestHandler):
+    """
+    Answers OMDB requests from OMDB_RESPONSES and records the requested titles.
+    """
+    requested = []
+
+    def do_GET(self):
+        title = parse_qs(urlsplit(self.path).query)['t'][0]
+        self.requested.append(title)
+        if title in BROKEN_TITLES:
+            self.send_error(500)
+            return
+        body = json.dumps(OMDB_RESPONSES.get(title, {'Response': 'False', 'Error': 'Movie not found!'}))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api_url():
+    OmdbStub.requested = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OmdbStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = StorageJson(str(tmp_path / 'movies.json'))
+    storage.add_movie('Amélie', 2001, 8.3, 'N/A', 'In Paris.', 'Comedy', 'Jean-Pierre Jeunet')
+    yield storage
+    storage.close()
+
+
+def test_fetch_movies_returns_the_responses_in_title_order(api_url):
+    results = bulk_import.fetch_movies(['Alien', 'Missing', 'Broken'], workers=2, api_url=api_url)
+
+    assert [title for title, _ in results] == ['Alien', 'Missing', 'Broken']
+    assert results[0][1]['Title'] == 'Alien'
+    assert results[1][1] == "Error: Movie not found!"
+    assert results[2][1] == "Error: 500"
+
+
+def test_import_titles_stores_found_movies_and_reports_failures(api_url, storage, tmp_path):
+    report_path = tmp_path / 'failures.csv'
+
+    added, failures = bulk_import.import_titles(
+        storage, ['Alien', 'heat', 'Missing', 'Broken', 'No Rating', 'amelie'],
+        workers=3, report_path=str(report_path), api_url=api_url
+    )
+
+    assert added == 2
+    assert sorted(storage.list_movies()) == ['Alien', 'Amélie', 'Heat']
+    assert storage.get_movie('Alien')['rating'] == 8.5
+    assert storage.get_movie('Heat')['director'] == 'Michael Mann'
+    # The stored title is matched ignoring case and accents, so it is not fetched at all
+    assert 'amelie' not in OmdbStub.requested
+    expected = [('Missing', "Error: Movie not found!"),
+                ('Broken', "Error: 500"),
+                ('No Rating', "Error: Incomplete movie details")]
+    assert failures == expected
+    with open(report_path, newline='', encoding='utf-8') as file:
+        assert [tuple(row) for row in csv.reader(file)] == [('title', 'error')] + expected
+
+
+def test_import_titles_removes_the_report_of_an_earlier_run(api_url, storage, tmp_path):
+    report_path = tmp_path / 'failures.csv'
+    report_path.write_text("title,error\nMissing,Error: Movie not found!\n", encoding='utf-8')
+
+    added, failures = bulk_import.import_titles(storage, ['Alien'], report_path=str(report_path),
+                                                api_url=api_url)
+
+    assert (added, failures) == (1, [])
+    assert not report_path.exists()
@@ -0,0 +1,78 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import poster_mirror
+import site_builder
+
+POSTER_IMAGE = b'\x89PNG\r\n\x1a\n the same poster'
+# The stub's image for every path, other paths are not found
+POSTER_PATHS = {'/alien.png': POSTER_IMAGE, '/alien-copy.png': POSTER_IMAGE}
+
+
+class PosterStub(BaseHTTPRequestHandler):
+    """
+    Serves POSTER_PATHS as PNG images.
+    """
+
+    def do_GET(self):
+        content = POSTER_PATHS.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PosterStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_mirror_posters_stores_identical_images_once_and_keeps_failed_urls(base_url, tmp_path):
+    movies = {
+        'Alien': {'poster': f"{base_url}/alien.png"},
+        'Alien Again': {'poster': f"{base_url}/alien-copy.png"},
+        'Heat': {'poster': f"{base_url}/heat.png"},
+        'Unknown': {'poster': 'N/A'},
+    }
+    static_dir = str(tmp_path)
+
+    report = poster_mirror.mirror_posters(lambda: iter(movies.items()), static_dir, workers=3, backoff=0)
+
+    assert report['downloaded'] + report['duplicates'] == 2
+    assert report['duplicates'] == 1
+    assert report['failed'] == [(f"{base_url}/heat.png", "Error: 404")]
+    # Both URLs point to the one file named after the content hash
+    assert os.listdir(os.path.join(static_dir, site_builder.POSTER_DIR)) == [
+        hashlib.sha256(POSTER_IMAGE).hexdigest() + '.png'
+    ]
+    posters = site_builder.load_posters(static_dir)
+    assert site_builder.poster_source(movies['Alien'], posters) == site_builder.poster_source(
+        movies['Alien Again'], posters)
+    assert site_builder.poster_source(movies['Alien'], posters).startswith(f"{site_builder.POSTER_DIR}/")
+    # The failed poster is not mirrored, the pages keep linking to the image host
+    assert site_builder.poster_source(movies['Heat'], posters) == f"{base_url}/heat.png"
+
+
+def test_mirror_posters_skips_posters_mirrored_before(base_url, tmp_path):
+    movies = {'Alien': {'poster': f"{base_url}/alien.png"}}
+    static_dir = str(tmp_path)
+    poster_mirror.mirror_posters(lambda: iter(movies.items()), static_dir, backoff=0)
+
+    report = poster_mirror.mirror_posters(lambda: iter(movies.items()), static_dir, backoff=0)
+
+    assert report == {'downloaded': 0, 'duplicates': 0, 'skipped': 1, 'failed': []}
@@ -0,0 +1,179 @@
+from collections import Counter, defaultdict
+from itertools import count
+
+GRAM_SIZE = 3
+
+
+class TrigramIndex:
+    """
+    An inverted index from the trigrams of the normalized titles to the titles.
+
+    A substring query only has to check the titles which contain every
+    trigram of the query instead of every title in the storage. The index is
+    kept up to date with add and remove, and results keep the insertion
+    order of the titles, like iterating the movies dictionary does.
+
+    Args:
+    titles (iterable): The titles to index initially.
+
+    Methods:
+    - normalize: Normalizes a title or a query for matching.
+    - add: Adds a title to the index.
+    - remove: Removes a title from the index.
+    - search: Returns all titles containing a query.
+    - first_match: Returns the first title containing a query.
+    - near: Returns the titles which may be within an edit distance of a query.
+    """
+
+    def __init__(self, titles=()):
+        """
+        Initializes a new instance of the class.
+
+        Args:
+        titles (iterable): The titles to index initially.
+
+        Returns:
+        None
+        """
+        self._postings = defaultdict(set)
+        self._normalized = {}
+        self._order = {}
+        self._counter = count()
+        for title in titles:
+            self.add(title)
+
+
+    def __len__(self):
+        return len(self._normalized)
+
+
+    @staticmethod
+    def normalize(text):
+        """
+        Normalizes a title or a query for case-insensitive matching.
+
+        Args:
+        text (str): The title or query.
+
+        Returns:
+        str: The normalized text.
+        """
+        return text.lower()
+
+
+    @staticmethod
+    def _grams(text):
+        """
+        Returns the set of trigrams of a normalized text.
+
+        Args:
+        text (str): The normalized text.
+
+        Returns:
+        set: The trigrams, empty for texts shorter than a trigram.
+        """
+        return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+    def add(self, title):
+        """
+        Adds a title to the index, adding a title twice has no effect.
+
+        Args:
+        title (str): The title to add.
+
+        Returns:
+        None
+        """
+        if title in self._normalized:
+            return
+        normalized = self.normalize(title)
+        self._normalized[title] = normalized
+        self._order[title] = next(self._counter)
+        for gram in self._grams(normalized):
+            self._postings[gram].add(title)
+
+
+    def remove(self, title):
+        """
+        Removes a title from the index.
+
+        Args:
+        title (str): The title to remove.
+
+        Returns:
+        None
+        """
+        normalized = self._normalized.pop(title, None)
+        if normalized is None:
+            return
+        del self._order[title]
+        for gram in self._grams(normalized):
+            titles = self._postings[gram]
+            titles.discard(title)
+            if not titles:
+                del self._postings[gram]
+
+
+    def search(self, query):
+        """
+        Returns all titles which contain the query, ignoring the case.
+
+        Args:
+        query (str): The part of the title to search for.
+
+        Returns:
+        list: The matching titles in insertion order.
+        """
+        normalized_query = self.normalize(query)
+        grams = self._grams(normalized_query)
+        if not grams:
+            # Too short for a trigram, compare against the normalized titles
+            return [title for title, normalized in self._normalized.items()
+                    if normalized_query in normalized]
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        matches = [title for title in candidates if normalized_query in self._normalized[title]]
+        return sorted(matches, key=self._order.__getitem__)
+
+
+    def first_match(self, query):
+        """
+        Returns the first title, in insertion order, which contains the query.
+
+        Args:
+        query (str): The part of the title to search for.
+
+        Returns:
+        str or None: The matching title, or None if no title matches.
+        """
+        matches = self.search(query)
+        return matches[0] if matches else None
+
+
+    def near(self, query, max_edits):
+        """
+        Returns the titles which may be within an edit distance of a query.
+
+        An insertion, deletion or substitution changes at most GRAM_SIZE
+        trigrams, so a title within max_edits edits shares all but
+        GRAM_SIZE * max_edits of the trigrams of the query, and the titles
+        sharing fewer are ruled out without comparing them.
+
+        Args:
+        query (str): The text typed by the user.
+        max_edits (int): The largest edit distance of interest.
+
+        Returns:
+        list or None: The candidate titles, which still have to be compared
+            to the query, or None if the query is too short to rule out any
+            title.
+        """
+        grams = self._grams(self.normalize(query))
+        min_shared = len(grams) - GRAM_SIZE * max_edits
+        if min_shared <= 0:
+            return None
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        return [title for title, count in shared.items() if count >= min_shared]
@@ -0,0 +1,272 @@
+import re
+import unicodedata
+from title_index import GRAM_SIZE, TrigramIndex
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+DEFAULT_SUGGESTIONS = 5
+MAX_DISTANCE = 3
+
+
+def normalize_title(title):
+    """
+    Normalizes a title for matching: case-folded, accents stripped and
+    punctuation and runs of whitespace turned into single spaces.
+
+    Args:
+    title (str): The title or the text typed by the user.
+
+    Returns:
+    str: The normalized title, e.g. 'amelie' for 'Amélie!'.
+    """
+    folded = title.casefold()
+    if not folded.isascii():
+        decomposed = unicodedata.normalize('NFKD', folded)
+        folded = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(TOKEN_PATTERN.findall(folded))
+
+
+def _pattern_masks(pattern):
+    """
+    Returns the bit mask of the positions of every character of a pattern,
+    see edit_distance.
+
+    Args:
+    pattern (str): The pattern.
+
+    Returns:
+    dict: The mask of every character of the pattern.
+    """
+    masks = {}
+    for position, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    return masks
+
+
+def edit_distance(pattern, text, masks=None):
+    """
+    Returns the Levenshtein distance of two strings.
+
+    Uses the bit-parallel algorithm of Myers and Hyyrö: a column of the
+    distance matrix is kept in two integers, so the work per character of
+    the text is a handful of integer operations whatever the pattern's
+    length.
+
+    Args:
+    pattern (str): The first string.
+    text (str): The second string.
+    masks (dict): The _pattern_masks of the pattern, computed once when
+        the same pattern is compared to many texts.
+
+    Returns:
+    int: The number of insertions, deletions and substitutions turning
+        one string into the other.
+    """
+    if not pattern:
+        return len(text)
+    if masks is None:
+        masks = _pattern_masks(pattern)
+    get = masks.get
+    full = (1 << len(pattern)) - 1
+    last = 1 << (len(pattern) - 1)
+    positive = full
+    negative = 0
+    distance = len(pattern)
+    for char in text:
+        equal = get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        horizontal_positive = negative | ~(horizontal | positive)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        # The first row grows by one per character of the text
+        horizontal_positive = (horizontal_positive << 1) | 1
+        horizontal_negative <<= 1
+        positive = (horizontal_negative | ~(vertical | horizontal_positive)) & full
+        negative = horizontal_positive & vertical
+    return distance
+
+
+class TitleResolver:
+    """
+    Resolves typed titles to stored ones and suggests the closest titles
+    when there is no match.
+
+    Exact and normalized lookups, see normalize_title, only need
+    dictionaries. For suggestions a TrigramIndex of the normalized titles
+    rules out the titles sharing too few trigrams with the query, so only
+    the remaining candidates are compared by edit distance. Queries too
+    short for that are compared to the titles of a close length. The
+    trigram index is built by the first suggest which needs it and then
+    kept up to date.
+
+    Args:
+    titles (iterable): The titles to index initially.
+
+    Methods:
+    - add: Adds a title.
+    - remove: Removes a title.
+    - matches: Returns the titles with the same normalized title as a text.
+    - resolve: Returns the stored title a text unambiguously refers to.
+    - suggest: Returns the closest titles to a text, ranked.
+    """
+
+    def __init__(self, titles=()):
+        """
+        Initializes a new instance of the class.
+
+        Args:
+        titles (iterable): The titles to index initially.
+
+        Returns:
+        None
+        """
+        self._normalized = {}
+        self._titles = {}
+        self._trigrams = None
+        for title in titles:
+            self.add(title)
+
+
+    def __len__(self):
+        return len(self._normalized)
+
+
+    def __contains__(self, title):
+        return title in self._normalized
+
+
+    def add(self, title):
+        """
+        Adds a title, adding a title twice has no effect.
+
+        Args:
+        title (str): The stored title.
+
+        Returns:
+        None
+        """
+        if title in self._normalized:
+            return
+        key = normalize_title(title)
+        self._normalized[title] = key
+        titles = self._titles.get(key)
+        if titles is None:
+            self._titles[key] = [title]
+            if self._trigrams is not None:
+                self._trigrams.add(key)
+        else:
+            titles.append(title)
+
+
+    def remove(self, title):
+        """
+        Removes a title.
+
+        Args:
+        title (str): The stored title.
+
+        Returns:
+        None
+        """
+        key = self._normalized.pop(title, None)
+        if key is None:
+            return
+        titles = self._titles[key]
+        titles.remove(title)
+        if titles:
+            return
+        del self._titles[key]
+        if self._trigrams is not None:
+            self._trigrams.remove(key)
+
+
+    def matches(self, text):
+        """
+        Returns the titles which are equal to a text once both are normalized.
+
+        Args:
+        text (str): The typed title.
+
+        Returns:
+        list: The stored titles, several if they only differ in case,
+            accents or punctuation.
+        """
+        return list(self._titles.get(normalize_title(text), ()))
+
+
+    def resolve(self, text):
+        """
+        Returns the stored title a text refers to: the title itself if it is
+        stored, otherwise the only title equal to it once both are normalized.
+
+        Args:
+        text (str): The typed title.
+
+        Returns:
+        str or None: The stored title, None if there is none or several.
+        """
+        if text in self._normalized:
+            return text
+        titles = self.matches(text)
+        return titles[0] if len(titles) == 1 else None
+
+
+    def _candidates(self, query, max_distance):
+        """
+        Returns the normalized titles which may be within an edit distance
+        of a normalized query.
+
+        Args:
+        query (str): The normalized query.
+        max_distance (int): The largest edit distance of interest.
+
+        Returns:
+        iterable: The normalized titles to compare to the query.
+        """
+        if self._trigrams is None:
+            if len(query) - GRAM_SIZE + 1 <= GRAM_SIZE * max_distance:
+                # Too short for the trigrams to rule out a title, see TrigramIndex.near
+                return self._titles
+            self._trigrams = TrigramIndex(self._titles)
+        candidates = self._trigrams.near(query, max_distance)
+        return self._titles if candidates is None else candidates
+
+
+    def suggest(self, text, limit=DEFAULT_SUGGESTIONS, max_distance=None):
+        """
+        Returns the titles closest to a text, for a "did you mean" list.
+
+        Candidates are ranked by edit distance between the normalized
+        titles, then titles starting with the text come first, then by
+        title.
+
+        Args:
+        text (str): The typed title.
+        limit (int): The maximum number of suggestions.
+        max_distance (int): The largest edit distance to suggest, by
+            default 1 plus 1 per five characters of the text, at most
+            MAX_DISTANCE.
+
+        Returns:
+        list: (stored title, distance) tuples, the closest first.
+        """
+        query = normalize_title(text)
+        if max_distance is None:
+            max_distance = min(MAX_DISTANCE, 1 + len(query) // 5)
+        masks = _pattern_masks(query)
+        found = []
+        for key in self._candidates(query, max_distance):
+            # The lengths alone already differ by more edits than allowed
+            if abs(len(key) - len(query)) > max_distance:
+                continue
+            distance = edit_distance(query, key, masks)
+            if distance <= max_distance:
+                found.append((distance, not key.startswith(query), key))
+        suggestions = []
+        for distance, _, key in sorted(found):
+            for title in sorted(self._titles[key]):
+                suggestions.append((title, distance))
+        return suggestions[:limit]
@@ -0,0 +1,620 @@
+import asyncio
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from itertools import islice
+from urllib.parse import parse_qs, unquote, urlsplit
+import site_builder
+from file_lock import file_signature
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+CACHE_SIZE = 1024
+MAX_HEADER_BYTES = 64 * 1024
+# Posters are stored under the hash of their content, so a name never changes its image
+POSTER_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REASONS = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+HTML_TYPE = 'text/html; charset=utf-8'
+JSON_TYPE = 'application/json'
+
+
+class HttpError(Exception):
+    """
+    An error which is answered with an HTTP status instead of a page.
+
+    Args:
+    status (int): The HTTP status code.
+    message (str): The explanation sent in the response body.
+    """
+
+    def __init__(self, status, message):
+        """
+        Initializes a new instance of the class.
+
+        Returns:
+        None
+        """
+        super().__init__(message)
+        self.status = status
+
+
+def _int_param(query, name, default, minimum, maximum):
+    """
+    Reads a whole number from the query string.
+
+    Args:
+    query (dict): The parsed query string.
+    name (str): The name of the parameter.
+    default (int): The value if the parameter is missing.
+    minimum (int): The smallest allowed value.
+    maximum (int): The largest allowed value, None for no limit.
+
+    Returns:
+    int: The value.
+    """
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise HttpError(400, f"'{name}' must be a number")
+    if maximum is None and value < minimum:
+        raise HttpError(400, f"'{name}' must be at least {minimum}")
+    if maximum is not None and not minimum <= value <= maximum:
+        raise HttpError(400, f"'{name}' must be between {minimum} and {maximum}")
+    return value
+
+
+def encode_cursor(cursor):
+    """
+    Turns a rating cursor of IStorage.movies_by_rating into a URL-safe string.
+
+    Args:
+    cursor (tuple): The (rating, title) cursor, or None.
+
+    Returns:
+    str or None: The encoded cursor.
+    """
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(text):
+    """
+    Reads a cursor encoded by encode_cursor.
+
+    Args:
+    text (str): The encoded cursor.
+
+    Returns:
+    tuple: The (rating, title) cursor.
+    """
+    try:
+        rating, title = json.loads(base64.urlsafe_b64decode(text.encode('ascii')))
+        return float(rating), str(title)
+    except (ValueError, TypeError):
+        raise HttpError(400, "Invalid 'cursor'")
+
+
+def movie_to_json(title, movie):
+    """
+    Returns a movie as a JSON serializable dictionary.
+
+    Args:
+    title (str): The movie title.
+    movie (dict): The movie details.
+
+    Returns:
+    dict: The title and the movie details.
+    """
+    return {'title': title, **dict(movie.items())}
+
+
+class CatalogServer:
+    """
+    Serves the movies of a storage over HTTP, rendered on demand from the
+    website templates, so changes are visible without rebuilding the site.
+
+    Pages and JSON responses are kept in an LRU cache which is emptied
+    whenever the generation of the storage changes. The ETag of a response
+    is derived from the generation and Last-Modified is the time the
+    generation was first seen, so clients revalidate with If-None-Match or
+    If-Modified-Since and get a 304 while the movies are unchanged.
+
+    The storage is only used from the thread of the event loop, e.g. a
+    SQLite connection must stay in the thread which opened it.
+
+    Routes:
+    - /, /index.html and /index_<n>.html: The pages of the index.
+    - /search_index.json: The search index of search.js.
+    - /movie_<title>.html: The page of a movie.
+    - /api/movies?page=1&per_page=50: One page of movies in storage order.
+    - /api/movies/by-rating?limit=50&cursor=...&order=desc: Movies ordered by rating.
+    - /api/movie?title=...: The details of one movie.
+    - /api/stats: The rating statistics.
+    - /<file>: A file of the static directory, e.g. style.css.
+    - /posters/<file>: A poster mirrored by poster_mirror, pages link to
+      these instead of the remote URL once they exist.
+    - /charts/<file>: A chart drawn by the website build for charts.html.
+
+    Args:
+    storage (IStorage): The storage to serve.
+    static_dir (str): The directory holding the templates and stylesheets.
+    cache_size (int): The maximum number of cached responses.
+
+    Methods:
+    - respond: Answers one request.
+    - start: Starts listening on a host and port.
+    - serve_forever: Serves until the task is cancelled.
+    """
+
+    def __init__(self, storage, static_dir=site_builder.STATIC_DIR, cache_size=CACHE_SIZE):
+        """
+        Initializes a new instance of the class and loads the templates.
+
+        Returns:
+        None
+        """
+        self._storage = storage
+        self._static_dir = static_dir
+        self._templates = site_builder.load_templates(static_dir)
+        self._posters = {}
+        self._posters_signature = None
+        self._charts = False
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._generation = None
+        self._etag = None
+        self._last_modified = 0
+        # Part of every ETag, so tags of a previous run never match
+        self._instance = os.urandom(4).hex()
+
+
+    def _check_generation(self):
+        """
+        Empties the cache and advances the validators if the movies changed.
+
+        Returns:
+        bool: Whether the storage has a generation, i.e. responses can be cached.
+        """
+        generation = self._storage.generation()
+        self._load_posters()
+        # The index links to the charts once a website build drew them
+        self._charts = os.path.isfile(os.path.join(self._static_dir, site_builder.CHARTS_PAGE_NAME))
+        if generation is None:
+            self._cache.clear()
+            return False
+        generation = (generation, self._posters_signature, self._charts)
+        if generation != self._generation or self._etag is None:
+            self._generation = generation
+            self._cache.clear()
+            seed = f"{self._instance}{generation!r}{self._templates['movie_hash']}{self._templates['index_hash']}"
+            self._etag = f'"{hashlib.sha1(seed.encode("utf-8")).hexdigest()[:20]}"'
+            # Whole seconds like the header, always later than the previous version
+            self._last_modified = max(int(time.time()), self._last_modified + 1)
+        return True
+
+
+    def _load_posters(self):
+        """
+        Reloads the local poster paths when poster_mirror changed them.
+
+        Returns:
+        None
+        """
+        signature = file_signature(os.path.join(self._static_dir, site_builder.POSTER_MANIFEST_NAME))
+        if signature != self._posters_signature:
+            self._posters_signature = signature
+            self._posters = site_builder.load_posters(self._static_dir)
+
+
+    def respond(self, method, target, headers):
+        """
+        Answers one request.
+
+        Args:
+        method (str): The HTTP method.
+        target (str): The request target, e.g. /api/movies?page=2.
+        headers (dict): The request headers with lower-case names.
+
+        Returns:
+        tuple: The status, the response headers and the body.
+        """
+        if method not in ('GET', 'HEAD'):
+            return self._error(405, "Only GET and HEAD are supported", {'Allow': 'GET, HEAD'})
+        url = urlsplit(target)
+        path = unquote(url.path)
+        query = parse_qs(url.query)
+        try:
+            route = self._route(path, query)
+            if route is None:
+                return self._static_file(path, headers)
+            cacheable = self._check_generation()
+            key = (path, tuple(sorted((name, tuple(values)) for name, values in query.items())))
+            entry = self._cache.get(key) if cacheable else None
+            if entry is None:
+                entry = route()
+                if cacheable:
+                    self._cache[key] = entry
+                    if len(self._cache) > self._cache_size:
+                        self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(key)
+        except HttpError as error:
+            return self._error(error.status, str(error))
+        status, content_type, body = entry
+        if not cacheable:
+            return status, {'Content-Type': content_type, 'Cache-Control': 'no-store'}, body
+        return self._conditional(status, content_type, body, self._etag, self._last_modified, headers)
+
+
+    def _route(self, path, query):
+        """
+        Finds the renderer of a path.
+
+        Args:
+        path (str): The decoded request path.
+        query (dict): The parsed query string.
+
+        Returns:
+        callable or None: Returns (status, content type, body), None for static files.
+        """
+        if path in ('/', '/index.html'):
+            return lambda: self._index_page(1)
+        if path.startswith('/index_') and path.endswith('.html'):
+            page = path[len('/index_'):-len('.html')]
+            if page.isdigit() and int(page) > 1:
+                return lambda: self._index_page(int(page))
+        if path == '/' + site_builder.SEARCH_INDEX_NAME:
+            return self._search_index
+        if path.startswith('/movie_') and path.endswith('.html'):
+            return lambda: self._movie_page(path[len('/movie_'):-len('.html')])
+        if path == '/api/movies':
+            return lambda: self._movies_json(query)
+        if path == '/api/movies/by-rating':
+            return lambda: self._movies_by_rating_json(query)
+        if path == '/api/movie':
+            return lambda: self._movie_json(query)
+        if path == '/api/stats':
+            return lambda: self._json(200, self._storage.rating_stats())
+        return None
+
+
+    @staticmethod
+    def _json(status, data):
+        """
+        Serializes a JSON response.
+
+        Returns:
+        tuple: The status, content type and body.
+        """
+        return status, JSON_TYPE, json.dumps(data).encode('utf-8')
+
+
+    def _index_page(self, page):
+        """
+        Renders a page of the index, like site_builder.build_site splits it.
+
+        Args:
+        page (int): The page number.
+
+        Returns:
+        tuple: The status, content type and body.
+        """
+        movies = self._storage.iter_movies()
+        start = (page - 1) * site_builder.INDEX_PAGE_SIZE
+        chunk = list(islice(movies, start, start + site_builder.INDEX_PAGE_SIZE))
+        if page > 1 and not chunk:
+            raise HttpError(404, f"Index page {page} not found.")
+        # The rest of the movies are only counted for the page links
+        movie_count = start + len(chunk) + sum(1 for _ in movies)
+        page_count = max(1, -(-movie_count // site_builder.INDEX_PAGE_SIZE))
+        html = site_builder.render_index(self._templates['index'], chunk, self._posters, page, page_count,
+                                         self._charts)
+        return 200, HTML_TYPE, html.encode('utf-8')
+
+
+    def _search_index(self):
+        """
+        Builds the search index of all movies.
+
+        Returns:
+        tuple: The status, content type and body.
+        """
+        body = ''.join(site_builder.iter_search_index(self._storage.iter_movies()))
+        return 200, JSON_TYPE, body.encode('utf-8')
+
+
+    def _movie_page(self, title):
+        """
+        Renders the page of a movie.
+
+        Args:
+        title (str): The movie title.
+
+        Returns:
+        tuple: The status, content type and body.
+        """
+        movie = self._storage.get_movie(title)
+        if movie is None:
+            raise HttpError(404, f"Movie with title '{title}' not found.")
+        html = site_builder.render_movie_page(self._templates['movie'], title, movie, self._posters)
+        return 200, HTML_TYPE, html.encode('utf-8')
+
+
+    def _movies_json(self, query):
+        """
+        Returns one page of movies in storage order.
+
+        Args:
+        query (dict): The parsed query string with 'page' and 'per_page'.
+
+        Returns:
+        tuple: The status, content type and body.
+        """
+        page = _int_param(query, 'page', 1, 1, None)
+        per_page = _int_param(query, 'per_page', DEFAULT_PER_PAGE, 1, MAX_PER_PAGE)
+        start = (page - 1) * per_page
+        movies = [movie_to_json(title, movie)
+                  for title, movie in islice(self._storage.iter_movies(), start, start + per_page + 1)]
+        return self._json(200, {
+            'page': page,
+            'per_page': per_page,
+            'movies': movies[:per_page],
+            'next_page': page + 1 if len(movies) > per_page else None,
+        })
+
+
+    def _movies_by_rating_json(self, query):
+        """
+        Returns one page of movies ordered by rating, paginated with a cursor.
+
+        Args:
+        query (dict): The parsed query string with 'limit', 'cursor' and 'order'.
+
+        Returns:
+        tuple: The status, content type and body.
+        """
+        limit = _int_param(query, 'limit', DEFAULT_PER_PAGE, 1, MAX_PER_PAGE)
+        cursor = query.get('cursor', [None])[0]
+        order = query.get('order', ['desc'])[0]
+        if order not in ('asc', 'desc'):
+            raise HttpError(400, "'order' must be asc or desc")
+        movies, next_cursor = self._storage.movies_by_rating(
+            limit, None if cursor is None else decode_cursor(cursor), order == 'desc'
+        )
+        return self._json(200, {
+            'movies': [{'title': title, 'rating': rating} for title, rating in movies],
+            'next_cursor': encode_cursor(next_cursor),
+        })
+
+
+    def _movie_json(self, query):
+        """
+        Returns the details of one movie.
+
+        Args:
+        query (dict): The parsed query string with 'title'.
+
+        Returns:
+        tuple: The status, content type and body.
+        """
+        title = query.get('title', [None])[0]
+        if title is None:
+            raise HttpError(400, "'title' is required")
+        movie = self._storage.get_movie(title)
+        if movie is None:
+            raise HttpError(404, f"Movie with title '{title}' not found.")
+        return self._json(200, movie_to_json(title, movie))
+
+
+    def _static_file(self, path, headers):
+        """
+        Answers with a file of the static directory, a mirrored poster or a chart,
+        validated by its modification time and size.
+
+        Args:
+        path (str): The decoded request path.
+        headers (dict): The request headers.
+
+        Returns:
+        tuple: The status, the response headers and the body.
+        """
+        name = path.lstrip('/')
+        directory, _, file_name = name.rpartition('/')
+        file_path = os.path.join(self._static_dir, name)
+        if (directory not in ('', site_builder.POSTER_DIR, site_builder.CHART_DIR) or not file_name or '\\' in name
+                or file_name.startswith('.') or not os.path.isfile(file_path)):
+            return self._error(404, f"'{path}' not found")
+        stat = os.stat(file_path)
+        with open(file_path, 'rb') as file:
+            body = file.read()
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        status, response_headers, body = self._conditional(200, content_type, body, etag,
+                                                           int(stat.st_mtime), headers)
+        if directory == site_builder.POSTER_DIR:
+            response_headers['Cache-Control'] = POSTER_CACHE_CONTROL
+        return status, response_headers, body
+
+
+    @staticmethod
+    def _conditional(status, content_type, body, etag, last_modified, headers):
+        """
+        Adds the validators to a response and turns it into a 304 if the
+        client's copy is still valid. If-None-Match takes precedence over
+        If-Modified-Since.
+
+        Args:
+        status (int): The status of the full response.
+        content_type (str): The content type.
+        body (bytes): The body.
+        etag (str): The entity tag of the body.
+        last_modified (int): The modification time in seconds since the epoch.
+        headers (dict): The request headers.
+
+        Returns:
+        tuple: The status, the response headers and the body.
+        """
+        response_headers = {
+            'Content-Type': content_type,
+            'ETag': etag,
+            'Last-Modified': formatdate(last_modified, usegmt=True),
+            # Stored but revalidated on every use, so edits show up at once
+            'Cache-Control': 'no-cache',
+        }
+        if status != 200:
+            return status, response_headers, body
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            if '*' in tags or etag in tags or f'W/{etag}' in tags:
+                return 304, response_headers, b''
+        elif 'if-modified-since' in headers:
+            try:
+                since = parsedate_to_datetime(headers['if-modified-since']).timestamp()
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and last_modified <= since:
+                return 304, response_headers, b''
+        return status, response_headers, body
+
+
+    @staticmethod
+    def _error(status, message, extra_headers=None):
+        """
+        Builds an error response with a plain text body.
+
+        Returns:
+        tuple: The status, the response headers and the body.
+        """
+        headers = {'Content-Type': 'text/plain; charset=utf-8', 'Cache-Control': 'no-store'}
+        headers.update(extra_headers or {})
+        return status, headers, message.encode('utf-8')
+
+
+    async def _handle(self, reader, writer):
+        """
+        Serves the requests of one connection, keeping it open between
+        requests unless the client asks to close it.
+
+        Args:
+        reader (asyncio.StreamReader): The incoming stream.
+        writer (asyncio.StreamWriter): The outgoing stream.
+
+        Returns:
+        None
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.split(' ')
+                if len(parts) != 3:
+                    status, response_headers, body = self._error(400, "Malformed request line")
+                    method, version = 'GET', 'HTTP/1.0'
+                else:
+                    method, target, version = parts
+                    try:
+                        length = int(headers.get('content-length', 0) or 0)
+                    except ValueError:
+                        length = -1
+                    if length < 0:
+                        # The body cannot be skipped without its length, so the connection is closed
+                        status, response_headers, body = self._error(400, "Invalid Content-Length")
+                        version = 'HTTP/1.0'
+                    else:
+                        if length:
+                            await reader.readexactly(length)
+                        try:
+                            status, response_headers, body = self.respond(method, target, headers)
+                        except Exception as error:
+                            print(f"Serving {target} failed: {error}")
+                            status, response_headers, body = self._error(500, "Internal server error")
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                response_headers['Content-Length'] = str(len(body))
+                response_headers['Date'] = formatdate(usegmt=True)
+                response_headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+                lines = [f"HTTP/1.1 {status} {REASONS[status]}"]
+                lines.extend(f"{name}: {value}" for name, value in response_headers.items())
+                writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD' and status != 304:
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Starts listening, port 0 picks a free port.
+
+        Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+
+        Returns:
+        asyncio.Server: The listening server, e.g. for server.sockets[0].getsockname().
+        """
+        return await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Serves until the task is cancelled.
+
+        Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+
+        Returns:
+        None
+        """
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def serve(storage, host=DEFAULT_HOST, port=DEFAULT_PORT, static_dir=site_builder.STATIC_DIR):
+    """
+    Serves the movies of a storage until Ctrl+C is pressed.
+
+    Args:
+    storage (IStorage): The storage to serve.
+    host (str): The address to listen on.
+    port (int): The port to listen on.
+    static_dir (str): The directory holding the templates and stylesheets.
+
+    Returns:
+    None
+    """
+    server = CatalogServer(storage, static_dir)
+    print(f"Serving the movies on http://{host}:{port}/ - press Ctrl+C to stop")
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        print("Server stopped")
@@ -0,0 +1,206 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+IMMEDIATE = 'immediate'
+GROUP_COMMIT = 'group-commit'
+ON_EXIT = 'on-exit'
+DURABILITY_LEVELS = (IMMEDIATE, GROUP_COMMIT, ON_EXIT)
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+@contextmanager
+def atomic_open(file_path, **open_kwargs):
+    """
+    Opens a temporary file next to the target for writing and atomically
+    replaces the target with it once the with block succeeds.
+
+    The data is fsynced before the rename, so after a crash the target holds
+    either the old or the new content, never a truncated file. If the block
+    fails the temporary file is removed and the target is left untouched.
+
+    Args:
+    file_path (str): The file to replace.
+    open_kwargs: Extra arguments of open, e.g. newline or encoding.
+
+    Returns:
+    contextmanager: The open temporary file.
+    """
+    temp_path = f"{file_path}.tmp"
+    try:
+        with open(temp_path, 'w', **open_kwargs) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(os.path.dirname(os.path.abspath(file_path)))
+
+
+def _fsync_directory(directory):
+    """
+    Persists a rename in a directory, where the platform supports it.
+
+    Args:
+    directory (str): The directory holding the renamed file.
+
+    Returns:
+    None
+    """
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on Windows, the rename is durable there
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+class WriteBehind:
+    """
+    Decides when the pending changes of a storage are written to its file.
+
+    - immediate: every change is flushed before the mutation returns.
+    - group-commit: mutations return at once, a background thread flushes
+      all changes made within the flush interval together.
+    - on-exit: changes are only flushed by flush or close, e.g. from
+      MovieApp.exit_program, or when the interpreter exits.
+
+    A flush clears the dirty flag before the storage takes its snapshot and
+    a mutation marks the storage dirty after it changed the movies, so a
+    change made while a flush is running is always flushed again.
+
+    Args:
+    flush (callable): Writes the current movies of the storage to its file.
+    durability (str): One of DURABILITY_LEVELS.
+    interval (float): Seconds the group-commit thread waits to collect changes.
+
+    Methods:
+    - pending: Whether changes are not written yet.
+    - mark_dirty: Records that the movies changed.
+    - flush: Writes the pending changes now.
+    - close: Writes the pending changes and stops the background thread.
+    """
+
+    def __init__(self, flush, durability=IMMEDIATE, interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        Initializes a new instance of the class and starts the group-commit thread.
+
+        Returns:
+        None
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability '{durability}', use one of: {', '.join(DURABILITY_LEVELS)}")
+        self._flush = flush
+        self.durability = durability
+        self.interval = interval
+        self._dirty = False
+        self._flushing = False
+        self._closed = False
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._thread = None
+        if durability == GROUP_COMMIT:
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        if durability != IMMEDIATE:
+            atexit.register(self.close)
+
+
+    @property
+    def pending(self):
+        """
+        Whether changes are waiting to be written or being written.
+
+        Returns:
+        bool: True until the last change is on disk.
+        """
+        return self._dirty or self._flushing
+
+
+    def mark_dirty(self):
+        """
+        Records that the movies changed and flushes them according to the durability.
+
+        Returns:
+        None
+        """
+        if self.durability == IMMEDIATE or self._closed:
+            self._dirty = True
+            self.flush()
+            return
+        with self._wakeup:
+            self._dirty = True
+            self._wakeup.notify()
+
+
+    def flush(self):
+        """
+        Writes the pending changes, if there are any, in the calling thread.
+
+        Returns:
+        None
+        """
+        with self._flush_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._flushing = True
+            try:
+                self._flush()
+            except BaseException:
+                self._dirty = True
+                raise
+            finally:
+                self._flushing = False
+
+
+    def close(self):
+        """
+        Writes the pending changes and stops the background thread, calling
+        it again has no effect.
+
+        Returns:
+        None
+        """
+        if self._closed:
+            return
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+
+    def _run(self):
+        """
+        The group-commit loop: waits for a change, collects further changes
+        for the flush interval and writes them with a single flush.
+
+        Returns:
+        None
+        """
+        while True:
+            with self._wakeup:
+                while not self._dirty and not self._closed:
+                    self._wakeup.wait()
+                deadline = time.monotonic() + self.interval
+                while not self._closed and time.monotonic() < deadline:
+                    self._wakeup.wait(deadline - time.monotonic())
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except OSError as error:
+                print(f"Saving the movies failed, retrying: {error}")